@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+배열 기반 ID 매핑 (IdMapping)
+1,100만 사용자 규모의 user_to_idx / idx_to_user dict + pickle을 대체
+
+구조:
+    - ids: idx → 원본 ID (plain array, 역방향 조회)
+    - sorted_ids + order: 정렬된 ID 배열과 정렬 위치 → idx (searchsorted 조회)
+      (ids가 이미 정렬되어 있으면 order 생략)
+    - .npy로 저장하여 np.load(mmap_mode='r')로 즉시 로드
+"""
+import numpy as np
+import pickle
+import os
+
+
+class IdMapping:
+    """
+    원본 ID ↔ 연속 Index 매핑
+
+    dict와 같은 방식(`id in m`, `m[id]`, `m.get(id)`)으로 사용할 수 있어
+    모델의 user_to_idx / item_to_idx 필드를 그대로 대체함.
+    배열 단위 변환은 encode / decode 사용
+
+    Args:
+        ids: idx 순서의 원본 ID 배열 (중복 없음)
+    """
+
+    def __init__(self, ids, sorted_ids=None, order=None):
+        self.ids = np.asarray(ids)
+
+        if sorted_ids is not None:
+            self.sorted_ids = sorted_ids
+            self.order = order
+        elif len(self.ids) < 2 or np.all(self.ids[1:] > self.ids[:-1]):
+            # 이미 정렬됨 (np.unique 결과 등): 정렬 위치 == idx
+            self.sorted_ids = self.ids
+            self.order = None
+        else:
+            self.order = np.argsort(self.ids, kind='stable')
+            self.sorted_ids = self.ids[self.order]
+            if np.any(self.sorted_ids[1:] == self.sorted_ids[:-1]):
+                raise ValueError("IdMapping: 중복 ID가 있음")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __repr__(self):
+        return f"IdMapping(n={len(self):,})"
+
+    def encode(self, ids, missing=-1):
+        """
+        원본 ID 배열 → idx 배열 (벡터화)
+
+        Args:
+            ids: 원본 ID 배열
+            missing: 매핑에 없는 ID에 채울 값
+
+        Returns:
+            np.int64 idx 배열
+        """
+        ids = np.asarray(ids)
+        n = len(self.sorted_ids)
+        if n == 0:
+            return np.full(ids.shape, missing, dtype=np.int64)
+
+        pos = np.searchsorted(self.sorted_ids, ids)
+        pos_clip = np.minimum(pos, n - 1)
+        found = (pos < n) & (self.sorted_ids[pos_clip] == ids)
+
+        idx = pos_clip if self.order is None else self.order[pos_clip]
+        idx = np.asarray(idx, dtype=np.int64)
+        return np.where(found, idx, missing)
+
+    def decode(self, idx):
+        """idx 배열 → 원본 ID 배열 (벡터화)"""
+        return self.ids[np.asarray(idx)]
+
+    # dict 호환 인터페이스
+    def __contains__(self, key):
+        return self.encode(np.array([key]))[0] >= 0
+
+    def __getitem__(self, key):
+        idx = self.encode(np.array([key]))[0]
+        if idx < 0:
+            raise KeyError(key)
+        return int(idx)
+
+    def get(self, key, default=None):
+        idx = self.encode(np.array([key]))[0]
+        return default if idx < 0 else int(idx)
+
+    def save(self, dirpath, name):
+        """
+        {name}_ids.npy, {name}_sorted.npy, {name}_order.npy 저장
+        (정렬된 매핑은 ids 하나만 저장)
+        """
+        os.makedirs(dirpath, exist_ok=True)
+        np.save(os.path.join(dirpath, f"{name}_ids.npy"), self.ids)
+        if self.order is not None:
+            np.save(os.path.join(dirpath, f"{name}_sorted.npy"), self.sorted_ids)
+            np.save(os.path.join(dirpath, f"{name}_order.npy"), self.order)
+
+    @classmethod
+    def load(cls, dirpath, name, mmap=True):
+        """저장된 매핑 로드 (mmap=True면 memory-map, 복사 없음)"""
+        mode = 'r' if mmap else None
+        ids = np.load(os.path.join(dirpath, f"{name}_ids.npy"), mmap_mode=mode)
+        order_path = os.path.join(dirpath, f"{name}_order.npy")
+        if not os.path.exists(order_path):
+            return cls(ids, sorted_ids=ids, order=None)
+        return cls(ids,
+                   sorted_ids=np.load(os.path.join(dirpath, f"{name}_sorted.npy"), mmap_mode=mode),
+                   order=np.load(order_path, mmap_mode=mode))
+
+    @classmethod
+    def from_dict(cls, to_idx):
+        """기존 {id: idx} dict → IdMapping"""
+        ids = np.empty(len(to_idx), dtype=np.int64)
+        ids[np.fromiter(to_idx.values(), dtype=np.int64, count=len(to_idx))] = \
+            np.fromiter(to_idx.keys(), dtype=np.int64, count=len(to_idx))
+        return cls(ids)
+
+
+def build_mappings(user_mapping, item_mapping):
+    """
+    IdMapping 2개 → 기존 pickle과 같은 키 구성의 매핑 딕셔너리
+
+    user_to_idx / item_to_idx는 IdMapping, idx_to_user / idx_to_item은 ID 배열
+    """
+    return {
+        'user_to_idx': user_mapping,
+        'idx_to_user': user_mapping.ids,
+        'item_to_idx': item_mapping,
+        'idx_to_item': item_mapping.ids,
+        'n_users': len(user_mapping),
+        'n_items': len(item_mapping),
+    }
+
+
+def save_mappings(dirpath, mappings):
+    """매핑 딕셔너리 저장 (디렉토리에 .npy 파일)"""
+    mappings['user_to_idx'].save(dirpath, 'user')
+    mappings['item_to_idx'].save(dirpath, 'item')
+
+
+def load_mappings(path, mmap=True):
+    """
+    매핑 로드
+
+    Args:
+        path: save_mappings 디렉토리 또는 기존 .pkl 파일 (dict → IdMapping 변환)
+        mmap: memory-map 여부
+
+    Returns:
+        매핑 딕셔너리 (build_mappings 형식)
+    """
+    if path.endswith('.pkl'):
+        with open(path, 'rb') as f:
+            legacy = pickle.load(f)
+        return build_mappings(IdMapping.from_dict(legacy['user_to_idx']),
+                              IdMapping.from_dict(legacy['item_to_idx']))
+
+    return build_mappings(IdMapping.load(path, 'user', mmap=mmap),
+                          IdMapping.load(path, 'item', mmap=mmap))
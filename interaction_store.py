@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+상호작용 컬럼 저장소 (Columnar Interaction Store)
+recommendations.csv (41M rows)를 컬럼별 바이너리 배열로 1회 변환하고,
+이후 스크립트는 필요한 컬럼만 np.memmap으로 읽음 (CSV 재파싱 제거)
+
+저장 구조:
+    data_store/recommendations/
+    ├── meta.json          (행 수, 컬럼별 dtype, 원본 파일 정보)
+    ├── app_id.bin         (int32)
+    ├── user_id.bin        (int32)
+    ├── hours.bin          (float32)
+    ├── is_recommended.bin (bool)
+    ├── date.bin           (int32, 1970-01-01 기준 일 수)
+    └── ...
+"""
+import pandas as pd
+import numpy as np
+import json
+import os
+
+REC_FILE = "Game Recommendations on Steam/recommendations.csv"
+STORE_DIR = "data_store/recommendations"
+
+# 컬럼별 저장 타입 (원본 CSV 컬럼 순서)
+COLUMN_DTYPES = {
+    'app_id': np.int32,
+    'helpful': np.int32,
+    'funny': np.int32,
+    'date': np.int32,            # day number (1970-01-01 = 0)
+    'is_recommended': np.bool_,
+    'hours': np.float32,
+    'user_id': np.int32,
+    'review_id': np.int32,
+}
+
+
+def _encode_column(name, values):
+    """CSV 컬럼 값을 저장 타입으로 변환 (정수 범위 초과 시 에러)"""
+    dtype = COLUMN_DTYPES[name]
+
+    if name == 'date':
+        return encode_dates(values)
+
+    values = np.asarray(values)
+    if np.issubdtype(dtype, np.integer) and len(values) > 0:
+        info = np.iinfo(dtype)
+        if values.min() < info.min or values.max() > info.max:
+            raise ValueError(f"{name} 값이 {np.dtype(dtype).name} 범위를 벗어남: "
+                             f"[{values.min()}, {values.max()}]")
+    return values.astype(dtype)
+
+
+def encode_dates(values):
+    """날짜 문자열/datetime 배열 → int32 day number 배열 (1970-01-01 기준)"""
+    if not np.issubdtype(np.asarray(values).dtype, np.datetime64):
+        values = pd.to_datetime(values, format='%Y-%m-%d')
+    days = np.asarray(values).astype('datetime64[D]').astype(np.int64)
+    return days.astype(COLUMN_DTYPES['date'])
+
+
+def decode_dates(days):
+    """day number 배열 → datetime64 배열"""
+    return np.asarray(days).astype('datetime64[D]')
+
+
+def build_store(csv_path=REC_FILE, store_dir=STORE_DIR, chunk_size=2_000_000):
+    """
+    CSV → 컬럼별 바이너리 파일 변환 (1회 실행)
+
+    Args:
+        csv_path: 원본 recommendations.csv 경로
+        store_dir: 저장 디렉토리
+        chunk_size: 변환 시 청크 크기
+
+    Returns:
+        meta 딕셔너리
+    """
+    os.makedirs(store_dir, exist_ok=True)
+
+    # meta.json은 변환 완료 표시이므로 먼저 제거
+    meta_path = os.path.join(store_dir, 'meta.json')
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    files = {name: open(os.path.join(store_dir, f"{name}.bin"), 'wb') for name in COLUMN_DTYPES}
+    n_rows = 0
+
+    try:
+        for i, chunk in enumerate(pd.read_csv(csv_path, chunksize=chunk_size)):
+            for name, f in files.items():
+                _encode_column(name, chunk[name].values).tofile(f)
+            n_rows += len(chunk)
+            if (i + 1) % 5 == 0:
+                print(f"    {n_rows:,} rows 변환 완료...")
+    finally:
+        for f in files.values():
+            f.close()
+
+    stat = os.stat(csv_path)
+    meta = {
+        'n_rows': n_rows,
+        'columns': {name: np.dtype(dtype).name for name, dtype in COLUMN_DTYPES.items()},
+        'source': csv_path,
+        'source_size': stat.st_size,
+        'source_mtime': stat.st_mtime,
+    }
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+    return meta
+
+
+def store_exists(store_dir=STORE_DIR, csv_path=REC_FILE):
+    """
+    변환이 완료된 최신 저장소가 있는지 확인
+
+    원본 CSV가 있으면 meta.json에 기록된 크기/수정 시각과 비교하여, 다르면 (CSV 갱신) False.
+    원본 CSV가 없으면 저장소만 있어도 사용
+    """
+    meta_path = os.path.join(store_dir, 'meta.json')
+    if not os.path.exists(meta_path):
+        return False
+    if csv_path is None or not os.path.exists(csv_path):
+        return True
+
+    meta = load_meta(store_dir)
+    stat = os.stat(csv_path)
+    if meta.get('source_size') != stat.st_size or meta.get('source_mtime') != stat.st_mtime:
+        print(f"  [경고] {csv_path}가 저장소 변환 이후 변경됨 → CSV에서 읽음 "
+              f"(interaction_store.py 재실행 필요)")
+        return False
+    return True
+
+
+def load_meta(store_dir=STORE_DIR):
+    """meta.json 로드"""
+    with open(os.path.join(store_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_columns(columns=None, store_dir=STORE_DIR):
+    """
+    필요한 컬럼만 memory-map으로 로드 (복사 없음)
+
+    Args:
+        columns: 컬럼명 리스트 (None이면 전체)
+        store_dir: 저장 디렉토리
+
+    Returns:
+        {컬럼명: np.memmap (read-only)}
+    """
+    meta = load_meta(store_dir)
+    n_rows = meta['n_rows']
+    if columns is None:
+        columns = list(meta['columns'])
+
+    arrays = {}
+    for name in columns:
+        dtype = np.dtype(meta['columns'][name])
+        if n_rows == 0:
+            arrays[name] = np.empty(0, dtype=dtype)
+        else:
+            arrays[name] = np.memmap(os.path.join(store_dir, f"{name}.bin"),
+                                     dtype=dtype, mode='r', shape=(n_rows,))
+    return arrays
+
+
+def iter_chunks(columns=None, chunk_size=2_000_000, store_dir=STORE_DIR):
+    """
+    저장소를 DataFrame 청크로 순회 (pd.read_csv(chunksize=...) 대체)
+
+    date 컬럼은 datetime64로 복원하여 CSV와 동일하게 사용 가능
+    """
+    arrays = load_columns(columns, store_dir)
+    n_rows = load_meta(store_dir)['n_rows']
+
+    for start in range(0, n_rows, chunk_size):
+        end = min(start + chunk_size, n_rows)
+        chunk = {}
+        for name, arr in arrays.items():
+            values = np.asarray(arr[start:end])
+            chunk[name] = decode_dates(values) if name == 'date' else values
+        yield pd.DataFrame(chunk, index=pd.RangeIndex(start, end))
+
+
+def read_interaction_chunks(columns=None, chunk_size=2_000_000,
+                            csv_path=REC_FILE, store_dir=STORE_DIR):
+    """
+    상호작용 청크 읽기 공통 함수
+
+    최신 저장소가 있으면 memmap에서, 없거나 원본 CSV가 갱신되었으면 원본 CSV에서 청크를 읽음
+    """
+    if store_exists(store_dir, csv_path):
+        return iter_chunks(columns, chunk_size, store_dir)
+    return pd.read_csv(csv_path, chunksize=chunk_size, usecols=columns)
+
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print("상호작용 컬럼 저장소 변환 (recommendations.csv → data_store)")
+    print("=" * 70)
+
+    print("\n[Step 1] CSV → 컬럼별 바이너리 변환")
+    print("-" * 50)
+
+    meta = build_store()
+
+    print(f"\n  총 변환: {meta['n_rows']:,} rows")
+    for name, dtype in meta['columns'].items():
+        size = os.path.getsize(os.path.join(STORE_DIR, f"{name}.bin"))
+        print(f"    {name:<16} {dtype:<8} {size / 1024**2:>10.1f} MB")
+
+    print("\n[Step 2] 로드 검증")
+    print("-" * 50)
+
+    cols = load_columns(['app_id', 'user_id'])
+    print(f"  app_id: {len(cols['app_id']):,} rows, 유니크 {len(np.unique(cols['app_id'])):,}")
+    print(f"  user_id 범위: {cols['user_id'].min():,} ~ {cols['user_id'].max():,}")
+
+    print("\n" + "=" * 70)
+    print(f"저장 위치: {STORE_DIR}/")
+    print("=" * 70)
@@ -3,19 +3,41 @@
 Phase 3 - Task 3.3: ALS 모델
 Alternating Least Squares for Implicit Feedback
 순수 NumPy/SciPy 구현 (Hu et al., 2008)
+
+전체 사용자 학습:
+    사용자 factor는 float32 (n_users × f) 배열 (user_factors_path를 주면 .npy memmap)로 두고
+    half-step은 행 블록(block_rows 행 / block_nnz non-zero 이하) 단위 stacked solve를 n_threads 스레드로
+    처리하므로 메모리는 (스레드 수 × 블록 크기)와 factor 배열 수준.
+    저장 시 사용자 factor는 .npy로 따로 저장하고 로드 시 memory-map으로 엶
+
+신규 사용자 (fold-in):
+    fold_in()은 고정된 item_factors에 대해 새 사용자 블록의 최소제곱 문제만 풀이
+    (YᵀY + λI는 한 번 계산해 캐시, 블록별 stacked solve). user split의 valid/test 사용자나
+    익명 세션처럼 학습에 없던 사용자도 재학습 없이 factor를 얻음
+
+학습 모니터링:
+    - loss: loss_every 반복마다 non-zero + Gram 행렬 항으로 계산 (dense 예측 행렬 없음)
+    - Recall@K: fit(monitor_matrix=...)의 held-out 상호작용에서 고정 사용자 표본(monitor_users명)만 점수 계산
+    - early_stopping_rounds: 모니터 지표(Recall@K, 없으면 loss)가 연속으로 개선되지 않은 측정 횟수 한도
 """
 import pandas as pd
 import numpy as np
-from scipy.sparse import csr_matrix, load_npz, eye, diags
-from scipy.sparse.linalg import spsolve
 from collections import defaultdict
 import pickle
 import os
 import sys
 import math
+import time
+from scipy.sparse import csr_matrix
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from id_mapping import IdMapping, load_mappings
+from sparse_utils import load_matrix, build_csr
+from evaluation import recall_at_k, ndcg_at_k
+from factor_retrieval import topk_factor_scores
+from als_solver import SOLVERS, confidence_matrix, confidence_weights, gram_matrix, solve_half_step, implicit_loss
+
 
 class ALSModel:
     """
@@ -30,20 +52,46 @@ class ALSModel:
     - 순수 NumPy/SciPy 구현
     """
     
-    def __init__(self, factors=32, regularization=0.1, iterations=10, alpha=40):
+    def __init__(self, factors=32, regularization=0.1, iterations=10, alpha=40, solver='exact', cg_steps=3,
+                 block_rows=256, block_nnz=100_000, n_threads=None, user_factors_path=None,
+                 loss_every=1, monitor_k=20, monitor_users=1000, early_stopping_rounds=None):
         """
         Args:
             factors: Latent factor 차원
             regularization: L2 정규화 계수
             iterations: 학습 반복 횟수
             alpha: Confidence 스케일링 (C = 1 + alpha * R)
+            solver: 행별 최소제곱 풀이 방식 ('exact': np.linalg.solve, 'cg': conjugate gradient)
+            cg_steps: solver='cg'일 때 행당 CG step 수 (이전 factor에서 시작)
+            block_rows: half-step 블록당 최대 행 수 (블록마다 stacked solve 한 번)
+            block_nnz: half-step 블록당 최대 non-zero 수 (블록 gather 메모리 상한)
+            n_threads: half-step 스레드 수 (None이면 CPU 코어 수)
+            user_factors_path: 사용자 factor를 저장할 .npy 경로 (memmap, None이면 메모리 배열)
+            loss_every: loss 계산 주기 (반복 수, 0이면 계산 안 함)
+            monitor_k: held-out Recall@K 모니터의 K
+            monitor_users: held-out Recall@K 모니터 사용자 표본 크기
+            early_stopping_rounds: 모니터 지표가 이 횟수 연속 개선되지 않으면 학습 중단 (None이면 사용 안 함)
         """
+        if solver not in SOLVERS:
+            raise ValueError(f"지원하지 않는 solver: {solver} (지원: {SOLVERS})")
+        self._item_gram = None  # fold-in용 YᵀY + λI 캐시 (item_factors / regularization을 바꾸면 비움)
         self.factors = factors
         self.regularization = regularization
         self.iterations = iterations
         self.alpha = alpha
+        self.solver = solver
+        self.cg_steps = cg_steps
+        self.block_rows = block_rows
+        self.block_nnz = block_nnz
+        self.n_threads = n_threads
+        self.user_factors_path = user_factors_path
+        self.loss_every = loss_every
+        self.monitor_k = monitor_k
+        self.monitor_users = monitor_users
+        self.early_stopping_rounds = early_stopping_rounds
         
-        self.user_factors = None  # (n_users, factors)
+        self.history = []  # 반복별 {'iteration', 'seconds', 'loss', 'recall'} (측정 안 한 값은 None)
+        self.user_factors = None  # (n_users, factors) float32, memmap 가능
         self.item_factors = None  # (n_items, factors)
         self.user_item_matrix = None
         self.user_to_idx = None
@@ -53,15 +101,39 @@ class ALSModel:
         self.n_users = 0
         self.n_items = 0
         
-    def fit(self, train_sparse, mappings):
+    @property
+    def item_factors(self):
+        """(n_items, factors) 아이템 factor (다시 지정하면 fold-in Gram 캐시를 비움, 제자리 수정은 fit 내부만)"""
+        return self._item_factors
+    
+    @item_factors.setter
+    def item_factors(self, factors):
+        self._item_factors = factors
+        self._item_gram = None
+    
+    @property
+    def regularization(self):
+        """L2 정규화 계수 (다시 지정하면 fold-in Gram 캐시를 비움)"""
+        return self._regularization
+    
+    @regularization.setter
+    def regularization(self, value):
+        self._regularization = value
+        self._item_gram = None
+    
+    def fit(self, train_sparse, mappings, monitor_matrix=None):
         """
         학습: User/Item Factor 행렬 학습
         
         Args:
             train_sparse: CSR sparse matrix (users × items)
             mappings: ID 매핑 딕셔너리
+            monitor_matrix: held-out 상호작용 CSR (train_sparse와 같은 인덱스, Recall@K 모니터용, 선택)
         """
-        print(f"[ALS] 모델 학습 시작 (factors={self.factors}, iter={self.iterations})...")
+        if self.early_stopping_rounds is not None and not self.loss_every and monitor_matrix is None:
+            raise ValueError("early_stopping_rounds에는 모니터 지표가 필요함 (loss_every > 0 또는 monitor_matrix 지정)")
+        
+        print(f"[ALS] 모델 학습 시작 (factors={self.factors}, iter={self.iterations}, solver={self.solver})...")
         
         self.user_item_matrix = train_sparse
         self.user_to_idx = mappings['user_to_idx']
@@ -73,71 +145,79 @@ class ALSModel:
         print(f"  행렬 크기: {self.n_users:,} users × {self.n_items:,} items")
         print(f"  Non-zero: {train_sparse.nnz:,}")
         
-        # 데이터가 너무 크면 샘플링
-        if self.n_users > 100000:
-            print(f"  [Notice] 사용자 수가 많아 샘플링 학습...")
-            sample_size = 100000
-            sample_idx = np.random.choice(self.n_users, sample_size, replace=False)
-            train_sample = train_sparse[sample_idx]
-            n_users_train = sample_size
-        else:
-            train_sample = train_sparse
-            n_users_train = self.n_users
-        
-        # Confidence 행렬: C = 1 + alpha * R
-        confidence = train_sample.copy()
-        confidence.data = 1 + self.alpha * confidence.data
+        # Confidence 가중치: C - 1 = alpha * R (non-zero만), 아이템 half-step용 CSC 사본
+        weights, weights_by_item = confidence_weights(train_sparse, self.alpha)
         
-        # Preference 행렬: P = (R > 0)
-        preference = train_sample.copy()
-        preference.data = np.ones_like(preference.data)
-        
-        # Factor 초기화 (Xavier 초기화)
+        # Factor 초기화 (사용자 factor는 블록 단위로 float32 배열에 기록)
         np.random.seed(42)
-        self.user_factors = np.random.normal(0, 0.01, (n_users_train, self.factors))
         self.item_factors = np.random.normal(0, 0.01, (self.n_items, self.factors))
+        self.user_factors = self._allocate_user_factors()
+        rng = np.random.default_rng(42)
+        init_block = 100_000
+        for start in range(0, self.n_users, init_block):
+            end = min(start + init_block, self.n_users)
+            self.user_factors[start:end] = rng.normal(0, 0.01, (end - start, self.factors))
         
-        # 정규화 행렬
-        reg_matrix = self.regularization * eye(self.factors)
+        # Recall@K 모니터 사용자 표본 (held-out 상호작용이 있는 사용자 중 고정)
+        monitor_sample = None
+        if monitor_matrix is not None:
+            monitor_matrix = monitor_matrix.tocsr()
+            candidates = np.flatnonzero(np.diff(monitor_matrix.indptr) > 0)
+            size = min(self.monitor_users, len(candidates))
+            monitor_sample = np.sort(np.random.default_rng(42).choice(candidates, size=size, replace=False))
+            print(f"  Recall@{self.monitor_k} 모니터: {len(monitor_sample):,}명")
         
         # ALS 반복 학습
+        self.history = []
+        best_metric, stale_rounds = None, 0
+        best_factors = None  # (best 반복, 사용자 factor 사본, 아이템 factor 사본)
         for iteration in range(self.iterations):
-            print(f"  Iteration {iteration + 1}/{self.iterations}...")
+            epoch_start = time.time()
             
             # 1. User factors 업데이트 (Item factors 고정)
-            YtY = self.item_factors.T @ self.item_factors
+            #    (YᵀY + Y_uᵀ(C_u - I)Y_u + λI)^{-1} Y_uᵀ C_u p_u, 사용자가 본 아이템 행만 사용
+            # 2. Item factors 업데이트 (User factors 고정, CSC 사본의 열 = 아이템)
+            #    YᵀY + λI는 half-step마다 한 번 계산하여 모든 블록이 공유
+            gram = gram_matrix(self.item_factors, self.regularization)
+            self._solve(weights, self.item_factors, self.user_factors, gram)
             
-            for u in range(min(n_users_train, 10000)):  # 메모리 제한
-                # 사용자 u가 상호작용한 아이템들
-                Cu = confidence[u].toarray().flatten()
-                Pu = preference[u].toarray().flatten()
-                
-                # (Y^T C^u Y + λI)^{-1} Y^T C^u p^u
-                Cu_diag = diags(Cu - 1)  # C^u - I
-                A = YtY + self.item_factors.T @ Cu_diag @ self.item_factors + reg_matrix
-                b = self.item_factors.T @ (Cu * Pu)
-                
-                self.user_factors[u] = np.linalg.solve(A.toarray() if hasattr(A, 'toarray') else A, b)
+            gram = gram_matrix(self.user_factors, self.regularization)
+            self._solve(weights_by_item, self.user_factors, self.item_factors, gram)
+            if isinstance(self.user_factors, np.memmap):
+                self.user_factors.flush()
             
-            # 2. Item factors 업데이트 (User factors 고정)
-            XtX = self.user_factors.T @ self.user_factors
+            epoch_seconds = time.time() - epoch_start
             
-            for i in range(self.n_items):
-                # 아이템 i와 상호작용한 사용자들
-                Ci = confidence[:, i].toarray().flatten()
-                Pi = preference[:, i].toarray().flatten()
-                
-                Ci_diag = diags(Ci - 1)
-                A = XtX + self.user_factors.T @ Ci_diag @ self.user_factors + reg_matrix
-                b = self.user_factors.T @ (Ci * Pi)
-                
-                self.item_factors[i] = np.linalg.solve(A.toarray() if hasattr(A, 'toarray') else A, b)
+            # Loss (non-zero + Gram 행렬, dense 예측 행렬 없음) / 표본 Recall@K
+            loss, recall = None, None
+            message = f"  Iteration {iteration + 1}/{self.iterations}: {epoch_seconds:.2f}s"
+            if self.loss_every and (iteration + 1) % self.loss_every == 0:
+                loss = implicit_loss(weights, self.user_factors, self.item_factors, self.regularization)
+                message += f", Loss: {loss:.4f}"
+            if monitor_sample is not None:
+                recall = sample_recall(self.user_factors, self.item_factors, train_sparse, monitor_matrix,
+                                       monitor_sample, self.monitor_k)
+                message += f", Recall@{self.monitor_k}: {recall:.4f}"
+            self.history.append({'iteration': iteration + 1, 'seconds': epoch_seconds, 'loss': loss,
+                                 'recall': recall})
+            print(message)
             
-            # Loss 계산 (선택적)
-            if (iteration + 1) % 5 == 0:
-                pred = self.user_factors @ self.item_factors.T
-                loss = np.sum(confidence.multiply(preference - csr_matrix(pred)).power(2))
-                print(f"    Loss: {loss:.4f}")
+            # Early stopping (Recall@K는 클수록, loss는 작을수록 개선)
+            metric = recall if recall is not None else (-loss if loss is not None else None)
+            if self.early_stopping_rounds is None or metric is None:
+                continue
+            if best_metric is None or metric > best_metric:
+                best_metric, stale_rounds = metric, 0
+                best_factors = self._snapshot_factors(iteration + 1, best_factors)
+            else:
+                stale_rounds += 1
+                if stale_rounds >= self.early_stopping_rounds:
+                    print(f"  Early stopping: {stale_rounds}회 연속 개선 없음")
+                    break
+        
+        # 마지막 반복이 best가 아니면 best 반복의 factor로 복원
+        if best_factors is not None:
+            self._restore_factors(best_factors, restore=best_factors[0] != len(self.history))
         
         print(f"  학습 완료!")
         print(f"  User factors: {self.user_factors.shape}")
@@ -145,6 +225,91 @@ class ALSModel:
         
         return self
     
+    def _allocate_user_factors(self):
+        """float32 사용자 factor 배열 (user_factors_path가 있으면 .npy memmap)"""
+        shape = (self.n_users, self.factors)
+        if self.user_factors_path is None:
+            return np.empty(shape, dtype=np.float32)
+        os.makedirs(os.path.dirname(self.user_factors_path) or '.', exist_ok=True)
+        return np.lib.format.open_memmap(self.user_factors_path, mode='w+', dtype=np.float32, shape=shape)
+    
+    def _snapshot_factors(self, iteration, previous=None):
+        """
+        현재 factor 사본 (early stopping best 복원용)
+        
+        사용자 factor는 user_factors와 같은 형식(memmap이면 옆 파일 *_best.npy memmap)에
+        블록 단위로 복사하므로 메모리에 전체 사본을 만들지 않음. previous 사본이 있으면 재사용
+        """
+        if previous is None:
+            if isinstance(self.user_factors, np.memmap):
+                path = os.path.splitext(self.user_factors_path)[0] + '_best.npy'
+                user_copy = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32,
+                                                      shape=self.user_factors.shape)
+            else:
+                user_copy = np.empty_like(self.user_factors)
+        else:
+            user_copy = previous[1]
+        _copy_rows(self.user_factors, user_copy)
+        return iteration, user_copy, np.array(self.item_factors)
+    
+    def _restore_factors(self, snapshot, restore=True):
+        """best 사본을 user_factors / item_factors에 되돌리고 memmap 사본 파일 삭제"""
+        iteration, user_copy, item_copy = snapshot
+        if restore:
+            print(f"  best 반복 {iteration}의 factor로 복원")
+            _copy_rows(user_copy, self.user_factors)
+            self.item_factors = item_copy
+            if isinstance(self.user_factors, np.memmap):
+                self.user_factors.flush()
+        if isinstance(user_copy, np.memmap):
+            os.remove(user_copy.filename)
+    
+    def _solve(self, weights, factors, out, gram):
+        """half-step 풀이 (solver 설정에 따라 exact / cg, 행 블록 스레드 병렬)"""
+        solve_half_step(weights, factors, self.regularization, out, self.solver, self.cg_steps, gram=gram,
+                        block_rows=self.block_rows, block_nnz=self.block_nnz, n_threads=self.n_threads)
+    
+    def fold_in(self, user_item_rows):
+        """
+        신규 사용자 factor 계산 (item_factors 고정, 사용자 half-step 한 번)
+        
+        Args:
+            user_item_rows: CSR (n_new_users × n_items), 학습 행렬과 같은 아이템 인덱스/값 척도
+        
+        Returns:
+            (n_new_users × factors) float32 사용자 factor (상호작용 없는 행은 0)
+        """
+        if user_item_rows.shape[1] != self.n_items:
+            raise ValueError(f"아이템 수 불일치: {user_item_rows.shape[1]} (모델: {self.n_items})")
+        if self._item_gram is None:
+            self._item_gram = gram_matrix(self.item_factors, self.regularization)
+        
+        weights = confidence_matrix(user_item_rows, self.alpha)
+        user_factors = np.zeros((weights.shape[0], self.factors), dtype=np.float32)
+        solve_half_step(weights, self.item_factors, self.regularization, user_factors, 'exact',
+                        gram=self._item_gram, block_rows=self.block_rows, block_nnz=self.block_nnz,
+                        n_threads=self.n_threads)
+        return user_factors
+    
+    def recommend_folded(self, user_item_rows, k=10, memory_budget_mb=256):
+        """
+        학습에 없는 사용자 추천 (fold_in factor → factor_retrieval.topk_factor_scores, 입력 아이템 제외)
+        
+        Args:
+            user_item_rows: CSR (n_new_users × n_items), 학습 행렬과 같은 아이템 인덱스/값 척도
+            k: 추천 개수
+            memory_budget_mb: 점수 블록 메모리 예산
+        
+        Returns:
+            (n_new_users × k) 추천 아이템 배열 (원본 ID, 점수순). 상호작용 없는 행 / 후보 부족은 -1
+        """
+        user_item_rows = csr_matrix(user_item_rows)
+        top_items, _ = topk_factor_scores(self.fold_in(user_item_rows), self.item_factors, k,
+                                          exclude=user_item_rows, memory_budget_mb=memory_budget_mb)
+        top_items[np.diff(user_item_rows.indptr) == 0] = -1
+        idx_to_item = np.asarray(self.idx_to_item)
+        return np.where(top_items >= 0, idx_to_item[top_items], -1)
+    
     def recommend(self, user_id, k=10, exclude_items=None):
         """
         추천 생성
@@ -158,57 +323,131 @@ class ALSModel:
         if user_idx >= len(self.user_factors):
             return []
         
-        # 점수 계산
-        scores = self.user_factors[user_idx] @ self.item_factors.T
+        # 이미 상호작용한 아이템 + 추가 제외 아이템
+        exclude = self.user_item_matrix[user_idx:user_idx + 1]
+        if exclude_items:
+            extra = [self.item_to_idx[item] for item in exclude_items if item in self.item_to_idx]
+            exclude = exclude + csr_matrix((np.ones(len(extra)), (np.zeros(len(extra), dtype=np.int64), extra)),
+                                           shape=exclude.shape)
         
-        # 이미 상호작용한 아이템 제외
-        user_items = self.user_item_matrix[user_idx].indices
-        scores[user_items] = -np.inf
+        top_items, _ = topk_factor_scores(self.user_factors[user_idx:user_idx + 1], self.item_factors, k,
+                                          exclude=exclude)
+        return [self.idx_to_item[idx] for idx in top_items[0] if idx >= 0]
+    
+    def recommend_batch(self, user_ids, k=10, memory_budget_mb=256):
+        """
+        배치 추천 생성 (factor_retrieval.topk_factor_scores, 학습 아이템 제외)
         
-        # 추가 제외
-        if exclude_items:
-            for item in exclude_items:
-                if item in self.item_to_idx:
-                    scores[self.item_to_idx[item]] = -np.inf
+        Args:
+            user_ids: 원본 사용자 ID 배열
+            k: 추천 개수
+            memory_budget_mb: 점수 블록 메모리 예산
         
-        # Top-K
-        top_k_idx = np.argpartition(scores, -k)[-k:]
-        top_k_idx = top_k_idx[np.argsort(scores[top_k_idx])[::-1]]
+        Returns:
+            (n_users × k) 추천 아이템 배열 (원본 ID, 점수순). 학습에 없는 사용자 / 후보 부족은 -1
+        """
+        user_ids = np.asarray(user_ids)
+        user_idx = self.user_to_idx.encode(user_ids)
+        idx_to_item = np.asarray(self.idx_to_item)
+        recommendations = np.full((len(user_ids), k), -1, dtype=idx_to_item.dtype)
         
-        return [self.idx_to_item[idx] for idx in top_k_idx if scores[idx] > -np.inf][:k]
+        known = np.flatnonzero((user_idx >= 0) & (user_idx < len(self.user_factors)))
+        order = known[np.argsort(user_idx[known], kind='stable')]  # memmap factor를 순서대로 읽도록 정렬
+        rows = user_idx[order]
+        top_items, _ = topk_factor_scores(self.user_factors[rows], self.item_factors, k,
+                                          exclude=self.user_item_matrix[rows], memory_budget_mb=memory_budget_mb)
+        recommendations[order] = np.where(top_items >= 0, idx_to_item[top_items], -1)
+        return recommendations
     
     def save(self, filepath):
-        """모델 저장"""
+        """
+        모델 저장
+        
+        사용자 factor는 {파일명}_user_factors.npy로 따로 저장 (이미 그 경로의 memmap이면 flush만)
+        """
+        factors_path = os.path.splitext(filepath)[0] + '_user_factors.npy'
+        if (isinstance(self.user_factors, np.memmap)
+                and os.path.abspath(self.user_factors.filename) == os.path.abspath(factors_path)):
+            self.user_factors.flush()
+        else:
+            np.save(factors_path, np.asarray(self.user_factors, dtype=np.float32))
+        
         with open(filepath, 'wb') as f:
             pickle.dump({
-                'user_factors': self.user_factors,
+                'user_factors_file': os.path.basename(factors_path),
                 'item_factors': self.item_factors,
                 'user_to_idx': self.user_to_idx,
                 'idx_to_user': self.idx_to_user,
                 'item_to_idx': self.item_to_idx,
                 'idx_to_item': self.idx_to_item,
                 'factors': self.factors,
+                'regularization': self.regularization,
+                'alpha': self.alpha,
                 'n_users': self.n_users,
                 'n_items': self.n_items
             }, f)
         print(f"  모델 저장: {filepath}")
     
-    def load(self, filepath):
-        """모델 로드"""
+    def load(self, filepath, mmap=True):
+        """모델 로드 (mmap=True면 사용자 factor를 memory-map, 복사 없음)"""
         with open(filepath, 'rb') as f:
             data = pickle.load(f)
-        self.user_factors = data['user_factors']
+        if 'user_factors_file' in data:
+            factors_path = os.path.join(os.path.dirname(filepath), data['user_factors_file'])
+            self.user_factors = np.load(factors_path, mmap_mode='r' if mmap else None)
+        else:
+            self.user_factors = data['user_factors']  # 이전 형식
         self.item_factors = data['item_factors']
         self.user_to_idx = data['user_to_idx']
         self.idx_to_user = data['idx_to_user']
         self.item_to_idx = data['item_to_idx']
         self.idx_to_item = data['idx_to_item']
+        # dict 매핑(이전 형식)은 배열 기반 IdMapping으로 변환 (recommend_batch의 벡터화 인코딩용)
+        if not isinstance(self.user_to_idx, IdMapping):
+            self.user_to_idx = IdMapping.from_dict(self.user_to_idx)
+            self.idx_to_user = self.user_to_idx.ids
+        if not isinstance(self.item_to_idx, IdMapping):
+            self.item_to_idx = IdMapping.from_dict(self.item_to_idx)
+            self.idx_to_item = self.item_to_idx.ids
         self.factors = data['factors']
+        self.regularization = data.get('regularization', self.regularization)  # fold-in 설정 (이전 형식은 생성자 값)
+        self.alpha = data.get('alpha', self.alpha)
         self.n_users = data['n_users']
         self.n_items = data['n_items']
         return self
 
 
+def _copy_rows(src, dst, block=100_000):
+    """행 블록 단위 배열 복사 (memmap 간 복사도 블록 크기 메모리만 사용)"""
+    for start in range(0, len(src), block):
+        dst[start:start + block] = src[start:start + block]
+
+
+def sample_recall(user_factors, item_factors, train_sparse, heldout, users, k=20, block_users=256):
+    """
+    사용자 표본의 held-out Recall@K (factor_retrieval.topk_factor_scores, 학습 아이템 제외)
+
+    점수는 block_users × n_items 블록씩 계산하므로 메모리는 블록 크기 수준
+
+    Args:
+        heldout: held-out 상호작용 CSR (users × items)
+        users: 사용자 인덱스 배열
+    """
+    if len(users) == 0:
+        return 0.0
+    top_items, _ = topk_factor_scores(user_factors[users], item_factors, k,
+                                      exclude=train_sparse[users], block_users=block_users)
+
+    # Top-K 중 held-out 아이템 수 (-1 패딩은 제외)
+    actual = heldout[users].tocsr()
+    rows = np.repeat(np.arange(len(users)), top_items.shape[1])
+    valid = top_items.ravel() >= 0
+    hit = np.zeros(len(rows), dtype=bool)
+    hit[valid] = np.asarray(actual[rows[valid], top_items.ravel()[valid]]).ravel() != 0
+    hits = hit.reshape(top_items.shape).sum(axis=1)
+    return float(np.mean(hits / np.diff(actual.indptr)))
+
+
 def evaluate_als_model(model, test_df, train_sparse, k_list=[5, 10, 20], sample_size=5000):
     """ALS 모델 평가"""
     print("\n[ALS] 모델 평가 시작...")
@@ -243,12 +482,17 @@ def evaluate_als_model(model, test_df, train_sparse, k_list=[5, 10, 20], sample_
     
     print(f"  평가 대상: {len(test_user_items):,}명")
     
+    # 전체 평가 사용자 Top-max(K)를 배치로 한 번 계산 (K별로는 앞부분만 사용)
+    eval_users = list(test_user_items.keys())
+    top_items = model.recommend_batch(np.array(eval_users), max(k_list))
+    
     for k in k_list:
         recalls = []
         ndcgs = []
         
-        for user_id, actual_items in test_user_items.items():
-            rec_items = model.recommend(user_id, k)
+        for user_id, row in zip(eval_users, top_items):
+            actual_items = test_user_items[user_id]
+            rec_items = [item for item in row[:k] if item != -1]
             
             if len(rec_items) == 0:
                 continue
@@ -269,6 +513,70 @@ def evaluate_als_model(model, test_df, train_sparse, k_list=[5, 10, 20], sample_
     return results
 
 
+def evaluate_folded_users(model, split_df, k_list=[5, 10, 20], sample_size=5000, holdout_ratio=0.2, seed=42):
+    """
+    학습에 없는 사용자(사용자 기반 Valid/Test 분할) fold-in 평가
+    
+    사용자별 상호작용을 무작위로 fold-in(1 - holdout_ratio) / 정답(holdout_ratio, 최소 1개)으로 나누고,
+    fold-in 상호작용만으로 recommend_folded한 Top-K를 정답과 비교 (fold-in 아이템은 추천에서 제외)
+    
+    Args:
+        split_df: user_id / app_id 컬럼 DataFrame (valid_indexed.csv / test_indexed.csv)
+        sample_size: 평가 사용자 표본 수 (상호작용 2개 이상인 사용자 중)
+        holdout_ratio: 사용자별 정답으로 쓸 상호작용 비율
+    """
+    print("\n[ALS] Fold-in 평가 시작...")
+    
+    # 모델 아이템 인덱스로 변환 (학습에 없는 아이템 제외), 중복 상호작용 제거
+    df = pd.DataFrame({'user_id': split_df['user_id'].values,
+                       'item_idx': model.item_to_idx.encode(split_df['app_id'].values)})
+    df = df[df['item_idx'] >= 0].drop_duplicates()
+    
+    user_codes, users = pd.factorize(df['user_id'])
+    degree = np.bincount(user_codes, minlength=len(users))
+    rng = np.random.default_rng(seed)
+    candidates = np.flatnonzero(degree >= 2)
+    sampled = np.zeros(len(users), dtype=bool)
+    sampled[rng.choice(candidates, size=min(sample_size, len(candidates)), replace=False)] = True
+    
+    keep = sampled[user_codes]
+    rows = np.cumsum(sampled)[user_codes[keep]] - 1  # 표본 사용자 → 0..n_sampled-1
+    items = df['item_idx'].values[keep]
+    n_sampled = int(sampled.sum())
+    
+    # 사용자별 무작위 순위 → 앞쪽 holdout_ratio가 정답
+    order = np.lexsort((rng.random(len(rows)), rows))
+    rows, items = rows[order], items[order]
+    row_degree = np.bincount(rows, minlength=n_sampled)
+    rank = np.arange(len(rows)) - np.repeat(np.cumsum(row_degree) - row_degree, row_degree)
+    is_heldout = rank < np.maximum(1, np.round(row_degree * holdout_ratio)).astype(np.int64)[rows]
+    
+    # fold-in 행렬 (학습 행렬과 같은 binary 척도)
+    fold_rows = build_csr(rows[~is_heldout], items[~is_heldout], (n_sampled, model.n_items),
+                          {'binary': None})['binary']
+    top_items = model.recommend_folded(fold_rows, max(k_list))
+    
+    idx_to_item = np.asarray(model.idx_to_item)
+    heldout_bounds = np.concatenate([[0], np.cumsum(np.bincount(rows[is_heldout], minlength=n_sampled))])
+    heldout_items = idx_to_item[items[is_heldout]]
+    
+    print(f"  평가 대상: {n_sampled:,}명 (fold-in {fold_rows.nnz:,}, 정답 {len(heldout_items):,})")
+    
+    results = {}
+    for k in k_list:
+        recalls, ndcgs = [], []
+        for u in range(n_sampled):
+            actual = heldout_items[heldout_bounds[u]:heldout_bounds[u + 1]]
+            rec_items = [item for item in top_items[u, :k] if item != -1]
+            recalls.append(recall_at_k(rec_items, actual, k))
+            ndcgs.append(ndcg_at_k(rec_items, actual, k))
+        results[f'Recall@{k}'] = np.mean(recalls) if recalls else 0.0
+        results[f'NDCG@{k}'] = np.mean(ndcgs) if ndcgs else 0.0
+    results['n_users_evaluated'] = n_sampled
+    
+    return results
+
+
 if __name__ == "__main__":
     print("=" * 70)
     print("Phase 3 - Task 3.3: ALS 모델 구현 및 테스트")
@@ -278,22 +586,29 @@ if __name__ == "__main__":
     print("\n[Step 1] 데이터 로드")
     print("-" * 50)
     
-    train_sparse = load_npz("data_split/loo_train_sparse.npz")
+    train_sparse = load_matrix("data_split/loo_train_sparse")
     
-    with open("data_split/loo_mappings.pkl", 'rb') as f:
-        mappings = pickle.load(f)
+    mappings = load_mappings("data_split/loo_mappings")
     
     loo_test = pd.read_csv("data_split/loo_test.csv", usecols=['user_id', 'app_id'])
     
+    # LOO held-out → Recall@K 모니터 행렬 (학습 행렬과 같은 인덱스, 학습에 없는 사용자/아이템 제외)
+    heldout_users = mappings['user_to_idx'].encode(loo_test['user_id'].values)
+    heldout_items = mappings['item_to_idx'].encode(loo_test['app_id'].values)
+    known = (heldout_users >= 0) & (heldout_items >= 0)
+    monitor_matrix = csr_matrix((np.ones(known.sum(), dtype=np.float32),
+                                 (heldout_users[known], heldout_items[known])), shape=train_sparse.shape)
+    
     print(f"  Train Sparse: {train_sparse.shape}")
-    print(f"  LOO Test: {len(loo_test):,} rows")
+    print(f"  LOO Test: {len(loo_test):,} rows (모니터: {monitor_matrix.nnz:,})")
     
     # 모델 학습 (작은 설정으로)
     print("\n[Step 2] ALS 모델 학습")
     print("-" * 50)
     
-    model = ALSModel(factors=32, regularization=0.1, iterations=5, alpha=40)
-    model.fit(train_sparse, mappings)
+    model = ALSModel(factors=32, regularization=0.1, iterations=5, alpha=40,
+                     user_factors_path="models/als_model_user_factors.npy", early_stopping_rounds=2)
+    model.fit(train_sparse, mappings, monitor_matrix=monitor_matrix)
     
     # 샘플 추천 확인
     print("\n[Step 3] 샘플 추천 확인")
@@ -330,6 +645,21 @@ if __name__ == "__main__":
         else:
             print(f"    {metric}: {value:,}")
     
+    # Valid/Test 사용자 (학습에 없는 사용자) fold-in 평가
+    print("\n[Step 6] Valid/Test 사용자 fold-in 평가 (샘플 5,000명)")
+    print("-" * 50)
+    
+    folded_results = {}
+    for split_name in ['valid', 'test']:
+        split_df = pd.read_csv(f"data_split/{split_name}_indexed.csv", usecols=['user_id', 'app_id'])
+        folded_results[split_name] = evaluate_folded_users(model, split_df, k_list=[5, 10, 20], sample_size=5000)
+        print(f"\n  [{split_name.upper()}] 평가 결과:")
+        for metric, value in folded_results[split_name].items():
+            if isinstance(value, float):
+                print(f"    {metric}: {value:.4f}")
+            else:
+                print(f"    {metric}: {value:,}")
+    
     print("\n" + "=" * 70)
     print("[결과 요약]")
     print("=" * 70)
@@ -350,7 +680,12 @@ ALS 모델 구현 완료!
   - NDCG@20: {results.get('NDCG@20', 0):.4f}
   - Coverage@5: {results.get('Coverage@5', 0):.4f}
 
+Fold-in 평가 (학습에 없는 Valid/Test 사용자):
+  - Valid Recall@10: {folded_results['valid'].get('Recall@10', 0):.4f}, NDCG@10: {folded_results['valid'].get('NDCG@10', 0):.4f}
+  - Test Recall@10: {folded_results['test'].get('Recall@10', 0):.4f}, NDCG@10: {folded_results['test'].get('NDCG@10', 0):.4f}
+
 저장 파일:
   - models/als_model.pkl
+  - models/als_model_user_factors.npy (float32 사용자 factor, memory-map)
 """)
     print("=" * 70)
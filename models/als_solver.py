@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+ALS 최소제곱 풀이 (Implicit ALS Solver)
+ALSModel.fit의 사용자/아이템 half-step 계산
+
+Hu, Koren, Volinsky (2008) 업데이트를 행의 non-zero만으로 계산:
+    A_u = YᵀY + Y_uᵀ (C_u - I) Y_u + λI
+    b_u = Y_uᵀ C_u p_u
+    Y_u: 행 u가 상호작용한 아이템 factor 행만 모은 (nnz_u × f) 행렬
+YᵀY는 half-step마다 한 번만 계산하므로 행당 비용은 O(n_items·f²)가 아닌 O(nnz_u·f²)
+
+풀이 방식:
+    - exact: 블록 행들의 A_u를 (B, f, f) 배열로 모아 np.linalg.solve 한 번으로 풀이
+             (Y_uᵀ(C_u - I)Y_u는 차수 구간별 padded batched matmul, 차수가 큰 행만 행별 GEMM)
+    - cg: 이전 factor에서 시작하는 conjugate gradient 몇 step (Takács et al., 2011)
+          A를 만들지 않고 A·p = (YᵀY + λI)p + Y_uᵀ((C_u - I)(Y_u p))를 블록 전체에 벡터화하여 계산
+
+병렬 처리:
+    half-step을 행 블록으로 나눠 스레드 풀에서 처리 (블록끼리 출력 행이 겹치지 않음).
+    블록은 block_rows 행 또는 non-zero block_nnz개에서 끊음 (인기 아이템처럼 non-zero가 많은 행이 모여도
+    블록당 gather 메모리 ≈ block_nnz × f × 8 bytes × 임시 배열 수, 한 행이 더 크면 그 행 하나만 블록).
+    np.linalg.solve / BLAS 곱은 GIL을 풀기 때문에 스레드로 코어를 나눠 쓰고, 과다 구독을 막기 위해
+    threadpoolctl이 있으면 풀이 동안 BLAS 스레드를 1개로 제한함
+
+입력 행렬 형식:
+    confidence 행렬의 data는 C - 1 = alpha × R (non-zero 칸만, p = 1)
+    사용자 half-step은 users × items CSR, 아이템 half-step은 같은 행렬의 CSC 사본
+    (CSC의 indptr/indices/data는 열 기준이므로 같은 함수로 처리)
+
+대규모 학습:
+    사용자 factor는 float32 (memmap 가능) 배열로 두고, 블록마다 필요한 factor 행만 float64로 올려 계산.
+    Gram 행렬은 gram_matrix()로 블록 단위 float64 누적
+"""
+import numpy as np
+from scipy.sparse import csr_matrix
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import functools
+import os
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:  # 선택 의존성: 없으면 BLAS 스레드 수를 조정하지 않음
+    threadpool_limits = None
+
+SOLVERS = ('exact', 'cg')
+PADDED_DEGREES = (4, 32, 128, 512, 2048)  # exact 풀이에서 batched matmul로 모으는 행 차수 구간 상한
+PADDED_ENTRIES = 65_536  # batched matmul 1회의 (행 × 최대 차수) 상한 (0 채움 배열 메모리 제한)
+
+
+def confidence_matrix(user_item, alpha):
+    """
+    User-Item 행렬 → C - 1 = alpha × R 가중치 행렬 (CSR, float32)
+
+    indptr/indices는 원본 행렬(memmap 포함)을 그대로 공유하고 data만 새로 만듦.
+    implicit ALS의 confidence는 1 이상이어야 하므로 (exact 풀이의 sqrt(C - I) 포함) 음수 가중치는 거부
+    """
+    user_item = user_item.tocsr()
+    data = alpha * np.asarray(user_item.data, dtype=np.float32)
+    if len(data) and data.min() < 0:
+        raise ValueError(f"C - 1 = alpha × R이 음수인 상호작용 존재 (최소 {data.min()}, alpha={alpha})")
+    return csr_matrix((data, user_item.indices, user_item.indptr), shape=user_item.shape, copy=False)
+
+
+def confidence_weights(train_sparse, alpha):
+    """
+    학습용 가중치 행렬 쌍
+
+    Returns:
+        (users × items CSR, 아이템 half-step용 CSC 사본)
+    """
+    weights = confidence_matrix(train_sparse, alpha)
+    return weights, weights.tocsc()
+
+
+def gram_matrix(factors, regularization=0.0, block_rows=1_000_000):
+    """FᵀF + λI (행 블록 단위 float64 누적, memmap factor도 블록씩 읽음)"""
+    n_factors = factors.shape[1]
+    gram = regularization * np.eye(n_factors)
+    for start in range(0, len(factors), block_rows):
+        block = np.asarray(factors[start:start + block_rows], dtype=np.float64)
+        gram += block.T @ block
+    return gram
+
+
+def _blas_limits(n_threads):
+    """BLAS 스레드 수 제한 컨텍스트 (threadpoolctl이 없으면 아무것도 하지 않음)"""
+    if threadpool_limits is None:
+        return contextlib.nullcontext()
+    return threadpool_limits(limits=n_threads, user_api='blas')
+
+
+def row_blocks(indptr, block_rows=256, block_nnz=100_000):
+    """
+    행 블록 경계 [(start, end), ...]
+
+    블록마다 행 수 ≤ block_rows, non-zero 수 ≤ block_nnz (non-zero가 block_nnz보다 많은 행은 단독 블록)
+    """
+    n_rows = len(indptr) - 1
+    bounds = []
+    start = 0
+    while start < n_rows:
+        end = int(np.searchsorted(indptr, indptr[start] + block_nnz, side='right')) - 1
+        end = min(max(end, start + 1), start + block_rows, n_rows)
+        bounds.append((start, end))
+        start = end
+    return bounds
+
+
+def _gather_block(weights, factors, start, end):
+    """
+    행 블록 [start, end)의 non-zero factor 행과 가중치
+
+    Returns:
+        (factors_nz float64 (nnz_B × f), conf_m1 (nnz_B,), 블록 로컬 indptr, segment 합산 CSR (B × nnz_B))
+    """
+    indptr = weights.indptr
+    lo, hi = indptr[start], indptr[end]
+    local_indptr = np.asarray(indptr[start:end + 1] - lo, dtype=np.int64)
+
+    factors_nz = np.asarray(factors[weights.indices[lo:hi]], dtype=np.float64)
+    conf_m1 = np.asarray(weights.data[lo:hi], dtype=np.float64)
+    segment = csr_matrix((np.ones(hi - lo), np.arange(hi - lo), local_indptr), shape=(end - start, hi - lo))
+    return factors_nz, conf_m1, local_indptr, segment
+
+
+def _add_row_grams(A, factors_nz, conf_m1, local_indptr):
+    """
+    A[i] += Y_iᵀ (C_i - I) Y_i (블록 행별)
+
+    C_i - I ≥ 0이므로 S_i = sqrt(C_i - I) Y_i로 두면 S_iᵀ S_i (0 채움 배열 1개만 gather).
+    행을 차수 오름차순으로 정렬하고 PADDED_DEGREES 구간마다 비슷한 차수의 행을 묶어
+    (행, 최대 차수, f) 배열로 batched matmul (묶음 크기는 PADDED_ENTRIES / 구간 상한 행).
+    Python 반복은 묶음 수만큼이고, 마지막 구간보다 큰 소수의 행만 행별 GEMM
+    (행당 계산량이 커서 대부분 GIL 밖의 BLAS 시간)
+    """
+    degree = np.diff(local_indptr)
+    scaled = factors_nz * np.sqrt(conf_m1)[:, None]
+    row_order = np.argsort(degree, kind='stable')
+    sorted_degree = degree[row_order]
+
+    low = 0
+    for high in PADDED_DEGREES:
+        lo, hi = np.searchsorted(sorted_degree, [low, high], side='right')
+        low = high
+        chunk = max(1, PADDED_ENTRIES // high)
+        for c_start in range(lo, hi, chunk):
+            members = row_order[c_start:min(c_start + chunk, hi)]
+            width = int(degree[members[-1]])
+            entry = local_indptr[members][:, None] + np.arange(width)
+            padded = scaled[np.minimum(entry, len(scaled) - 1)]
+            padded[entry >= local_indptr[members + 1][:, None]] = 0
+            A[members] += np.matmul(padded.transpose(0, 2, 1), padded)
+
+    for i in np.flatnonzero(degree > PADDED_DEGREES[-1]):
+        block = scaled[local_indptr[i]:local_indptr[i + 1]]
+        A[i] += block.T @ block
+
+
+def _exact_block(weights, factors, gram, out, start, end):
+    """블록 행들의 A_u (B, f, f) / b_u (B, f)를 모아 stacked solve"""
+    factors_nz, conf_m1, local_indptr, segment = _gather_block(weights, factors, start, end)
+
+    b = segment @ (factors_nz * (1.0 + conf_m1)[:, None])
+    A = np.repeat(gram[None], end - start, axis=0)
+    _add_row_grams(A, factors_nz, conf_m1, local_indptr)
+
+    # 상호작용 없는 행은 b = 0 → 0
+    out[start:end] = np.linalg.solve(A, b[..., None])[..., 0]
+
+
+def _cg_block(weights, factors, gram, out, cg_steps, start, end):
+    """블록 행 전체에 벡터화한 conjugate gradient (행마다 독립된 CG, out에서 warm start)"""
+    factors_nz, conf_m1, local_indptr, segment = _gather_block(weights, factors, start, end)
+    rows = np.repeat(np.arange(end - start), np.diff(local_indptr))
+
+    def apply_A(P):
+        s = np.einsum('ij,ij->i', factors_nz, P[rows])
+        return P @ gram + segment @ (factors_nz * (conf_m1 * s)[:, None])
+
+    X = np.asarray(out[start:end], dtype=np.float64)
+    R = segment @ (factors_nz * (1.0 + conf_m1)[:, None]) - apply_A(X)  # 잔차 r = b - A x
+    P = R.copy()
+    rs_old = np.einsum('ij,ij->i', R, R)
+    for _ in range(cg_steps):
+        active = rs_old > 1e-20
+        if not active.any():
+            break
+        AP = apply_A(P)
+        pAp = np.einsum('ij,ij->i', P, AP)
+        step = np.where(active, rs_old / np.where(active, pAp, 1.0), 0.0)
+        X += step[:, None] * P
+        R -= step[:, None] * AP
+        rs_new = np.einsum('ij,ij->i', R, R)
+        beta = np.where(active, rs_new / np.where(active, rs_old, 1.0), 0.0)
+        P = R + beta[:, None] * P
+        rs_old = rs_new
+
+    X[np.diff(local_indptr) == 0] = 0  # 상호작용 없음: b = 0
+    out[start:end] = X
+
+
+def solve_half_step(weights, factors, regularization, out, solver='exact', cg_steps=3, gram=None,
+                    block_rows=256, block_nnz=100_000, n_threads=None):
+    """
+    half-step 풀이: 모든 행의 factor를 out에 기록
+
+    Args:
+        weights: C - 1 가중치 CSR (또는 CSC, 압축 축 = 풀이할 행)
+        factors: 고정된 상대편 factor (n_cols × f, memmap 가능)
+        regularization: L2 정규화 계수 λ
+        out: 결과를 기록할 factor 배열 (n_rows × f, solver='cg'면 warm start 값)
+        solver: 'exact' | 'cg'
+        cg_steps: solver='cg'일 때 행당 CG step 수
+        gram: 미리 계산한 FᵀF + λI (None이면 계산)
+        block_rows: 블록당 최대 행 수 (stacked solve 크기)
+        block_nnz: 블록당 최대 non-zero 수 (gather 메모리 상한, row_blocks 참고)
+        n_threads: 스레드 수 (None이면 CPU 코어 수, 1이면 현재 스레드에서 처리)
+    """
+    if solver not in SOLVERS:
+        raise ValueError(f"지원하지 않는 solver: {solver} (지원: {SOLVERS})")
+    if gram is None:
+        gram = gram_matrix(factors, regularization)
+
+    blocks = row_blocks(weights.indptr, block_rows, block_nnz)
+    n_threads = n_threads or os.cpu_count() or 1
+
+    if solver == 'cg':
+        solve_block = functools.partial(_cg_block, weights, factors, gram, out, cg_steps)
+    else:
+        solve_block = functools.partial(_exact_block, weights, factors, gram, out)
+
+    if n_threads <= 1:
+        for start, end in blocks:
+            solve_block(start, end)
+        return out
+
+    with _blas_limits(1), ThreadPoolExecutor(max_workers=n_threads) as pool:
+        for _ in pool.map(lambda bounds: solve_block(*bounds), blocks):
+            pass
+    return out
+
+
+def implicit_loss(weights, user_factors, item_factors, regularization, chunk_nnz=1_000_000):
+    """
+    Implicit ALS 목적 함수 (dense 예측 행렬 없이 계산)
+
+        L = Σ_all c_ui (p_ui - x_u·y_i)² + λ(‖X‖² + ‖Y‖²)
+          = Σ_all (x_u·y_i)² + Σ_nz [c_ui (1 - s_ui)² - s_ui²] + λ(‖X‖² + ‖Y‖²)
+        Σ_all (x_u·y_i)² = Σ (XᵀX ∘ YᵀY)  (Gram 행렬 원소곱 합)
+
+    non-zero 예측 s_ui는 chunk_nnz개씩 나눠 계산하므로 메모리는 chunk_nnz × f 수준
+
+    Args:
+        weights: C - 1 가중치 CSR (users × items)
+    """
+    user_gram = gram_matrix(user_factors)
+    item_gram = gram_matrix(item_factors)
+    loss = float(np.sum(user_gram * item_gram))
+
+    # non-zero가 약 chunk_nnz개인 행 구간 단위
+    indptr, indices, data = weights.indptr, weights.indices, weights.data
+    n_rows = len(indptr) - 1
+    row_start = 0
+    while row_start < n_rows:
+        row_end = int(np.searchsorted(indptr, indptr[row_start] + chunk_nnz, side='right')) - 1
+        row_end = min(max(row_end, row_start + 1), n_rows)
+        start, end = indptr[row_start], indptr[row_end]
+        rows = np.repeat(np.arange(row_start, row_end), np.diff(indptr[row_start:row_end + 1]))
+        s = np.einsum('ij,ij->i', np.asarray(user_factors[rows], dtype=np.float64), item_factors[indices[start:end]])
+        loss += float(np.sum((1.0 + data[start:end]) * (1.0 - s) ** 2 - s ** 2))
+        row_start = row_end
+
+    loss += regularization * (np.trace(user_gram) + np.trace(item_gram))
+    return loss
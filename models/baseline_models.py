@@ -8,13 +8,20 @@ Phase 3 - Baseline 모델 종합 구현
 """
 import pandas as pd
 import numpy as np
-from scipy.sparse import csr_matrix, load_npz
+from scipy.sparse import csr_matrix
 from sklearn.decomposition import TruncatedSVD
 from collections import defaultdict, Counter
 import pickle
 import os
 import math
 import json
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from id_mapping import load_mappings
+from sparse_utils import load_matrix
+from factor_retrieval import topk_factor_scores
 
 print("=" * 70)
 print("Phase 3 - Baseline 모델 종합 실험")
@@ -23,6 +30,8 @@ print("=" * 70)
 # ============================================================
 # 공통 함수
 # ============================================================
+K_LIST = [5, 10, 20]  # 평가 K (evaluate_model 기본값, SVD Top-K 사전 계산 크기)
+
 def recall_at_k(recommended, actual, k):
     if len(actual) == 0:
         return 0.0
@@ -38,7 +47,7 @@ def ndcg_at_k(recommended, actual, k):
     idcg = sum(1.0 / math.log2(i + 2) for i in range(min(len(actual_set), k)))
     return dcg / idcg if idcg > 0 else 0.0
 
-def evaluate_model(model_name, recommend_func, test_users, test_user_items, k_list=[5, 10, 20]):
+def evaluate_model(model_name, recommend_func, test_users, test_user_items, k_list=K_LIST):
     """모델 평가 공통 함수"""
     results = {}
     all_recommended_items = set()
@@ -79,9 +88,8 @@ loo_train = pd.read_csv("data_split/loo_train.csv", usecols=['user_id', 'app_id'
 loo_test = pd.read_csv("data_split/loo_test.csv", usecols=['user_id', 'app_id'])
 
 # Sparse Matrix 및 매핑
-train_sparse = load_npz("data_split/loo_train_sparse.npz")
-with open("data_split/loo_mappings.pkl", 'rb') as f:
-    mappings = pickle.load(f)
+train_sparse = load_matrix("data_split/loo_train_sparse")
+mappings = load_mappings("data_split/loo_mappings")
 
 # 메타데이터 (태그)
 items_meta = pd.read_csv("merged_items.csv", usecols=['app_id', 'tags_str'])
@@ -263,6 +271,23 @@ print(f"  Item factors: {item_factors.shape}")
 # 샘플 user idx 매핑
 sample_user_to_idx = {mappings['idx_to_user'][idx]: i for i, idx in enumerate(sample_idx)}
 
+# 평가 사용자 Top-max(K)를 블록 GEMM으로 한 번에 계산 (학습 아이템은 CSR 구조로 제외)
+svd_eval_users = [user_id for user_id in test_users if user_id in sample_user_to_idx]
+svd_rows = np.array([sample_user_to_idx[user_id] for user_id in svd_eval_users], dtype=np.int64)
+svd_top = {}
+svd_top_k = 0
+
+def compute_svd_top(k):
+    """평가 사용자 Top-k 재계산 (캐시보다 큰 k 요청 시)"""
+    global svd_top, svd_top_k
+    top_items, _ = topk_factor_scores(user_factors[svd_rows], item_factors, k=k,
+                                      exclude=train_sample_sparse[svd_rows])
+    svd_top = {user_id: [idx_to_item[idx] for idx in row if idx >= 0]
+               for user_id, row in zip(svd_eval_users, top_items)}
+    svd_top_k = k
+
+compute_svd_top(max(K_LIST))
+
 def svd_recommend(user_id, k):
     exclude = train_user_items.get(user_id, set())
     
@@ -271,21 +296,9 @@ def svd_recommend(user_id, k):
         # 포함 안 되면 인기 아이템
         return [item for item in all_items if item not in exclude][:k]
     
-    user_idx = sample_user_to_idx[user_id]
-    
-    # 점수 계산
-    scores = user_factors[user_idx] @ item_factors.T
-    
-    # 이미 상호작용한 아이템 제외
-    for item in exclude:
-        if item in item_to_idx:
-            scores[item_to_idx[item]] = -np.inf
-    
-    # Top-K
-    top_k_idx = np.argpartition(scores, -k)[-k:]
-    top_k_idx = top_k_idx[np.argsort(scores[top_k_idx])[::-1]]
-    
-    return [idx_to_item[idx] for idx in top_k_idx if scores[idx] > -np.inf][:k]
+    if k > svd_top_k:
+        compute_svd_top(k)
+    return svd_top[user_id][:k]
 
 svd_results = evaluate_model("TruncatedSVD", svd_recommend, test_users, test_user_items)
 
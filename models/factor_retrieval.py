@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Factor 모델 Top-K 검색 (Factor Retrieval)
+ALSModel / TruncatedSVD처럼 점수가 user_factor · item_factor인 모델의 배치 추천
+
+처리 방식:
+    1. 사용자 factor 블록 × item_factors.T (float32 GEMM) → (B × n_items) 점수 블록
+    2. 본 아이템 제외: exclude CSR 블록의 (행, 열)에 -inf를 한 번에 scatter
+    3. 2-D argpartition으로 행별 Top-K 후 K개만 정렬
+
+메모리:
+    블록 크기는 memory_budget_mb에서 계산 (사용자 1명당 점수 float32 + 부호 반전 사본 + argpartition int64)
+"""
+import numpy as np
+
+BYTES_PER_SCORE = 16  # float32 점수 + float32 -점수 + int64 argpartition 인덱스
+
+
+def block_users_for_budget(n_items, memory_budget_mb=256):
+    """메모리 예산 안에서 한 번에 점수를 계산할 사용자 수"""
+    return max(1, int(memory_budget_mb * 1024 ** 2) // (BYTES_PER_SCORE * max(n_items, 1)))
+
+
+def topk_factor_scores(user_factors, item_factors, k=10, exclude=None, memory_budget_mb=256, block_users=None):
+    """
+    사용자 factor 행 전체의 Top-K 아이템
+
+    Args:
+        user_factors: (n_users × f) factor 배열 (memmap 가능, 블록씩 float32로 읽음)
+        item_factors: (n_items × f) factor 배열
+        k: 추천 개수
+        exclude: 제외할 아이템 CSR (n_users × n_items, user_factors와 같은 행 순서, 구조만 사용)
+        memory_budget_mb: 점수 블록 메모리 예산
+        block_users: 블록 크기 직접 지정 (None이면 memory_budget_mb로 계산)
+
+    Returns:
+        (top_items int32 (n_users × k), top_scores float32 (n_users × k)) 점수 내림차순.
+        후보가 k개보다 적으면 남는 칸은 -1 / -inf
+    """
+    n_users = len(user_factors)
+    n_items = item_factors.shape[0]
+    if exclude is not None and exclude.shape != (n_users, n_items):
+        raise ValueError(f"exclude 크기 불일치: {exclude.shape} (기대: {(n_users, n_items)})")
+
+    k_eff = min(k, n_items)
+    top_items = np.full((n_users, k), -1, dtype=np.int32)
+    top_scores = np.full((n_users, k), -np.inf, dtype=np.float32)
+    if block_users is None:
+        block_users = block_users_for_budget(n_items, memory_budget_mb)
+
+    item_t = np.ascontiguousarray(np.asarray(item_factors, dtype=np.float32).T)
+    for start in range(0, n_users, block_users):
+        end = min(start + block_users, n_users)
+        scores = np.asarray(user_factors[start:end], dtype=np.float32) @ item_t
+
+        # 제외 아이템 (블록 CSR 구조 그대로 scatter)
+        if exclude is not None:
+            block = exclude[start:end]
+            scores[np.repeat(np.arange(end - start), np.diff(block.indptr)), block.indices] = -np.inf
+
+        # 행별 Top-K (점수 내림차순)
+        if k_eff < n_items:
+            top = np.argpartition(-scores, k_eff - 1, axis=1)[:, :k_eff]
+        else:
+            top = np.broadcast_to(np.arange(n_items), scores.shape)
+        block_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-block_scores, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        block_scores = np.take_along_axis(block_scores, order, axis=1)
+
+        valid = block_scores > -np.inf
+        top_items[start:end, :k_eff] = np.where(valid, top, -1)
+        top_scores[start:end, :k_eff] = block_scores
+
+    return top_items, top_scores
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+MinHash/LSH 근사 아이템 Top-K (Approximate Item Neighbors)
+ItemKNNModel.fit(fit_mode='lsh')의 후보 쌍 생성 + 정확 점수 계산
+
+처리 방식:
+    1. 아이템별 사용자 집합의 MinHash 서명 (items × n_hashes)
+         h(u) = (a × u + b) mod (2^31 - 1), 서명 = 아이템 사용자들의 h 최솟값
+    2. LSH banding: 서명을 n_bands개 band로 나누고, band 값이 같은 아이템끼리 후보 쌍
+         (band 버킷 멤버십 CSR M에 대해 M^T M의 상삼각 = 후보 쌍)
+    3. 후보 쌍만 정확 공동 출현/유사도 계산 (item_similarity.pair_similarity)
+    4. 쌍 목록에서 행별 Top-K 선택
+
+Recall/속도 조절:
+    - n_bands ↑ (band당 hash 수 ↓): 후보 쌍 ↑, recall ↑, 느려짐
+    - n_hashes ↑: 같은 band 수에서 band당 hash 수 ↑ → 후보 쌍 ↓
+    - max_bucket_size: 이보다 큰 버킷은 후보 생성에서 제외 (인기 아이템 버킷의 쌍 폭증 방지)
+    아이템-사용자 데이터는 쌍별 Jaccard가 낮으므로 기본값은 band당 hash 1개 (n_bands = n_hashes)
+    neighbor_recall_report()로 표본 아이템의 정확 Top-K 대비 recall 측정
+"""
+import numpy as np
+from scipy.sparse import csr_matrix, triu
+
+from item_similarity import weight_item_vectors, squared_norms, pair_similarity, topk_rows
+
+MERSENNE_PRIME = (1 << 31) - 1
+EMPTY_SIGNATURE = np.iinfo(np.uint32).max
+
+
+# ============================================================
+# MinHash / LSH
+# ============================================================
+def minhash_signatures(item_user, n_hashes=64, seed=42):
+    """
+    아이템별 사용자 집합 MinHash 서명
+
+    Args:
+        item_user: items × users CSR (0이 아닌 칸 = 상호작용)
+
+    Returns:
+        (n_items × n_hashes) uint32 서명 (사용자가 없는 아이템은 EMPTY_SIGNATURE)
+    """
+    n_items = item_user.shape[0]
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MERSENNE_PRIME, size=n_hashes, dtype=np.int64)
+    b = rng.integers(0, MERSENNE_PRIME, size=n_hashes, dtype=np.int64)
+
+    signatures = np.full((n_items, n_hashes), EMPTY_SIGNATURE, dtype=np.uint32)
+    nonempty = np.flatnonzero(np.diff(item_user.indptr) > 0)
+    if len(nonempty) == 0:
+        return signatures
+
+    users = item_user.indices.astype(np.int64)
+    starts = item_user.indptr[nonempty]
+    for h in range(n_hashes):
+        hashed = (a[h] * users + b[h]) % MERSENNE_PRIME
+        signatures[nonempty, h] = np.minimum.reduceat(hashed, starts)
+    return signatures
+
+
+def lsh_candidate_pairs(signatures, n_bands=64, max_bucket_size=500):
+    """
+    LSH banding 후보 쌍
+
+    Args:
+        signatures: minhash_signatures() 결과
+        n_bands: band 수 (n_hashes의 약수)
+        max_bucket_size: 이보다 큰 버킷은 후보 생성에서 제외
+
+    Returns:
+        (rows, cols, bucket_stats)
+            rows, cols: int32 배열 (rows < cols, 중복 없음)
+            bucket_stats: {'dropped_buckets': max_bucket_size 초과로 제외한 버킷 수,
+                           'dropped_memberships': 제외한 버킷의 (아이템, band) 수,
+                           'largest_bucket': 가장 큰 버킷 크기}
+    """
+    n_items, n_hashes = signatures.shape
+    if n_hashes % n_bands:
+        raise ValueError(f"n_hashes({n_hashes})는 n_bands({n_bands})로 나누어떨어져야 함")
+    rows_per_band = n_hashes // n_bands
+
+    valid_items = np.flatnonzero(signatures[:, 0] != EMPTY_SIGNATURE)
+    bucket_ids, item_ids = [], []
+    n_buckets = 0
+    bucket_stats = {'dropped_buckets': 0, 'dropped_memberships': 0, 'largest_bucket': 0}
+    for band in range(n_bands):
+        band_values = signatures[valid_items, band * rows_per_band:(band + 1) * rows_per_band]
+        _, bucket = np.unique(band_values, axis=0, return_inverse=True)
+        bucket = bucket.ravel()
+        sizes = np.bincount(bucket)
+        keep = (sizes[bucket] >= 2) & (sizes[bucket] <= max_bucket_size)
+        bucket_ids.append(bucket[keep] + n_buckets)
+        item_ids.append(valid_items[keep])
+        n_buckets += len(sizes)
+
+        oversized = (sizes >= 2) & (sizes > max_bucket_size)
+        bucket_stats['dropped_buckets'] += int(oversized.sum())
+        bucket_stats['dropped_memberships'] += int(sizes[oversized].sum())
+        bucket_stats['largest_bucket'] = max(bucket_stats['largest_bucket'], int(sizes.max(initial=0)))
+
+    bucket_ids = np.concatenate(bucket_ids)
+    item_ids = np.concatenate(item_ids)
+    membership = csr_matrix((np.ones(len(bucket_ids), dtype=np.float32), (bucket_ids, item_ids)),
+                            shape=(n_buckets, n_items))
+
+    # 한 band 이상 같은 버킷에 들어간 쌍 (상삼각만)
+    pairs = triu((membership.T @ membership).tocoo(), k=1).tocoo()
+    return pairs.row.astype(np.int32), pairs.col.astype(np.int32), bucket_stats
+
+
+def pair_cooccurrence(item_vectors, rows, cols, block_nnz=5_000_000):
+    """
+    후보 쌍 (rows[i], cols[i])의 정확 공동 출현 (아이템 벡터 내적)
+
+    블록은 쌍 개수가 아닌 gather되는 non-zero 수(두 아이템 벡터 길이 합)로 나누므로
+    인기 아이템 쌍이 몰려도 블록 메모리가 block_nnz 수준으로 유지됨 (블록당 최소 1쌍)
+    """
+    inter = np.zeros(len(rows), dtype=np.float32)
+    lengths = np.diff(item_vectors.indptr)
+    cumulative = np.concatenate([[0], np.cumsum(lengths[rows] + lengths[cols], dtype=np.int64)])
+    start = 0
+    while start < len(rows):
+        end = int(np.searchsorted(cumulative, cumulative[start] + block_nnz, side='right')) - 1
+        end = min(max(end, start + 1), len(rows))
+        left = item_vectors[rows[start:end]]
+        right = item_vectors[cols[start:end]]
+        inter[start:end] = np.asarray(left.multiply(right).sum(axis=1)).ravel()
+        start = end
+    return inter
+
+
+def pairs_topk(rows, cols, scores, n_items, k):
+    """
+    (행, 열, 점수) 쌍 목록 → 행별 Top-K 배열 (점수 내림차순, 동점은 idx 오름차순, 양수만)
+
+    Returns:
+        (neighbors int32 (n_items × k), scores float32 (n_items × k))
+    """
+    neighbors = np.full((n_items, k), -1, dtype=np.int32)
+    top_scores = np.zeros((n_items, k), dtype=np.float32)
+
+    positive = scores > 0
+    rows, cols, scores = rows[positive], cols[positive], scores[positive]
+    order = np.lexsort((cols, -scores, rows))
+    rows, cols, scores = rows[order], cols[order], scores[order]
+
+    # 행 내 순위
+    row_start = np.searchsorted(rows, np.arange(n_items))
+    rank = np.arange(len(rows)) - row_start[rows]
+    keep = rank < k
+    neighbors[rows[keep], rank[keep]] = cols[keep]
+    top_scores[rows[keep], rank[keep]] = scores[keep]
+    return neighbors, top_scores
+
+
+# ============================================================
+# 근사 Top-K 유사도
+# ============================================================
+def lsh_topk_item_similarity_multi(user_item_matrix, specs, k=50, n_hashes=64, n_bands=64,
+                                   max_bucket_size=500, seed=42, progress_every=5000):
+    """
+    MinHash/LSH 후보 쌍만 정확히 계산하는 근사 Top-K (item_similarity.topk_item_similarity_multi와 같은 형식)
+
+    후보 쌍은 사용자 집합(binary) 기준으로 한 번만 만들고, 모든 설정이 공유함
+
+    Returns:
+        ({이름: (neighbors, scores)}, 후보 통계 딕셔너리)
+    """
+    item_user = user_item_matrix.T.tocsr()
+    n_items = item_user.shape[0]
+
+    signatures = minhash_signatures(item_user, n_hashes, seed)
+    rows, cols, bucket_stats = lsh_candidate_pairs(signatures, n_bands, max_bucket_size)
+    n_valid = int((signatures[:, 0] != EMPTY_SIGNATURE).sum())
+    del signatures
+
+    n_pairs_total = n_items * (n_items - 1) // 2
+    stats = {'candidate_pairs': len(rows), 'candidate_ratio': len(rows) / max(n_pairs_total, 1),
+             'candidates_per_item': 2 * len(rows) / max(n_valid, 1), **bucket_stats}
+    if progress_every:
+        print(f"    LSH 후보 쌍: {len(rows):,} (전체 쌍의 {stats['candidate_ratio']*100:.2f}%, "
+              f"아이템당 {stats['candidates_per_item']:.1f}개)")
+        if bucket_stats['dropped_buckets']:
+            print(f"    max_bucket_size({max_bucket_size:,}) 초과 버킷 제외: {bucket_stats['dropped_buckets']:,}개 "
+                  f"({bucket_stats['dropped_memberships']:,} 아이템-band, 최대 {bucket_stats['largest_bucket']:,})")
+
+    if len(rows) == 0 and n_valid >= 2:
+        raise ValueError(f"LSH 후보 쌍이 없음 (제외 버킷 {bucket_stats['dropped_buckets']:,}개) - "
+                         f"n_bands 또는 max_bucket_size를 늘리거나 fit_mode='exact' 사용")
+    if stats['candidates_per_item'] < k:
+        print(f"  [경고] LSH 후보가 아이템당 평균 {stats['candidates_per_item']:.1f}개로 k={k}보다 적음 → "
+              f"이웃 목록이 채워지지 않음 (n_bands / max_bucket_size 증가 권장)")
+
+    # weighting별 아이템 벡터로 후보 쌍 공동 출현 계산 후 양방향 점수
+    results = {}
+    weighted = {}
+    for name, spec in specs.items():
+        weight_key = (spec['weighting'], spec.get('bm25_k1', 100.0), spec.get('bm25_b', 0.8))
+        if weight_key not in weighted:
+            item_vectors = weight_item_vectors(item_user, *weight_key)
+            weighted[weight_key] = (pair_cooccurrence(item_vectors, rows, cols), squared_norms(item_vectors))
+            del item_vectors
+        inter, sq_norms = weighted[weight_key]
+
+        forward = pair_similarity(inter, sq_norms[rows], sq_norms[cols], spec)
+        backward = pair_similarity(inter, sq_norms[cols], sq_norms[rows], spec)
+        results[name] = pairs_topk(np.concatenate([rows, cols]), np.concatenate([cols, rows]),
+                                   np.concatenate([forward, backward]), n_items, k)
+
+    return results, stats
+
+
+def neighbor_recall_report(user_item_matrix, spec, neighbors, sample_size=1000, block_size=512, seed=42):
+    """
+    표본 아이템에서 정확 Top-K 대비 근사 이웃 recall 측정
+
+    Args:
+        spec: similarity_spec() 결과
+        neighbors: 근사 이웃 배열 (n_items × k)
+        sample_size: 정확 계산할 아이템 수
+
+    Returns:
+        {'neighbor_recall', 'exact_neighbors', 'found_neighbors', 'n_sampled'}
+    """
+    n_items, k = neighbors.shape
+    item_vectors = weight_item_vectors(user_item_matrix.T.tocsr(), spec['weighting'],
+                                       spec.get('bm25_k1', 100.0), spec.get('bm25_b', 0.8))
+    user_vectors = item_vectors.T.tocsr()
+    sq_norms = squared_norms(item_vectors)
+
+    rng = np.random.default_rng(seed)
+    sample = np.sort(rng.choice(n_items, size=min(sample_size, n_items), replace=False))
+
+    exact_neighbors = np.full((n_items, k), -1, dtype=np.int32)
+    exact_scores = np.zeros((n_items, k), dtype=np.float32)
+    topk_rows(item_vectors[sample] @ user_vectors, sample, sq_norms, spec, k, block_size,
+              exact_neighbors, exact_scores)
+
+    exact_total, found = 0, 0
+    for item in sample:
+        exact = exact_neighbors[item][exact_neighbors[item] >= 0]
+        exact_total += len(exact)
+        found += len(np.intersect1d(exact, neighbors[item]))
+
+    return {
+        'neighbor_recall': found / exact_total if exact_total else 1.0,
+        'exact_neighbors': exact_total,
+        'found_neighbors': found,
+        'n_sampled': len(sample),
+    }
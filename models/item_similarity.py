@@ -0,0 +1,505 @@
+# -*- coding: utf-8 -*-
+"""
+아이템 Top-K 유사도 엔진 (Sparse Top-K Item Similarity)
+ItemKNNModel.fit의 아이템-아이템 유사도 계산
+
+처리 방식:
+    1. 아이템 벡터 (items × users)에 가중치 적용 (없음 / TF-IDF / BM25)
+    2. 아이템 블록 단위 sparse × sparse 곱으로 공동 출현 블록 C (block × items) 계산
+    3. C와 아이템 제곱 norm s로 유사도 계산 (shrink: 분모에 더하는 값)
+         cosine:             C / (sqrt(s_i) * sqrt(s_j) + shrink)
+         asymmetric_cosine:  C / (s_i^alpha * s_j^(1-alpha) + shrink)   (alpha=0.5 → cosine)
+         jaccard:            C / (s_i + s_j - C + shrink)                (binary면 교집합/합집합)
+    4. 블록 전체에 2-D argpartition으로 행별 Top-K 선택 (Python 행 루프 없음)
+    5. 미리 할당한 (items × k) int32 이웃 / float32 점수 배열에 바로 기록
+
+새 상호작용이 들어오면 update_topk()로 벡터가 바뀐 아이템과 그 영향을 받는 아이템의
+Top-K만 갱신 (전체 재계산 없음)
+
+여러 유사도 설정을 한 번에 계산할 때는 가중치가 같은 설정끼리 공동 출현 블록 C를
+한 번만 계산하고 공유하므로 새 metric을 시도해도 전체 fit을 반복하지 않음
+
+결과 배열:
+    neighbors[i]: 아이템 i의 이웃 idx (점수 내림차순, 빈 칸은 -1)
+    scores[i]: 해당 유사도 (빈 칸은 0)
+    양수 유사도만 이웃으로 유지 (기존 ItemKNN과 동일)
+
+병렬 모드 (n_workers > 1):
+    아이템/사용자 CSR 배열과 출력 배열을 shared memory에 한 번만 올리고,
+    프로세스 풀에 아이템 구간(shard)을 나눠 줌. 각 행의 계산은 다른 행과 독립이므로
+    worker 수와 무관하게 결과가 동일함
+"""
+import numpy as np
+from scipy.sparse import csr_matrix
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+import os
+
+METRICS = ('cosine', 'asymmetric_cosine', 'jaccard')
+WEIGHTINGS = (None, 'tfidf', 'bm25')
+
+
+def similarity_spec(metric='cosine', alpha=0.5, shrink=0.0, weighting=None, bm25_k1=100.0, bm25_b=0.8):
+    """
+    유사도 설정 딕셔너리 생성 (검증 포함)
+
+    Args:
+        metric: 'cosine' | 'asymmetric_cosine' | 'jaccard'
+        alpha: asymmetric_cosine 지수 (대상 아이템 쪽 norm 비중)
+        shrink: 분모에 더하는 shrinkage 값 (공동 출현이 적은 쌍의 유사도 감소)
+        weighting: None | 'tfidf' | 'bm25' (User-Item 행렬 재가중)
+        bm25_k1, bm25_b: BM25 파라미터
+    """
+    if metric not in METRICS:
+        raise ValueError(f"지원하지 않는 similarity_metric: {metric} (지원: {METRICS})")
+    if weighting not in WEIGHTINGS:
+        raise ValueError(f"지원하지 않는 weighting: {weighting} (지원: {WEIGHTINGS})")
+    spec = {'metric': metric, 'alpha': float(alpha), 'shrink': float(shrink), 'weighting': weighting}
+    if weighting == 'bm25':
+        spec.update(bm25_k1=float(bm25_k1), bm25_b=float(bm25_b))
+    return spec
+
+
+# ============================================================
+# 가중치 / 유사도 함수
+# ============================================================
+def weight_item_vectors(item_user, weighting=None, bm25_k1=100.0, bm25_b=0.8, dtype=np.float32):
+    """
+    아이템 벡터 (items × users CSR) 재가중
+
+    - None: 원본 값 그대로
+    - tfidf: sqrt(값) × idf(user),  idf = log(n_items) - log(1 + 사용자 상호작용 수)
+    - bm25: BM25 tf 포화 + 아이템 길이 정규화 × idf(user)
+    헤비 유저(많은 아이템과 상호작용)의 공동 출현 기여를 줄임
+    """
+    item_user = csr_matrix(item_user, dtype=dtype)
+    if weighting is None:
+        return item_user
+
+    n_items, n_users = item_user.shape
+    df = np.bincount(item_user.indices, minlength=n_users)
+    idf = (np.log(max(n_items, 1)) - np.log1p(df)).astype(dtype)
+    data = item_user.data
+
+    if weighting == 'tfidf':
+        weighted = np.sqrt(data) * idf[item_user.indices]
+    elif weighting == 'bm25':
+        row_sums = np.asarray(item_user.sum(axis=1)).ravel()
+        length_norm = (1.0 - bm25_b) + bm25_b * row_sums / max(row_sums.mean(), 1e-12)
+        row_of = np.repeat(np.arange(n_items), np.diff(item_user.indptr))
+        weighted = data * (bm25_k1 + 1.0) / (bm25_k1 * length_norm[row_of] + data) * idf[item_user.indices]
+    else:
+        raise ValueError(f"지원하지 않는 weighting: {weighting}")
+
+    return csr_matrix((weighted.astype(dtype), item_user.indices, item_user.indptr),
+                      shape=item_user.shape)
+
+
+def weight_user_rows(user_rows, weighting=None, n_items=None, dtype=np.float32):
+    """
+    사용자 행 (users × items CSR) 재가중 - weight_item_vectors와 같은 값
+
+    None / tfidf는 가중치가 사용자 자신의 상호작용에만 의존하므로 일부 사용자 행만
+    다시 계산할 수 있음 (bm25는 아이템 평균 길이가 전체에 의존하므로 지원 안 함)
+    """
+    user_rows = csr_matrix(user_rows, dtype=dtype)
+    if weighting is None:
+        return user_rows
+    if weighting != 'tfidf':
+        raise ValueError(f"사용자 행 단위 재가중 미지원 weighting: {weighting} (지원: None, 'tfidf')")
+
+    n_items = user_rows.shape[1] if n_items is None else n_items
+    df = np.diff(user_rows.indptr)
+    idf = (np.log(max(n_items, 1)) - np.log1p(df)).astype(dtype)
+    weighted = np.sqrt(user_rows.data) * np.repeat(idf, df)
+    return csr_matrix((weighted.astype(dtype), user_rows.indices, user_rows.indptr), shape=user_rows.shape)
+
+
+def squared_norms(item_vectors):
+    """아이템별 제곱 norm (binary면 상호작용 사용자 수)"""
+    return np.asarray(item_vectors.multiply(item_vectors).sum(axis=1)).ravel().astype(np.float32)
+
+
+def pair_similarity(inter, sq_i, sq_j, spec):
+    """
+    공동 출현 → 유사도 (원소별, broadcasting 지원)
+
+    Args:
+        inter: 공동 출현 (i, j) 값 배열, 수정하지 않음
+        sq_i: 기준 아이템 i 제곱 norm (inter와 broadcast 가능한 shape)
+        sq_j: 이웃 후보 아이템 j 제곱 norm
+        spec: similarity_spec() 결과
+    """
+    metric = spec['metric']
+    if metric == 'cosine':
+        denom = np.sqrt(sq_i) * np.sqrt(sq_j)
+    elif metric == 'asymmetric_cosine':
+        alpha = spec['alpha']
+        denom = np.power(sq_i, alpha) * np.power(sq_j, 1.0 - alpha)
+    else:  # jaccard
+        denom = sq_i + sq_j - inter
+    if spec['shrink']:
+        denom = denom + spec['shrink']
+
+    sim = np.zeros_like(inter)
+    np.divide(inter, denom, out=sim, where=denom > 0)
+    return sim
+
+
+def similarity_from_cooccurrence(inter, sq_rows, sq_all, spec):
+    """
+    공동 출현 블록 → 유사도 블록
+
+    Args:
+        inter: dense 공동 출현 (block × n_items), 수정하지 않음
+        sq_rows: 블록 아이템 제곱 norm (block,)
+        sq_all: 전체 아이템 제곱 norm (n_items,)
+        spec: similarity_spec() 결과
+    """
+    return pair_similarity(inter, sq_rows[:, None], sq_all[None, :], spec)
+
+
+def topk_block(sim, k, row_offset):
+    """
+    유사도 블록의 행별 Top-K (자기 자신 제외, 양수만)
+
+    Args:
+        sim: dense 유사도 블록 (block × n_items), 제자리 수정됨
+        k: 이웃 수
+        row_offset: 블록 첫 행의 아이템 idx (연속 구간이 아니면 행별 아이템 idx 배열)
+
+    Returns:
+        (neighbors int32 (block × k), scores float32 (block × k))
+    """
+    n_rows, n_cols = sim.shape
+    rows = np.arange(n_rows)
+    self_cols = row_offset + rows if np.ndim(row_offset) == 0 else row_offset
+    sim[rows, self_cols] = -np.inf  # 자기 자신 제외
+
+    k_eff = min(k, n_cols - 1)
+    neighbors = np.full((n_rows, k), -1, dtype=np.int32)
+    scores = np.zeros((n_rows, k), dtype=np.float32)
+    if k_eff <= 0:
+        return neighbors, scores
+
+    if k_eff < n_cols:
+        top = np.argpartition(-sim, k_eff - 1, axis=1)[:, :k_eff]
+    else:
+        top = np.broadcast_to(np.arange(n_cols), (n_rows, n_cols))
+
+    # 점수 내림차순 (동점은 idx 오름차순)
+    top = np.sort(top, axis=1)
+    top_scores = np.take_along_axis(sim, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+    positive = top_scores > 0
+    neighbors[:, :k_eff] = np.where(positive, top, -1)
+    scores[:, :k_eff] = np.where(positive, top_scores, 0)
+    return neighbors, scores
+
+
+def similarity_topk_range(item_vectors, user_vectors, sq_norms, specs, start, end, k, block_size, outputs):
+    """
+    아이템 [start, end) 구간의 Top-K 이웃을 설정별 출력 배열에 기록
+
+    Args:
+        item_vectors: (가중치 적용된) items × users CSR
+        user_vectors: item_vectors.T (users × items CSR)
+        sq_norms: 아이템 제곱 norm
+        specs: {이름: similarity_spec} (모두 같은 weighting)
+        outputs: {이름: (neighbors, scores)} (n_items × k 배열, 해당 행에 기록)
+    """
+    for b_start in range(start, end, block_size):
+        b_end = min(b_start + block_size, end)
+        inter = (item_vectors[b_start:b_end] @ user_vectors).toarray()
+        for name, spec in specs.items():
+            sim = similarity_from_cooccurrence(inter, sq_norms[b_start:b_end], sq_norms, spec)
+            neighbors, scores = outputs[name]
+            neighbors[b_start:b_end], scores[b_start:b_end] = topk_block(sim, k, b_start)
+
+
+# ============================================================
+# Shared memory
+# ============================================================
+def _share_arrays(arrays):
+    """
+    배열들을 shared memory로 복사
+
+    Returns:
+        ({이름: SharedMemory}, {이름: (shm 이름, shape, dtype)})
+    """
+    blocks, specs = {}, {}
+    for name, arr in arrays.items():
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+        blocks[name] = shm
+        specs[name] = (shm.name, arr.shape, arr.dtype.str)
+    return blocks, specs
+
+
+def _attach_arrays(specs):
+    """shared memory 배열 연결 (복사 없음, 해제는 생성한 프로세스가 담당)"""
+    blocks, arrays = [], {}
+    for name, (shm_name, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        blocks.append(shm)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    return blocks, arrays
+
+
+def _csr_from(arrays, prefix, shape):
+    return csr_matrix((arrays[f'{prefix}_data'], arrays[f'{prefix}_indices'], arrays[f'{prefix}_indptr']),
+                      shape=shape, copy=False)
+
+
+def _fit_shard(array_specs, sim_specs, n_users, n_items, k, block_size, start, end):
+    """worker: 아이템 [start, end) Top-K를 shared 출력 배열에 기록"""
+    blocks, arrays = _attach_arrays(array_specs)
+    item_vectors = _csr_from(arrays, 'item', (n_items, n_users))
+    user_vectors = _csr_from(arrays, 'user', (n_users, n_items))
+    outputs = {name: (arrays[f'neighbors_{name}'], arrays[f'scores_{name}']) for name in sim_specs}
+    similarity_topk_range(item_vectors, user_vectors, arrays['sq_norms'], sim_specs,
+                          start, end, k, block_size, outputs)
+
+    # 배열 참조를 모두 끊어야 shared memory를 닫을 수 있음
+    del item_vectors, user_vectors, outputs, arrays
+    for shm in blocks:
+        shm.close()
+    return end - start
+
+
+def _shard_ranges(n_items, n_shards, block_size):
+    """block_size 배수 경계로 아이템 구간 분할"""
+    n_blocks = -(-n_items // block_size)
+    bounds = np.linspace(0, n_blocks, min(n_shards, n_blocks) + 1).astype(int) * block_size
+    bounds = np.minimum(bounds, n_items)
+    return [(int(s), int(e)) for s, e in zip(bounds[:-1], bounds[1:]) if e > s]
+
+
+# ============================================================
+# Top-K 유사도
+# ============================================================
+def topk_item_similarity_multi(user_item_matrix, specs, k=50, block_size=512, progress_every=5000,
+                               n_workers=1):
+    """
+    여러 유사도 설정의 Top-K 이웃을 한 번에 계산
+
+    가중치(weighting)가 같은 설정끼리는 공동 출현 블록을 한 번만 계산하여 공유
+
+    Args:
+        user_item_matrix: CSR (users × items)
+        specs: {이름: similarity_spec()}
+        k: 이웃 수
+        block_size: 한 번에 처리할 아이템 수 (dense 블록 = block_size × n_items float32)
+        progress_every: 진행 상황 출력 주기 (아이템 수, 0이면 출력 안 함)
+        n_workers: 프로세스 수 (1이면 단일 프로세스, None이면 CPU 코어 수)
+
+    Returns:
+        {이름: (neighbors int32 (n_items × k), scores float32 (n_items × k))}
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    item_user = user_item_matrix.T.tocsr()
+
+    # weighting 기준으로 설정 묶기 (BM25 파라미터 포함)
+    groups = {}
+    for name, spec in specs.items():
+        weight_key = (spec['weighting'], spec.get('bm25_k1', 100.0), spec.get('bm25_b', 0.8))
+        groups.setdefault(weight_key, {})[name] = spec
+
+    results = {}
+    for (weighting, bm25_k1, bm25_b), group_specs in groups.items():
+        if len(groups) > 1 and progress_every:
+            print(f"    weighting={weighting}: {list(group_specs)}")
+        item_vectors = weight_item_vectors(item_user, weighting, bm25_k1, bm25_b)
+        user_vectors = item_vectors.T.tocsr()
+        sq_norms = squared_norms(item_vectors)
+
+        if n_workers > 1:
+            results.update(_topk_parallel(item_vectors, user_vectors, sq_norms, group_specs,
+                                          k, block_size, progress_every, n_workers))
+        else:
+            results.update(_topk_serial(item_vectors, user_vectors, sq_norms, group_specs,
+                                        k, block_size, progress_every))
+
+    return {name: results[name] for name in specs}
+
+
+def topk_item_similarity(user_item_matrix, k=50, block_size=512, progress_every=5000, n_workers=1,
+                         **spec_kwargs):
+    """
+    User-Item 행렬에서 아이템별 Top-K 이웃 계산 (설정 1개)
+
+    Args:
+        spec_kwargs: similarity_spec() 인자 (metric, alpha, shrink, weighting, ...)
+
+    Returns:
+        (neighbors int32 (n_items × k), scores float32 (n_items × k))
+    """
+    specs = {'default': similarity_spec(**spec_kwargs)}
+    return topk_item_similarity_multi(user_item_matrix, specs, k, block_size, progress_every,
+                                      n_workers)['default']
+
+
+def _empty_outputs(specs, n_items, k):
+    return {name: (np.full((n_items, k), -1, dtype=np.int32), np.zeros((n_items, k), dtype=np.float32))
+            for name in specs}
+
+
+def _topk_serial(item_vectors, user_vectors, sq_norms, specs, k, block_size, progress_every):
+    n_items = item_vectors.shape[0]
+    outputs = _empty_outputs(specs, n_items, k)
+
+    step = max(block_size, progress_every or n_items)
+    for start in range(0, n_items, step):
+        end = min(start + step, n_items)
+        similarity_topk_range(item_vectors, user_vectors, sq_norms, specs, start, end, k,
+                              block_size, outputs)
+        if progress_every:
+            print(f"    진행: {end:,}/{n_items:,} items")
+
+    return outputs
+
+
+def _topk_parallel(item_vectors, user_vectors, sq_norms, specs, k, block_size, progress_every, n_workers):
+    n_items, n_users = item_vectors.shape
+    arrays = {
+        'item_data': item_vectors.data, 'item_indices': item_vectors.indices,
+        'item_indptr': item_vectors.indptr,
+        'user_data': user_vectors.data, 'user_indices': user_vectors.indices,
+        'user_indptr': user_vectors.indptr,
+        'sq_norms': sq_norms,
+    }
+    for name, (neighbors, scores) in _empty_outputs(specs, n_items, k).items():
+        arrays[f'neighbors_{name}'] = neighbors
+        arrays[f'scores_{name}'] = scores
+    blocks, array_specs = _share_arrays(arrays)
+    del arrays, item_vectors, user_vectors
+
+    try:
+        # 인기 아이템 구간에 계산이 몰리므로 worker 수보다 잘게 나눠 부하 분산
+        shards = _shard_ranges(n_items, n_workers * 8, block_size)
+        done, next_report = 0, progress_every
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [pool.submit(_fit_shard, array_specs, specs, n_users, n_items, k, block_size, s, e)
+                       for s, e in shards]
+            for future in as_completed(futures):
+                done += future.result()
+                if progress_every and (done >= next_report or done == n_items):
+                    print(f"    진행: {done:,}/{n_items:,} items ({n_workers} workers)")
+                    next_report = (done // progress_every + 1) * progress_every
+
+        outputs = {}
+        for name in specs:
+            neighbors = np.ndarray((n_items, k), dtype=np.int32, buffer=blocks[f'neighbors_{name}'].buf)
+            scores = np.ndarray((n_items, k), dtype=np.float32, buffer=blocks[f'scores_{name}'].buf)
+            outputs[name] = (neighbors.copy(), scores.copy())
+            del neighbors, scores
+    finally:
+        for shm in blocks.values():
+            shm.close()
+            shm.unlink()
+
+    return outputs
+
+
+# ============================================================
+# 증분 갱신
+# ============================================================
+def topk_rows(cooc, rows, sq_norms, spec, k, block_size, neighbors, scores):
+    """공동 출현 행 (len(rows) × n_items sparse)으로 rows 아이템의 Top-K 재계산"""
+    for b_start in range(0, len(rows), block_size):
+        b_rows = rows[b_start:b_start + block_size]
+        inter = cooc[b_start:b_start + block_size].toarray()
+        sim = similarity_from_cooccurrence(inter, sq_norms[b_rows], sq_norms, spec)
+        neighbors[b_rows], scores[b_rows] = topk_block(sim, k, b_rows)
+
+
+def _merge_topk(cand_idx, cand_scores, k):
+    """후보 (idx, 점수) 행렬에서 행별 Top-K (점수 내림차순, 동점은 idx 오름차순, 양수만)"""
+    cand_scores = np.where(cand_idx >= 0, cand_scores, 0)
+    order = np.lexsort((cand_idx, -cand_scores), axis=-1)[:, :k]
+    top = np.take_along_axis(cand_idx, order, axis=1)
+    top_scores = np.take_along_axis(cand_scores, order, axis=1)
+
+    positive = top_scores > 0
+    return np.where(positive, top, -1).astype(np.int32), np.where(positive, top_scores, 0).astype(np.float32)
+
+
+def update_topk(user_vectors, item_vectors, sq_norms, neighbors, scores, touched, spec, block_size=512):
+    """
+    일부 아이템 벡터가 바뀐 뒤 Top-K 이웃 갱신 (neighbors / scores 제자리 수정)
+
+    touched가 아닌 아이템 쌍의 공동 출현과 norm은 그대로이므로:
+        - touched 아이템: 전체 행 재계산
+        - touched와 공동 출현하거나 이웃에 touched가 있는 아이템: 기존 이웃 + touched 유사도 병합
+        - 이웃 목록이 가득 찬 상태에서 touched 이웃 점수가 떨어진 아이템: 목록 밖 아이템이
+          들어올 수 있으므로 전체 행 재계산
+    나머지 아이템은 계산하지 않으므로 비용이 변경 규모에 비례함
+
+    Args:
+        user_vectors: 갱신된 (가중치 적용) users × items CSR
+        item_vectors: 같은 값의 items × users CSR (touched 행을 열 slicing 없이 행 slicing으로 읽음)
+        sq_norms: 갱신된 아이템 제곱 norm
+        neighbors, scores: 기존 Top-K 배열 (n_items × k)
+        touched: 벡터가 바뀐 아이템 idx 배열
+        spec: similarity_spec() 결과
+
+    Returns:
+        이웃 목록을 재계산/병합한 아이템 idx 배열
+    """
+    k = neighbors.shape[1]
+    n_items = user_vectors.shape[1]
+    touched = np.unique(np.asarray(touched, dtype=np.int64))
+    if len(touched) == 0:
+        return touched
+
+    is_touched = np.zeros(n_items, dtype=bool)
+    is_touched[touched] = True
+    old_in_touched = (neighbors >= 0) & is_touched[np.maximum(neighbors, 0)]
+
+    # touched 아이템의 공동 출현 (|T| × n_items), touched 행 재계산과 병합에 함께 사용
+    cooc = (item_vectors[touched] @ user_vectors).tocsr()
+    topk_rows(cooc, touched, sq_norms, spec, k, block_size, neighbors, scores)
+
+    # 병합 대상: touched와 공동 출현하거나 기존 이웃에 touched가 있는 아이템
+    affected = np.zeros(n_items, dtype=bool)
+    affected[cooc.indices] = True
+    affected |= old_in_touched.any(axis=1)
+    affected[touched] = False
+    merge_rows = np.flatnonzero(affected)
+
+    cooc_t = cooc.T.tocsr()  # n_items × |T|
+    full_rows = []
+    for b_start in range(0, len(merge_rows), block_size):
+        b_rows = merge_rows[b_start:b_start + block_size]
+        sim = similarity_from_cooccurrence(cooc_t[b_rows].toarray(), sq_norms[b_rows], sq_norms[touched], spec)
+
+        old_nb, old_sc, in_t = neighbors[b_rows], scores[b_rows], old_in_touched[b_rows]
+        new_of_old = np.take_along_axis(sim, np.searchsorted(touched, np.where(in_t, old_nb, touched[0])), axis=1)
+        dropped = (in_t & (new_of_old < old_sc)).any(axis=1) & (old_nb[:, -1] >= 0)
+        full_rows.append(b_rows[dropped])
+
+        cand_idx = np.concatenate([np.where(in_t, -1, old_nb), np.broadcast_to(touched, sim.shape)], axis=1)
+        cand_scores = np.concatenate([np.where(in_t, 0, old_sc), sim], axis=1)
+        neighbors[b_rows], scores[b_rows] = _merge_topk(cand_idx, cand_scores, k)
+
+    full_rows = np.concatenate(full_rows) if full_rows else np.zeros(0, dtype=np.int64)
+    if len(full_rows):
+        cooc = (item_vectors[full_rows] @ user_vectors).tocsr()
+        topk_rows(cooc, full_rows, sq_norms, spec, k, block_size, neighbors, scores)
+
+    return np.union1d(touched, merge_rows)
+
+
+def neighbors_to_csr(neighbors, scores, n_items):
+    """Top-K 이웃 배열 → items × items CSR 유사도 행렬 (빈 칸 제외)"""
+    valid = neighbors >= 0
+    counts = valid.sum(axis=1)
+    indptr = np.zeros(n_items + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+
+    matrix = csr_matrix((scores[valid], neighbors[valid], indptr), shape=(n_items, n_items))
+    matrix.sort_indices()
+    return matrix
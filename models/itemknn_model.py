@@ -2,18 +2,38 @@
 """
 Phase 3 - Task 3.2: ItemKNN 모델
 아이템 간 유사도 기반 협업 필터링
+
+모델 저장 구조 (디렉토리 1개 = 모델 1개, np.memmap으로 즉시 로드):
+    header.json     (아이템/사용자 수, k, 점수 dtype, 유사도 설정)
+    neighbors.bin   (int32, items × k, 빈 칸 -1)
+    scores.bin      (float16 또는 float32, items × k)
+    user_*.npy / item_*.npy  (IdMapping 배열)
+    interactions/   (User-Item CSR, sparse_utils memmap 형식 - recommend / update용)
+    item_sq_norms.npy  (update에서 유지하는 아이템 제곱 norm, 있을 때만)
+여러 서빙 프로세스가 OS 페이지 캐시의 같은 사본을 공유함 (기존 .pkl도 로드 가능)
 """
 import pandas as pd
 import numpy as np
-from scipy.sparse import csr_matrix, load_npz
-from sklearn.metrics.pairwise import cosine_similarity
+from scipy.sparse import csr_matrix
 from collections import defaultdict
 import pickle
+import json
 import os
 import sys
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from id_mapping import IdMapping, build_mappings, save_mappings, load_mappings
+from sparse_utils import load_matrix, replace_rows, save_csr_mmap, load_csr_mmap
+from item_lsh import lsh_topk_item_similarity_multi, neighbor_recall_report, pairs_topk
+from item_similarity import (similarity_spec, topk_item_similarity_multi, neighbors_to_csr,
+                             weight_item_vectors, weight_user_rows, squared_norms, update_topk)
+
+
+# recommend_batch 블록의 (본 아이템, 이웃) 항목당 임시 메모리
+# (이웃 idx/점수 gather, int64 키, float64 가중치, unique/inverse/합산, pairs_topk 정렬 사본)
+BATCH_BYTES_PER_ENTRY = 96
+
 
 class ItemKNNModel:
     """
@@ -25,17 +45,46 @@ class ItemKNNModel:
     - Memory-based CF (모델 프리)
     """
     
-    def __init__(self, k_neighbors=50, similarity_metric='cosine'):
+    def __init__(self, k_neighbors=50, similarity_metric='cosine', block_size=512, n_workers=1,
+                 alpha=0.5, shrink=0.0, weighting=None, fit_mode='exact', lsh_hashes=64, lsh_bands=64,
+                 lsh_max_bucket=500, recall_sample=0):
         """
         Args:
             k_neighbors: 유사 아이템 수
-            similarity_metric: 유사도 측정 방식 ('cosine')
+            similarity_metric: 유사도 측정 방식 ('cosine' | 'asymmetric_cosine' | 'jaccard')
+            block_size: 유사도 계산 블록 크기 (아이템 수)
+            n_workers: 유사도 계산 프로세스 수 (1이면 단일 프로세스, None이면 CPU 코어 수)
+            alpha: asymmetric_cosine 지수 (0.5면 cosine과 동일)
+            shrink: 유사도 분모에 더하는 shrinkage 값 (0이면 사용 안 함)
+            weighting: User-Item 행렬 재가중 (None | 'tfidf' | 'bm25')
+            fit_mode: 'exact' (전체 공동 출현) | 'lsh' (MinHash/LSH 후보 쌍만 정확 계산)
+            lsh_hashes, lsh_bands: MinHash 수 / LSH band 수 (band ↑ → 후보 ↑, recall ↑, 느려짐)
+            lsh_max_bucket: 이보다 큰 LSH 버킷은 후보 생성에서 제외
+            recall_sample: lsh 모드에서 정확 Top-K 대비 recall을 측정할 표본 아이템 수 (0이면 측정 안 함)
         """
+        similarity_spec(similarity_metric, alpha, shrink, weighting)  # 설정 검증
+        if fit_mode not in ('exact', 'lsh'):
+            raise ValueError(f"지원하지 않는 fit_mode: {fit_mode} (지원: ('exact', 'lsh'))")
         self.k_neighbors = k_neighbors
         self.similarity_metric = similarity_metric
+        self.alpha = alpha
+        self.shrink = shrink
+        self.weighting = weighting
+        self.block_size = block_size
+        self.n_workers = n_workers
+        self.fit_mode = fit_mode
+        self.lsh_hashes = lsh_hashes
+        self.lsh_bands = lsh_bands
+        self.lsh_max_bucket = lsh_max_bucket
+        self.recall_sample = recall_sample
         
-        self.item_similarity = None  # 아이템 유사도 행렬
-        self.user_item_matrix = None  # User-Item 상호작용 행렬
+        self.fit_report = {}  # lsh 모드 후보 통계 / neighbor recall
+        self._item_similarity = None  # 아이템 유사도 행렬 (item_similarity 속성, 필요할 때 생성)
+        self.neighbors = None  # (items × k) int32 이웃 idx
+        self.neighbor_scores = None  # (items × k) float32 유사도
+        self._user_item_matrix = None  # User-Item 상호작용 행렬 (user_item_matrix 속성)
+        self._update_vectors = None  # update용 가중치 적용 (users × items, items × users) CSR
+        self.item_sq_norms = None  # 아이템 제곱 norm (update에서 유지)
         self.item_to_idx = None
         self.idx_to_item = None
         self.user_to_idx = None
@@ -43,82 +92,264 @@ class ItemKNNModel:
         self.n_users = 0
         self.n_items = 0
         
-    def fit(self, train_sparse, mappings):
+    def similarity_spec(self):
+        """현재 유사도 설정 (item_similarity.similarity_spec)"""
+        return similarity_spec(self.similarity_metric, self.alpha, self.shrink, self.weighting)
+    
+    @property
+    def user_item_matrix(self):
+        """User-Item 상호작용 CSR (바꾸면 update용 가중치 벡터 / norm 캐시를 비움)"""
+        return self._user_item_matrix
+    
+    @user_item_matrix.setter
+    def user_item_matrix(self, matrix):
+        self._user_item_matrix = matrix
+        self._update_vectors = None
+        self.item_sq_norms = None
+    
+    def _weighted_vectors(self):
         """
-        학습: 아이템 유사도 행렬 계산
+        update용 가중치 적용 벡터 (users × items, items × users CSR)
         
-        Args:
-            train_sparse: CSR sparse matrix (users × items)
-            mappings: ID 매핑 딕셔너리
+        fit / load 뒤 첫 update에서 한 번만 전체 행렬로 만들고, 이후 update는 바뀐 행만 교체
         """
-        print(f"[ItemKNN] 모델 학습 시작 (k={self.k_neighbors})...")
-        
+        if self._update_vectors is None:
+            item_vectors = weight_item_vectors(self.user_item_matrix.T, self.weighting)
+            self._update_vectors = (item_vectors.T.tocsr(), item_vectors)
+        if self.item_sq_norms is None:
+            self.item_sq_norms = squared_norms(self._update_vectors[1])
+        return self._update_vectors
+    
+    def _set_data(self, train_sparse, mappings):
         self.user_item_matrix = train_sparse
         self.user_to_idx = mappings['user_to_idx']
         self.idx_to_user = mappings['idx_to_user']
         self.item_to_idx = mappings['item_to_idx']
         self.idx_to_item = mappings['idx_to_item']
         self.n_users, self.n_items = train_sparse.shape
+    
+    def _set_neighbors(self, neighbors, scores):
+        self.neighbors, self.neighbor_scores = neighbors, scores
+        self.item_sq_norms = None
+        self._item_similarity = None
+    
+    @property
+    def item_similarity(self):
+        """Sparse 유사도 행렬 (양수 유사도 이웃만, 이웃 배열에서 처음 접근할 때 생성)"""
+        if self._item_similarity is None and self.neighbors is not None:
+            self._item_similarity = neighbors_to_csr(
+                np.asarray(self.neighbors), np.asarray(self.neighbor_scores, dtype=np.float32), self.n_items
+            )
+        return self._item_similarity
+    
+    @item_similarity.setter
+    def item_similarity(self, matrix):
+        self._item_similarity = matrix
+    
+    def fit(self, train_sparse, mappings):
+        """
+        학습: 아이템 유사도 행렬 계산
         
-        print(f"  행렬 크기: {self.n_users:,} users × {self.n_items:,} items")
-        print(f"  Non-zero: {train_sparse.nnz:,}")
+        Args:
+            train_sparse: CSR sparse matrix (users × items)
+            mappings: ID 매핑 딕셔너리
+        """
+        return ItemKNNModel.fit_variants(train_sparse, mappings, {'model': self})['model']
+    
+    @staticmethod
+    def fit_variants(train_sparse, mappings, variants):
+        """
+        여러 유사도 설정을 한 번에 학습
+        
+        weighting이 같은 모델끼리는 아이템 블록별 공동 출현(교집합 크기)과 아이템 norm을
+        한 번만 계산하고 metric/alpha/shrink만 다르게 적용하므로, 설정을 추가해도
+        전체 fit을 반복하지 않음
+        
+        Args:
+            train_sparse: CSR sparse matrix (users × items)
+            mappings: ID 매핑 딕셔너리
+            variants: {이름: ItemKNNModel} (k_neighbors / block_size / n_workers / fit_mode / lsh_* 는 첫 모델 기준)
+            
+        Returns:
+            {이름: 학습된 ItemKNNModel} (User-Item 행렬과 매핑은 공유)
+        """
+        base = next(iter(variants.values()))
+        specs = {name: model.similarity_spec() for name, model in variants.items()}
         
-        # 아이템-아이템 유사도 계산 (아이템 × 사용자 행렬 필요)
-        print("  아이템 유사도 계산 중...")
+        print(f"[ItemKNN] 모델 학습 시작 (k={base.k_neighbors})...")
+        for name, spec in specs.items():
+            print(f"  {name}: {spec}")
         
-        # 아이템 벡터 = 각 아이템을 좋아한 사용자들 (items × users)
-        item_user_matrix = train_sparse.T.tocsr()
+        for model in variants.values():
+            model._set_data(train_sparse, mappings)
         
-        # Cosine 유사도 (배치 처리)
-        # 메모리 효율을 위해 Top-K만 저장
-        print(f"  유사도 행렬 계산 중 ({self.n_items:,} items)...")
+        print(f"  행렬 크기: {base.n_users:,} users × {base.n_items:,} items")
+        print(f"  Non-zero: {train_sparse.nnz:,}")
         
-        # 작은 배치로 처리
-        batch_size = 1000
-        similarity_data = []
-        similarity_rows = []
-        similarity_cols = []
+        # 아이템-아이템 유사도 계산 (공동 출현 sparse 블록 곱 1회 + 설정별 2-D Top-K)
+        print(f"  유사도 행렬 계산 중 ({base.n_items:,} items, {len(specs)}개 설정)...")
         
-        for start_idx in range(0, self.n_items, batch_size):
-            end_idx = min(start_idx + batch_size, self.n_items)
-            
-            # 배치의 아이템들과 전체 아이템의 유사도
-            batch_matrix = item_user_matrix[start_idx:end_idx]
-            batch_sim = cosine_similarity(batch_matrix, item_user_matrix)
-            
-            # 각 아이템에 대해 Top-K 유사 아이템만 저장
-            for i in range(batch_sim.shape[0]):
-                item_idx = start_idx + i
-                sim_scores = batch_sim[i]
-                
-                # 자기 자신 제외하고 Top-K
-                sim_scores[item_idx] = -1  # 자기 자신 제외
-                top_k_idx = np.argpartition(sim_scores, -self.k_neighbors)[-self.k_neighbors:]
-                
-                for neighbor_idx in top_k_idx:
-                    if sim_scores[neighbor_idx] > 0:
-                        similarity_rows.append(item_idx)
-                        similarity_cols.append(neighbor_idx)
-                        similarity_data.append(sim_scores[neighbor_idx])
+        if base.fit_mode == 'lsh':
+            results, lsh_stats = lsh_topk_item_similarity_multi(
+                train_sparse, specs, k=base.k_neighbors, n_hashes=base.lsh_hashes, n_bands=base.lsh_bands,
+                max_bucket_size=base.lsh_max_bucket
+            )
+        else:
+            results = topk_item_similarity_multi(
+                train_sparse, specs, k=base.k_neighbors, block_size=base.block_size, n_workers=base.n_workers
+            )
+        
+        for name, model in variants.items():
+            model.k_neighbors = base.k_neighbors
+            model._set_neighbors(*results[name])
+            print(f"  {name} 유사도 행렬 완료: {model.item_similarity.nnz:,} non-zero")
             
-            if (start_idx + batch_size) % 5000 == 0 or end_idx == self.n_items:
-                print(f"    진행: {end_idx:,}/{self.n_items:,} items")
+            model.fit_report = {}
+            if base.fit_mode == 'lsh':
+                model.fit_report = dict(lsh_stats)
+                if base.recall_sample:
+                    model.fit_report.update(neighbor_recall_report(
+                        train_sparse, specs[name], model.neighbors, base.recall_sample, base.block_size
+                    ))
+                    print(f"  {name} neighbor recall@{base.k_neighbors}: "
+                          f"{model.fit_report['neighbor_recall']:.4f} ({model.fit_report['n_sampled']:,} items 표본)")
+        print(f"  학습 완료!")
+        
+        return variants
+    
+    def update(self, new_interactions_csr, mappings=None):
+        """
+        새 상호작용 반영 (증분 이웃 갱신)
+        
+        새 상호작용이 있는 사용자 행만 다시 가중치를 적용하고, 그 사용자의 아이템(touched)의
+        norm과 공동 출현만 다시 계산하여 영향을 받는 아이템의 Top-K만 갱신함.
+        User-Item 행렬과 가중치 적용 벡터(users × items, items × users 사본)는 바뀐 행만
+        교체하므로(sparse_utils.replace_rows) 나머지 행은 구간 복사만 일어남.
+        가중치 적용 벡터는 fit / load 뒤 첫 update에서 한 번 만들어 이후 update에서 유지
+        (weighting='bm25'는 평균 아이템 길이가 전체에 영향을 주므로 전체 재학습)
+        
+        Args:
+            new_interactions_csr: 추가 상호작용 CSR (users × items, 기존 행렬과 같은 idx 체계).
+                                  새 사용자는 기존 사용자 뒤 행으로 추가, 같은 칸은 값 합산
+            mappings: 새 사용자를 포함한 ID 매핑 (None이면 기존 매핑 유지)
+        """
+        if self.user_item_matrix is None or self.neighbors is None:
+            raise ValueError("update()는 fit() 이후에만 사용 가능 (User-Item 행렬과 이웃 필요)")
+        
+        delta = csr_matrix(new_interactions_csr)
+        if delta.shape[1] != self.n_items:
+            raise ValueError(f"아이템 수 불일치: {delta.shape[1]:,} (모델: {self.n_items:,})")
+        delta.sum_duplicates()
+        
+        n_users = max(self.n_users, delta.shape[0])
+        mappings = mappings or {
+            'user_to_idx': self.user_to_idx, 'idx_to_user': self.idx_to_user,
+            'item_to_idx': self.item_to_idx, 'idx_to_item': self.idx_to_item,
+        }
+        
+        print(f"[ItemKNN] 증분 갱신: {delta.nnz:,} interactions")
+        
+        # 새 상호작용 사용자 행만 기존 행 + delta로 다시 만듦
+        delta_users = np.flatnonzero(np.diff(delta.indptr))
+        existing = delta_users[delta_users < self.n_users]
+        old_rows = _pad_rows(self.user_item_matrix[existing], len(delta_users))
+        merged_rows = (old_rows + delta[delta_users]).tocsr()
+        merged_rows.sum_duplicates()
+        
+        if self.weighting == 'bm25':
+            print("  weighting=bm25: 전체 재학습")
+            merged = replace_rows(self.user_item_matrix, delta_users, merged_rows, n_users)
+            return self.fit(merged, mappings)
+        
+        user_vectors, item_vectors = self._weighted_vectors()
+        
+        # touched: 값이 바뀐 아이템 (tfidf는 사용자 idf가 바뀌므로 delta 사용자의 모든 아이템)
+        weighted_rows = weight_user_rows(merged_rows, self.weighting, self.n_items)
+        touched = np.unique(delta.indices[delta.data != 0])
+        if self.weighting == 'tfidf':
+            touched = np.union1d(touched, merged_rows.indices)
         
-        # Sparse 유사도 행렬 생성
-        self.item_similarity = csr_matrix(
-            (similarity_data, (similarity_rows, similarity_cols)),
-            shape=(self.n_items, self.n_items)
+        # items × users 사본의 touched 행: delta 사용자 항목을 빼고 새 가중치 값으로 다시 채움
+        old_t = item_vectors[touched].tocoo()
+        keep = ~np.isin(old_t.col, delta_users)
+        new_t = weighted_rows.tocoo()
+        in_touched = np.isin(new_t.col, touched)
+        touched_rows = csr_matrix(
+            (np.concatenate([old_t.data[keep], new_t.data[in_touched]]),
+             (np.concatenate([old_t.row[keep], np.searchsorted(touched, new_t.col[in_touched])]),
+              np.concatenate([old_t.col[keep], delta_users[new_t.row[in_touched]]]))),
+            shape=(len(touched), n_users)
         )
+        touched_rows.sort_indices()
         
-        print(f"  유사도 행렬 완료: {len(similarity_data):,} non-zero")
-        print(f"  학습 완료!")
+        user_vectors = replace_rows(user_vectors, delta_users, weighted_rows, n_users)
+        item_vectors = replace_rows(item_vectors, touched, touched_rows)
+        
+        # memmap으로 로드한 모델은 read-only이므로 메모리 사본에서 갱신
+        if not (self.neighbors.flags.writeable and self.neighbor_scores.flags.writeable):
+            self.neighbors = np.array(self.neighbors, dtype=np.int32)
+            self.neighbor_scores = np.array(self.neighbor_scores, dtype=np.float32)
+        
+        # 아이템 norm: touched 행만 갱신
+        item_sq_norms = self.item_sq_norms
+        item_sq_norms[touched] = squared_norms(touched_rows)
+        
+        updated = update_topk(user_vectors, item_vectors, item_sq_norms, self.neighbors, self.neighbor_scores,
+                              touched, self.similarity_spec(), self.block_size)
+        
+        self.user_item_matrix = replace_rows(self.user_item_matrix, delta_users, merged_rows, n_users)
+        self._update_vectors = (user_vectors, item_vectors)
+        self.item_sq_norms = item_sq_norms
+        self.user_to_idx = mappings['user_to_idx']
+        self.idx_to_user = mappings['idx_to_user']
+        self.item_to_idx = mappings['item_to_idx']
+        self.idx_to_item = mappings['idx_to_item']
+        self.n_users = n_users
+        self.item_similarity = None
         
+        print(f"  변경 아이템: {len(touched):,}, 이웃 갱신 아이템: {len(updated):,}/{self.n_items:,}")
         return self
     
+    def _topk_from_seen(self, indptr, seen_items, k):
+        """
+        본 아이템 CSR 구조 → 행별 Top-K 아이템 idx (recommend / recommend_batch 공통)
+        
+        본 아이템들의 이웃 행을 gather하여 (행, 이웃 아이템)별 점수를 입력 순서대로 float64 합산하고,
+        본 아이템을 제외한 양수 점수만 후보로 점수 내림차순, 동점은 아이템 idx 오름차순 정렬
+        (item_lsh.pairs_topk). dense (행 × n_items) 배열을 만들지 않음
+        
+        Args:
+            indptr: 행별 본 아이템 구간 (CSR indptr)
+            seen_items: 본 아이템 idx (CSR indices)
+            k: 추천 개수
+        
+        Returns:
+            (n_rows × k) int32 아이템 idx (후보 부족은 -1)
+        """
+        n_rows = len(indptr) - 1
+        seen_rows = np.repeat(np.arange(n_rows, dtype=np.int64), np.diff(indptr))
+        
+        neighbors = self.neighbors[seen_items]
+        valid = neighbors >= 0
+        keys = (seen_rows[:, None] * self.n_items + neighbors)[valid]
+        weights = np.asarray(self.neighbor_scores[seen_items], dtype=np.float64)[valid]
+        
+        # (행, 아이템)별 합산 (bincount는 입력 순서대로 누적하므로 단일 사용자 경로와 같은 값)
+        keys, inverse = np.unique(keys, return_inverse=True)
+        sums = np.bincount(inverse.ravel(), weights=weights, minlength=len(keys))
+        
+        # 본 아이템은 점수 0 (양수만 후보)
+        sums[np.isin(keys, seen_rows * self.n_items + seen_items)] = 0
+        
+        top, _ = pairs_topk(keys // self.n_items, keys % self.n_items, sums, n_rows, k)
+        return top
+    
     def recommend(self, user_id, k=10, exclude_items=None):
         """
         추천 생성
         
+        recommend_batch와 같은 점수 합산 / 후보(양수 점수) / 동점 순서(아이템 idx 오름차순)
+        
         Args:
             user_id: 원본 사용자 ID
             k: 추천 개수
@@ -133,69 +364,232 @@ class ItemKNNModel:
         
         user_idx = self.user_to_idx[user_id]
         
-        # 사용자가 상호작용한 아이템들
-        user_items = self.user_item_matrix[user_idx].indices
+        # 사용자가 상호작용한 아이템들 (CSR 행 구간 직접 참조)
+        indptr = self.user_item_matrix.indptr
+        user_items = self.user_item_matrix.indices[indptr[user_idx]:indptr[user_idx + 1]]
         
         if len(user_items) == 0:
             return []
         
-        # 상호작용한 아이템들의 유사 아이템 점수 합산
-        scores = np.zeros(self.n_items)
-        
-        for item_idx in user_items:
-            # 해당 아이템과 유사한 아이템들
-            sim_row = self.item_similarity[item_idx].toarray().flatten()
-            scores += sim_row
+        # 상호작용한 아이템들의 이웃 점수 합산 (고정 폭 이웃 배열 행을 gather, 호출마다 새 배열 - 스레드 안전)
+        neighbors = self.neighbors[user_items]
+        valid = neighbors >= 0
+        scores = np.bincount(neighbors[valid], weights=np.asarray(self.neighbor_scores[user_items],
+                                                                  dtype=np.float64)[valid],
+                             minlength=self.n_items)
         
-        # 이미 상호작용한 아이템 제외
-        scores[user_items] = -np.inf
-        
-        # 추가 제외 아이템
+        # 이미 상호작용한 아이템 / 추가 제외 아이템 (양수 점수만 후보)
+        scores[user_items] = 0
         if exclude_items:
             for item in exclude_items:
                 if item in self.item_to_idx:
-                    scores[self.item_to_idx[item]] = -np.inf
-        
-        # Top-K 아이템 선택
-        top_k_idx = np.argpartition(scores, -k)[-k:]
-        top_k_idx = top_k_idx[np.argsort(scores[top_k_idx])[::-1]]
-        
-        # Index → 원본 ID
-        recommendations = [self.idx_to_item[idx] for idx in top_k_idx if scores[idx] > -np.inf]
-        
-        return recommendations[:k]
-    
-    def save(self, filepath):
-        """모델 저장"""
-        with open(filepath, 'wb') as f:
-            pickle.dump({
-                'item_similarity': self.item_similarity,
-                'user_to_idx': self.user_to_idx,
-                'idx_to_user': self.idx_to_user,
-                'item_to_idx': self.item_to_idx,
-                'idx_to_item': self.idx_to_item,
-                'k_neighbors': self.k_neighbors,
-                'n_users': self.n_users,
-                'n_items': self.n_items
-            }, f)
-        print(f"  모델 저장: {filepath}")
-    
-    def load(self, filepath):
-        """모델 로드"""
+                    scores[self.item_to_idx[item]] = 0
+        
+        # Top-K 후보: k번째 점수 이상만 남긴 뒤 (점수 내림차순, idx 오름차순) 정렬 - recommend_batch와 동일
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            threshold = np.partition(scores[candidates], -k)[-k]
+            candidates = candidates[scores[candidates] >= threshold]
+        top, _ = pairs_topk(np.zeros(len(candidates), dtype=np.int64), candidates, scores[candidates], 1, k)
+        return [self.idx_to_item[idx] for idx in top[0] if idx >= 0]
+    
+    def recommend_batch(self, user_ids, k=10, memory_budget_mb=256, block_size=None):
+        """
+        배치 추천 생성
+        
+        사용자 블록 단위로 본 아이템들의 이웃 행을 gather하여 (사용자, 이웃) 점수를 합산하고,
+        본 아이템을 제외한 양수 점수 후보에서 행별 Top-K 선택 (recommend와 같은 결과)
+        
+        블록 메모리는 (본 아이템 수 × k_neighbors)개 항목의 gather/합산/정렬 임시 배열이 차지하므로,
+        블록은 이 항목 수가 memory_budget_mb / BATCH_BYTES_PER_ENTRY 이하가 되도록 사용자 차수 누적으로 나눔
+        
+        Args:
+            user_ids: 원본 사용자 ID 배열
+            k: 추천 개수
+            memory_budget_mb: 블록 임시 배열 메모리 예산
+            block_size: 한 번에 처리할 사용자 수 직접 지정 (None이면 memory_budget_mb로 계산)
+            
+        Returns:
+            (n_users × k) int32 추천 아이템 배열 (원본 ID, 점수순). Cold user / 후보 부족은 -1
+        """
+        user_ids = np.asarray(user_ids)
+        user_idx = self.user_to_idx.encode(user_ids)
+        recommendations = np.full((len(user_ids), k), -1, dtype=np.int32)
+        idx_to_item = np.asarray(self.idx_to_item)
+        
+        known = np.flatnonzero(user_idx >= 0)
+        indptr = self.user_item_matrix.indptr
+        degrees = (indptr[user_idx[known] + 1] - indptr[user_idx[known]]).astype(np.int64)
+        if block_size is None:
+            max_entries = max(1, int(memory_budget_mb * 1024 ** 2) // BATCH_BYTES_PER_ENTRY)
+            bounds = _degree_blocks(degrees * self.neighbors.shape[1], max_entries)
+        else:
+            bounds = [(s, min(s + block_size, len(known))) for s in range(0, len(known), block_size)]
+        
+        for b_start, b_end in bounds:
+            rows = known[b_start:b_end]
+            block = self.user_item_matrix[user_idx[rows]]
+            top = self._topk_from_seen(block.indptr, block.indices, k)
+            recommendations[rows] = np.where(top >= 0, idx_to_item[top], -1)
+        
+        return recommendations
+    
+    def save(self, dirpath, score_dtype='float32'):
+        """
+        모델 저장 (memory-map 디렉토리 형식)
+        
+        Args:
+            dirpath: 저장 디렉토리
+            score_dtype: 유사도 점수 dtype ('float32' | 'float16', float16이면 점수 파일 크기 절반)
+        """
+        score_dtype = np.dtype(score_dtype)
+        if score_dtype not in (np.float16, np.float32):
+            raise ValueError(f"지원하지 않는 score_dtype: {score_dtype} (지원: float16, float32)")
+        
+        os.makedirs(dirpath, exist_ok=True)
+        np.ascontiguousarray(self.neighbors, dtype=np.int32).tofile(os.path.join(dirpath, 'neighbors.bin'))
+        np.ascontiguousarray(self.neighbor_scores, dtype=score_dtype).tofile(os.path.join(dirpath, 'scores.bin'))
+        
+        # dict 매핑(이전 형식)은 배열 기반 IdMapping으로 변환
+        user_mapping, item_mapping = self.user_to_idx, self.item_to_idx
+        if not isinstance(user_mapping, IdMapping):
+            user_mapping = IdMapping.from_dict(user_mapping)
+        if not isinstance(item_mapping, IdMapping):
+            item_mapping = IdMapping.from_dict(item_mapping)
+        save_mappings(dirpath, build_mappings(user_mapping, item_mapping))
+        
+        # recommend / update에 필요한 상호작용 행렬과 update에서 유지하는 norm
+        if self.user_item_matrix is not None:
+            save_csr_mmap(os.path.join(dirpath, 'interactions'), self.user_item_matrix)
+        if self.item_sq_norms is not None:
+            np.save(os.path.join(dirpath, 'item_sq_norms.npy'), self.item_sq_norms)
+        
+        header = {
+            'format': 'itemknn',
+            'n_users': int(self.n_users),
+            'n_items': int(self.n_items),
+            'k_neighbors': int(self.neighbors.shape[1]),
+            'score_dtype': score_dtype.name,
+            'similarity_metric': self.similarity_metric,
+            'alpha': self.alpha,
+            'shrink': self.shrink,
+            'weighting': self.weighting,
+            'fit_mode': self.fit_mode,
+            'fit_report': self.fit_report,
+            'has_interactions': self.user_item_matrix is not None,
+            'has_item_sq_norms': self.item_sq_norms is not None,
+        }
+        with open(os.path.join(dirpath, 'header.json'), 'w', encoding='utf-8') as f:
+            json.dump(header, f, indent=2)
+        print(f"  모델 저장: {dirpath}")
+    
+    def load(self, path):
+        """
+        모델 로드
+        
+        디렉토리면 np.memmap으로 열어 복사 없이 사용 (read-only), .pkl이면 이전 pickle 형식.
+        상호작용 행렬 / 아이템 norm이 저장된 모델은 함께 복원하므로 바로 recommend / update 가능
+        (이전 형식은 user_item_matrix를 다시 지정해야 함)
+        """
+        if not os.path.isdir(path):
+            return self._load_pickle(path)
+        
+        with open(os.path.join(path, 'header.json'), 'r', encoding='utf-8') as f:
+            header = json.load(f)
+        
+        shape = (header['n_items'], header['k_neighbors'])
+        self.neighbors = np.memmap(os.path.join(path, 'neighbors.bin'), dtype=np.int32, mode='r', shape=shape)
+        self.neighbor_scores = np.memmap(os.path.join(path, 'scores.bin'), dtype=np.dtype(header['score_dtype']),
+                                         mode='r', shape=shape)
+        self._item_similarity = None
+        
+        # 상호작용 행렬 지정 시 norm 캐시가 비워지므로 norm은 그 뒤에 복원
+        self.user_item_matrix = None
+        if header.get('has_interactions'):
+            self.user_item_matrix = load_csr_mmap(os.path.join(path, 'interactions'))
+        if header.get('has_item_sq_norms'):
+            self.item_sq_norms = np.load(os.path.join(path, 'item_sq_norms.npy'))
+        
+        mappings = load_mappings(path)
+        self.user_to_idx = mappings['user_to_idx']
+        self.idx_to_user = mappings['idx_to_user']
+        self.item_to_idx = mappings['item_to_idx']
+        self.idx_to_item = mappings['idx_to_item']
+        
+        self.k_neighbors = header['k_neighbors']
+        self.similarity_metric = header['similarity_metric']
+        self.alpha = header['alpha']
+        self.shrink = header['shrink']
+        self.weighting = header['weighting']
+        self.fit_mode = header['fit_mode']
+        self.fit_report = header['fit_report']
+        self.n_users = header['n_users']
+        self.n_items = header['n_items']
+        print(f"  모델 로드: {path}")
+        return self
+    
+    def _load_pickle(self, filepath):
+        """이전 pickle 형식 로드 (이웃 배열이 없으면 유사도 행렬에서 생성)"""
         with open(filepath, 'rb') as f:
             data = pickle.load(f)
-        self.item_similarity = data['item_similarity']
         self.user_to_idx = data['user_to_idx']
         self.idx_to_user = data['idx_to_user']
         self.item_to_idx = data['item_to_idx']
         self.idx_to_item = data['idx_to_item']
+        # dict 매핑(이전 형식)은 배열 기반 IdMapping으로 변환 (recommend_batch의 벡터화 인코딩용)
+        if not isinstance(self.user_to_idx, IdMapping):
+            self.user_to_idx = IdMapping.from_dict(self.user_to_idx)
+            self.idx_to_user = self.user_to_idx.ids
+        if not isinstance(self.item_to_idx, IdMapping):
+            self.item_to_idx = IdMapping.from_dict(self.item_to_idx)
+            self.idx_to_item = self.item_to_idx.ids
         self.k_neighbors = data['k_neighbors']
+        self.similarity_metric = data.get('similarity_metric', 'cosine')
+        self.alpha = data.get('alpha', 0.5)
+        self.shrink = data.get('shrink', 0.0)
+        self.weighting = data.get('weighting')
+        self.fit_mode = data.get('fit_mode', 'exact')
+        self.fit_report = data.get('fit_report', {})
         self.n_users = data['n_users']
         self.n_items = data['n_items']
+        
+        self.neighbors = data.get('neighbors')
+        self.neighbor_scores = data.get('neighbor_scores')
+        if self.neighbors is None:
+            similarity = data['item_similarity'].tocoo()
+            self.neighbors, self.neighbor_scores = pairs_topk(
+                similarity.row, similarity.col, similarity.data.astype(np.float32), self.n_items, self.k_neighbors
+            )
+        self._item_similarity = data.get('item_similarity')
+        self.item_sq_norms = None
         print(f"  모델 로드: {filepath}")
         return self
 
 
+def _degree_blocks(entries, max_entries):
+    """
+    사용자별 항목 수 → 블록 경계 [(start, end), ...] (블록 항목 합 ≤ max_entries, 블록당 최소 1명)
+    """
+    cumulative = np.concatenate([[0], np.cumsum(entries)])
+    bounds = []
+    start = 0
+    while start < len(entries):
+        end = int(np.searchsorted(cumulative, cumulative[start] + max_entries, side='right')) - 1
+        end = min(max(end, start + 1), len(entries))
+        bounds.append((start, end))
+        start = end
+    return bounds
+
+
+def _pad_rows(matrix, n_rows):
+    """CSR 행렬 뒤에 빈 행 추가 (복사 없이 indptr만 확장)"""
+    matrix = csr_matrix(matrix)
+    if matrix.shape[0] >= n_rows:
+        return matrix
+    indptr = np.concatenate([matrix.indptr, np.full(n_rows - matrix.shape[0], matrix.indptr[-1])])
+    return csr_matrix((matrix.data, matrix.indices, indptr), shape=(n_rows, matrix.shape[1]))
+
+
 def evaluate_itemknn_model(model, test_df, train_sparse, k_list=[5, 10, 20], sample_size=10000):
     """
     ItemKNN 모델 평가
@@ -242,17 +636,22 @@ def evaluate_itemknn_model(model, test_df, train_sparse, k_list=[5, 10, 20], sam
     
     print(f"  평가 대상: {len(test_user_items):,}명")
     
+    # 최대 K로 한 번에 배치 추천 (작은 K는 앞부분 사용)
+    eval_users = list(test_user_items.keys())
+    batch_recs = model.recommend_batch(eval_users, k=max(k_list))
+    
     evaluated = 0
     for k in k_list:
         recalls = []
         ndcgs = []
         
-        for user_id, actual_items in test_user_items.items():
-            rec_items = model.recommend(user_id, k)
+        for user_id, rec_row in zip(eval_users, batch_recs):
+            rec_items = [item for item in rec_row[:k].tolist() if item >= 0]
             
             if len(rec_items) == 0:
                 continue  # Cold user 스킵
             
+            actual_items = test_user_items[user_id]
             recalls.append(recall_at_k(rec_items, actual_items, k))
             ndcgs.append(ndcg_at_k(rec_items, actual_items, k))
             
@@ -283,10 +682,9 @@ if __name__ == "__main__":
     print("\n[Step 1] 데이터 로드")
     print("-" * 50)
     
-    train_sparse = load_npz("data_split/loo_train_sparse.npz")
+    train_sparse = load_matrix("data_split/loo_train_sparse")
     
-    with open("data_split/loo_mappings.pkl", 'rb') as f:
-        mappings = pickle.load(f)
+    mappings = load_mappings("data_split/loo_mappings")
     
     loo_test = pd.read_csv("data_split/loo_test.csv", usecols=['user_id', 'app_id'])
     
@@ -297,7 +695,7 @@ if __name__ == "__main__":
     print("\n[Step 2] ItemKNN 모델 학습")
     print("-" * 50)
     
-    model = ItemKNNModel(k_neighbors=50)
+    model = ItemKNNModel(k_neighbors=50, n_workers=None)
     model.fit(train_sparse, mappings)
     
     # 샘플 추천 확인
@@ -314,7 +712,7 @@ if __name__ == "__main__":
     print("\n[Step 4] 모델 저장")
     print("-" * 50)
     
-    model.save("models/itemknn_model.pkl")
+    model.save("models/itemknn_model")
     
     # 평가
     print("\n[Step 5] 모델 평가 (샘플 10,000명)")
@@ -357,7 +755,7 @@ ItemKNN 모델 구현 완료!
   - 평가된 사용자: {results.get('n_users_evaluated', 0):,}명
 
 저장 파일:
-  - models/itemknn_model.pkl
+  - models/itemknn_model/ (memory-map 디렉토리)
 """)
     print("=" * 70)
 
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+병렬 청크 처리 (Parallel Chunk Scan)
+recommendations.csv(또는 columnar 저장소)를 구간으로 나눠 프로세스 풀에서 병렬 처리
+
+구성:
+    - csv_byte_ranges(): CSV를 줄 경계에 맞춘 바이트 구간으로 분할
+    - store_row_ranges(): columnar 저장소를 행 구간으로 분할
+    - read_range(): 구간 1개를 DataFrame 청크로 순회
+    - parallel_map(): 구간별 작업을 프로세스 풀에서 실행 (결과는 구간 순서 유지)
+    - parallel_scan(): 구간마다 ScanEngine을 만들어 집계 후 결합 법칙이 성립하는 merge로 병합
+
+집계기 merge()는 결합 법칙이 성립하므로 구간 분할/처리 순서와 무관하게
+단일 프로세스 스캔과 같은 결과가 나옴 (ReservoirSample은 구간별 시드 사용)
+
+fork를 지원하지 않는 플랫폼(Windows 등)에서는 task 스크립트가 모듈 최상위에서
+실행되므로 spawn 방식 풀을 쓰지 않고 단일 프로세스로 처리함
+"""
+import pandas as pd
+import numpy as np
+import multiprocessing
+import functools
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from interaction_store import REC_FILE, STORE_DIR, store_exists, load_meta, load_columns, decode_dates
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+PART_BYTES = 64 * 1024 * 1024   # CSV 구간 크기 (약 1.4M rows)
+PART_ROWS = 2_000_000           # 저장소 구간 크기
+
+
+# ============================================================
+# 구간 분할
+# ============================================================
+def csv_byte_ranges(csv_path=REC_FILE, part_bytes=PART_BYTES):
+    """
+    CSV를 줄 경계에 맞춘 바이트 구간으로 분할
+
+    각 경계를 다음 줄 시작 위치로 옮기므로 한 행이 두 구간에 걸치지 않음
+
+    Returns:
+        [{'kind': 'csv', 'path', 'start', 'end', 'names'}, ...]
+    """
+    file_size = os.path.getsize(csv_path)
+
+    with open(csv_path, 'rb') as f:
+        header = f.readline()
+        names = header.decode('utf-8').strip().split(',')
+        data_start = f.tell()
+
+        bounds = [data_start]
+        pos = data_start + part_bytes
+        while pos < file_size:
+            f.seek(pos)
+            f.readline()  # 현재 줄의 끝까지 이동
+            pos = f.tell()
+            if pos >= file_size:
+                break
+            bounds.append(pos)
+            pos += part_bytes
+        bounds.append(file_size)
+
+    return [{'kind': 'csv', 'path': csv_path, 'start': s, 'end': e, 'names': names}
+            for s, e in zip(bounds[:-1], bounds[1:]) if e > s]
+
+
+def store_row_ranges(store_dir=STORE_DIR, part_rows=PART_ROWS):
+    """
+    columnar 저장소를 행 구간으로 분할
+
+    Returns:
+        [{'kind': 'store', 'store_dir', 'start', 'end'}, ...]
+    """
+    n_rows = load_meta(store_dir)['n_rows']
+    return [{'kind': 'store', 'store_dir': store_dir, 'start': s, 'end': min(s + part_rows, n_rows)}
+            for s in range(0, n_rows, part_rows)]
+
+
+def scan_ranges(csv_path=REC_FILE, store_dir=STORE_DIR):
+    """최신 저장소가 있으면 행 구간, 없거나 CSV가 갱신되었으면 CSV 바이트 구간 (read_interaction_chunks와 같은 우선순위)"""
+    if store_exists(store_dir, csv_path):
+        return store_row_ranges(store_dir)
+    return csv_byte_ranges(csv_path)
+
+
+# ============================================================
+# 구간 읽기
+# ============================================================
+def read_range(spec, columns=None, chunk_size=2_000_000):
+    """
+    구간 1개를 DataFrame 청크로 순회
+
+    Args:
+        spec: csv_byte_ranges() / store_row_ranges()의 원소
+        columns: 읽을 컬럼 (None이면 전체)
+        chunk_size: 구간 내 청크 크기 (행)
+    """
+    if spec['kind'] == 'store':
+        arrays = load_columns(columns, spec['store_dir'])
+        for start in range(spec['start'], spec['end'], chunk_size):
+            end = min(start + chunk_size, spec['end'])
+            chunk = {}
+            for name, arr in arrays.items():
+                values = np.asarray(arr[start:end])
+                chunk[name] = decode_dates(values) if name == 'date' else values
+            yield pd.DataFrame(chunk, index=pd.RangeIndex(start, end))
+        return
+
+    with open(spec['path'], 'rb') as f:
+        f.seek(spec['start'])
+        buf = f.read(spec['end'] - spec['start'])
+
+    yield from pd.read_csv(io.BytesIO(buf), header=None, names=spec['names'],
+                           usecols=columns, chunksize=chunk_size)
+
+
+# ============================================================
+# 프로세스 풀
+# ============================================================
+def _pool_context():
+    """fork 가능하면 fork 컨텍스트, 아니면 None (단일 프로세스 처리)"""
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return None
+
+
+def parallel_map(func, specs, n_workers=None):
+    """
+    구간별 작업 병렬 실행
+
+    Args:
+        func: func(index, spec) → 결과 (pickle 가능해야 함)
+        specs: 구간 리스트
+        n_workers: 프로세스 수 (None이면 CPU 코어 수)
+
+    Returns:
+        구간 순서대로 정렬된 결과 리스트
+    """
+    n_workers = min(n_workers or DEFAULT_WORKERS, len(specs))
+    context = _pool_context()
+
+    if n_workers <= 1 or context is None:
+        return [func(i, spec) for i, spec in enumerate(specs)]
+
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=context) as pool:
+        return list(pool.map(func, range(len(specs)), specs))
+
+
+# ============================================================
+# 병렬 스캔
+# ============================================================
+def _scan_range(engine_factory, chunk_size, index, spec):
+    engine = engine_factory()
+    engine.reseed(index)
+    for chunk in read_range(spec, engine.columns(), chunk_size):
+        engine.update(chunk)
+    return engine
+
+
+def parallel_scan(engine_factory, n_workers=None, chunk_size=2_000_000,
+                  csv_path=REC_FILE, store_dir=STORE_DIR):
+    """
+    구간별 ScanEngine 집계 후 병합
+
+    Args:
+        engine_factory: 빈 ScanEngine을 반환하는 함수 (pickle 가능, functools.partial 등)
+        n_workers: 프로세스 수 (None이면 CPU 코어 수)
+        chunk_size: 구간 내 청크 크기
+
+    Returns:
+        병합된 ScanEngine
+    """
+    specs = scan_ranges(csv_path, store_dir)
+    if not specs:
+        return engine_factory()
+
+    engines = parallel_map(functools.partial(_scan_range, engine_factory, chunk_size),
+                           specs, n_workers)
+    return functools.reduce(lambda a, b: a.merge(b), engines)
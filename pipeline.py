@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+"""
+Task 파이프라인 실행기 (Artifact Cache + 의존성 기반 실행)
+
+각 task 스크립트의 입력/출력 파일을 선언하고, 입력 파일 상태 + 스크립트(및 import하는
+로컬 모듈) 소스 + 파라미터로 fingerprint를 계산하여 data_store/pipeline_manifest.json에 기록.
+fingerprint가 같고 출력이 모두 있으면 해당 stage를 건너뜀
+
+    python pipeline.py                  # 전체 (최신 stage는 건너뜀)
+    python pipeline.py als itemknn      # 지정 stage + 필요한 상위 stage
+    python pipeline.py --force task2_3  # 지정 stage 강제 재실행 (하위 stage는 fingerprint로 판단)
+    python pipeline.py --dry-run        # 실행 계획만 출력
+    python pipeline.py --jobs 4         # 동시 실행 stage 수 (CPU 코어 예산은 별도)
+
+의존 관계는 "입력 경로가 다른 stage의 출력 경로(또는 그 하위)"인 경우로 자동 구성되며,
+서로 의존하지 않는 stage(EDA 등)는 동시에 실행됨. stage별 stdout/stderr는
+data_store/logs/<stage>.log에 저장
+
+CPU 예산: stage마다 사용하는 코어 수(cpus)를 선언하고, 실행 중 stage의 코어 합이
+CPU 코어 수를 넘지 않을 때만 새 stage를 시작함. 프로세스/스레드 풀로 전체 코어를 쓰는
+stage(스캔, 분할, itemknn, als)는 cpus=None으로 선언되어 단독 실행되므로 --jobs가 커도
+코어 수 × 코어 수 만큼 과다 구독되지 않음
+
+입력 파일 상태는 (크기, 수정 시각)으로 판단하므로 상위 stage가 재실행되어 출력이
+다시 쓰이면 하위 stage도 재실행됨. 모델 스크립트만 수정한 경우 데이터 준비 stage는 건너뜀
+"""
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MANIFEST = "data_store/pipeline_manifest.json"
+LOG_DIR = "data_store/logs"
+
+REC_FILE = "Game Recommendations on Steam/recommendations.csv"
+GAMES_FILE = "Game Recommendations on Steam/games.csv"
+USERS_FILE = "Game Recommendations on Steam/users.csv"
+METADATA_FILE = "Game Recommendations on Steam/games_metadata.json"
+STEAM2025_FILE = "Steam Games Dataset 2025/games_march2025_cleaned.csv"
+STORE = "data_store/recommendations"
+SCAN_STATS = "data_store/scan_stats.pkl"
+GROUP_SCAN_STATS = "data_store/scan_stats_groups.pkl"
+MERGED = ["merged_items.csv", "merged_users.csv"]
+SPLITS = [f"data_split/{name}_interactions.csv" for name in ('train', 'valid', 'test')]
+LOO = ["data_split/loo_train.csv", "data_split/loo_test.csv",
+       "data_split/loo_train_sparse", "data_split/loo_mappings"]
+
+
+class Stage:
+    """
+    파이프라인 stage 1개 (스크립트 1개)
+
+    Args:
+        name: stage 이름
+        script: 실행할 스크립트 (ROOT 기준 경로, ROOT에서 실행)
+        inputs: 입력 파일/디렉토리 경로 리스트
+        outputs: 출력 파일/디렉토리 경로 리스트
+        params: fingerprint에 포함할 파라미터 (dict)
+        cpus: 사용하는 코어 수 (None이면 전체 코어 = 다른 stage와 동시 실행하지 않음)
+    """
+
+    def __init__(self, name, script, inputs=(), outputs=(), params=None, cpus=1):
+        self.name = name
+        self.script = script
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = params or {}
+        self.cpus = cpus
+
+    def cpu_cost(self, n_cpus):
+        """CPU 예산에서 차지하는 코어 수 (예산보다 크면 예산 전체)"""
+        return n_cpus if self.cpus is None else min(self.cpus, n_cpus)
+
+
+STAGES = [
+    # 원본 → columnar 저장소 / 스캔 캐시 (app/user 카운트만, 파티션 그룹 통계는 task2_1)
+    Stage('store', 'interaction_store.py', [REC_FILE], [STORE]),
+    Stage('phase_scan', 'scan_engine.py', [REC_FILE, STORE], [SCAN_STATS], cpus=None),
+
+    # Phase 1 EDA (서로 독립 → 동시 실행)
+    Stage('task1_1', 'task1_1_eda.py', [REC_FILE]),
+    Stage('task1_2', 'task1_2_games_users_eda.py', [GAMES_FILE, USERS_FILE]),
+    Stage('task1_3', 'task1_3_metadata_eda.py', [METADATA_FILE, GAMES_FILE]),
+    Stage('task1_4', 'task1_4_steam2025_eda.py', [STEAM2025_FILE, GAMES_FILE]),
+    Stage('eda', 'eda_analysis.py', [METADATA_FILE, STEAM2025_FILE]),
+    Stage('task1_5', 'task1_5_zipf_analysis.py', [SCAN_STATS]),
+
+    # 데이터 병합 / 분할 / 행렬
+    Stage('task1_6', 'task1_6_data_merge.py',
+          [SCAN_STATS, GAMES_FILE, USERS_FILE, METADATA_FILE, STEAM2025_FILE], MERGED),
+    Stage('task2_1', 'task2_1_partition_cross_analysis.py', MERGED + [REC_FILE, STORE], [GROUP_SCAN_STATS],
+          cpus=None),
+    Stage('task2_2', 'task2_2_train_valid_test_split.py', MERGED + [REC_FILE, STORE], SPLITS, cpus=None),
+    Stage('task2_3', 'task2_3_sparse_matrix.py', SPLITS,
+          ["data_split/train_sparse_binary", "data_split/train_sparse_weighted",
+           "data_split/id_mappings", "data_split/valid_indexed.csv", "data_split/test_indexed.csv"]),
+    Stage('task2_4', 'task2_4_experiment_setup.py', [SPLITS[0]] + MERGED,
+          LOO + ["data_split/loo_test_indexed.csv", "data_split/loo_test_with_partition.csv",
+                 "evaluation.py"]),
+
+    # Phase 3 모델
+    Stage('popularity', 'models/popularity_model.py', LOO[:2], ["models/popularity_model.pkl"]),
+    Stage('itemknn', 'models/itemknn_model.py', LOO[1:], ["models/itemknn_model"], cpus=None),
+    Stage('als', 'models/als_model.py', LOO[1:] + ["data_split/valid_indexed.csv", "data_split/test_indexed.csv"],
+          ["models/als_model.pkl", "models/als_model_user_factors.npy"], cpus=None),
+    Stage('baseline', 'models/baseline_models.py', LOO + MERGED, ["models/baseline_results.pkl"]),
+]
+
+
+# ============================================================
+# Fingerprint
+# ============================================================
+def _abs(path):
+    return os.path.join(ROOT, path)
+
+
+def path_stamp(path):
+    """파일/디렉토리 상태 [(상대경로, 크기, 수정 시각)] (없으면 None)"""
+    full = _abs(path)
+    if os.path.isfile(full):
+        st = os.stat(full)
+        return [[path, st.st_size, st.st_mtime_ns]]
+    if os.path.isdir(full):
+        stamps = []
+        for dirpath, dirnames, filenames in os.walk(full):
+            dirnames.sort()
+            for fname in sorted(filenames):
+                st = os.stat(os.path.join(dirpath, fname))
+                stamps.append([os.path.relpath(os.path.join(dirpath, fname), ROOT),
+                               st.st_size, st.st_mtime_ns])
+        return stamps
+    return None
+
+
+def local_modules(script):
+    """스크립트가 import하는 로컬 모듈 파일 (재귀, 스크립트 자신 포함)"""
+    found = []
+    pending = [_abs(script)]
+    while pending:
+        path = pending.pop()
+        if path in found:
+            continue
+        found.append(path)
+
+        with open(path, 'r', encoding='utf-8') as f:
+            tree = ast.parse(f.read(), filename=path)
+
+        names = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names.update(alias.name.split('.')[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+                names.add(node.module.split('.')[0])
+
+        # models/* 스크립트는 ROOT를 sys.path에 추가하므로 스크립트 디렉토리 + ROOT 기준으로 탐색
+        for name in names:
+            for base in (os.path.dirname(path), ROOT):
+                candidate = os.path.join(base, f"{name}.py")
+                if os.path.isfile(candidate):
+                    pending.append(candidate)
+                    break
+
+    return sorted(found)
+
+
+def stage_fingerprint(stage):
+    """입력 상태 + 코드 + 파라미터 해시"""
+    h = hashlib.sha1()
+    for path in local_modules(stage.script):
+        h.update(os.path.relpath(path, ROOT).encode('utf-8'))
+        with open(path, 'rb') as f:
+            h.update(f.read())
+    for path in stage.inputs:
+        h.update(json.dumps([path, path_stamp(path)]).encode('utf-8'))
+    h.update(json.dumps(stage.params, sort_keys=True).encode('utf-8'))
+    return h.hexdigest()
+
+
+def load_manifest():
+    if not os.path.exists(_abs(MANIFEST)):
+        return {}
+    with open(_abs(MANIFEST), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(manifest):
+    os.makedirs(os.path.dirname(_abs(MANIFEST)), exist_ok=True)
+    tmp_path = _abs(MANIFEST) + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, _abs(MANIFEST))
+
+
+def is_up_to_date(stage, manifest):
+    entry = manifest.get(stage.name)
+    if entry is None or entry.get('fingerprint') != stage_fingerprint(stage):
+        return False
+    return all(path_stamp(path) is not None for path in stage.outputs)
+
+
+# ============================================================
+# 의존 관계
+# ============================================================
+def _covers(output, path):
+    """output 경로가 path와 같거나 path를 포함하는 디렉토리인지"""
+    output = os.path.normpath(output)
+    path = os.path.normpath(path)
+    return path == output or path.startswith(output + os.sep)
+
+
+def build_dependencies(stages):
+    """{stage 이름: 상위 stage 이름 집합}"""
+    deps = {}
+    for stage in stages:
+        deps[stage.name] = {other.name for other in stages if other is not stage
+                            and any(_covers(out, inp) for out in other.outputs for inp in stage.inputs)}
+    return deps
+
+
+def select_stages(stages, targets, deps):
+    """지정 stage + 모든 상위 stage (선언 순서 유지)"""
+    if not targets:
+        return list(stages)
+
+    names = {stage.name for stage in stages}
+    unknown = [t for t in targets if t not in names]
+    if unknown:
+        raise ValueError(f"알 수 없는 stage: {unknown}")
+
+    selected = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected.add(name)
+            pending.extend(deps[name])
+    return [stage for stage in stages if stage.name in selected]
+
+
+# ============================================================
+# 실행
+# ============================================================
+def run_stage(stage):
+    """스크립트를 ROOT에서 실행하고 로그 저장 (반환: (성공 여부, 소요 시간))"""
+    os.makedirs(_abs(LOG_DIR), exist_ok=True)
+    log_path = _abs(os.path.join(LOG_DIR, f"{stage.name}.log"))
+
+    start = time.time()
+    env = dict(os.environ, PYTHONIOENCODING='utf-8')
+    with open(log_path, 'w', encoding='utf-8') as log:
+        result = subprocess.run([sys.executable, stage.script], cwd=ROOT, env=env,
+                                stdout=log, stderr=subprocess.STDOUT)
+    return result.returncode == 0, time.time() - start
+
+
+def run_pipeline(targets=None, force=(), jobs=None, dry_run=False, stages=STAGES):
+    """
+    파이프라인 실행
+
+    Args:
+        targets: 실행할 stage 이름 (None이면 전체, 상위 stage 포함)
+        force: 최신이어도 재실행할 stage 이름
+        jobs: 동시 실행 stage 수 (None이면 CPU 코어 수). 코어 예산(CPU 코어 수)은 별도로
+            적용되어 cpus=None stage는 단독 실행됨
+        dry_run: 실행 계획만 출력
+
+    Returns:
+        {stage 이름: 'skipped' | 'done' | 'failed' | 'blocked'}
+    """
+    deps = build_dependencies(stages)
+    selected = select_stages(stages, targets, deps)
+    selected_names = {stage.name for stage in selected}
+    manifest = load_manifest()
+    status = {}
+
+    # 입력 누락 확인 (다른 stage가 만들지 않는 원본 파일)
+    # 원본이 없어도 출력이 이미 있으면 기존 출력을 그대로 사용 (예: 병합 결과만 받은 환경)
+    produced = [out for stage in stages for out in stage.outputs]
+    use_existing = set()
+    for stage in selected:
+        missing = [path for path in stage.inputs
+                   if path_stamp(path) is None and not any(_covers(out, path) for out in produced)]
+        if not missing:
+            continue
+        if stage.outputs and all(path_stamp(path) is not None for path in stage.outputs):
+            use_existing.add(stage.name)
+        else:
+            raise FileNotFoundError(f"[{stage.name}] 입력 파일 없음: {missing}")
+
+    if dry_run:
+        # 상위 stage가 재실행되면 하위 stage도 재실행되는 것으로 간주
+        for stage in selected:
+            if stage.name in use_existing:
+                status[stage.name] = 'skip'
+                print(f"  {stage.name:<12} 원본 입력 없음 → 기존 출력 사용")
+                continue
+            rerun = (stage.name in force or not is_up_to_date(stage, manifest)
+                     or any(status.get(d) == 'run' for d in deps[stage.name]))
+            status[stage.name] = 'run' if rerun else 'skip'
+            print(f"  {stage.name:<12} {'실행' if rerun else '최신 (건너뜀)'}")
+        return status
+
+    pending = list(selected)
+    running = {}
+    n_cpus = os.cpu_count() or 1
+    jobs = jobs or n_cpus
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            for stage in list(pending):
+                upstream = deps[stage.name] & selected_names
+                if any(status.get(d) in ('failed', 'blocked') for d in upstream):
+                    status[stage.name] = 'blocked'
+                    pending.remove(stage)
+                    print(f"  [{stage.name}] 상위 stage 실패 → 건너뜀")
+                    continue
+                if not all(status.get(d) in ('skipped', 'done') for d in upstream):
+                    continue
+
+                if stage.name in use_existing:
+                    status[stage.name] = 'skipped'
+                    pending.remove(stage)
+                    print(f"  [{stage.name}] 원본 입력 없음 → 기존 출력 사용")
+                    continue
+                if stage.name not in force and is_up_to_date(stage, manifest):
+                    status[stage.name] = 'skipped'
+                    pending.remove(stage)
+                    print(f"  [{stage.name}] 최신 (건너뜀)")
+                    continue
+
+                # 동시 실행 수 / 코어 예산 초과 시 다음 완료까지 대기 (실행 중 stage가 없으면 항상 시작)
+                used_cpus = sum(s.cpu_cost(n_cpus) for s, _ in running.values())
+                if running and (len(running) >= jobs or used_cpus + stage.cpu_cost(n_cpus) > n_cpus):
+                    continue
+
+                pending.remove(stage)
+                # 실행 직전 fingerprint (상위 stage 출력이 갱신된 후의 입력 상태)
+                fingerprint = stage_fingerprint(stage)
+                print(f"  [{stage.name}] 실행: {stage.script}")
+                running[pool.submit(run_stage, stage)] = (stage, fingerprint)
+
+            if not running:
+                if pending:
+                    raise RuntimeError(f"순환 의존 관계: {[stage.name for stage in pending]}")
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, fingerprint = running.pop(future)
+                ok, elapsed = future.result()
+                if ok:
+                    status[stage.name] = 'done'
+                    manifest[stage.name] = {'fingerprint': fingerprint, 'script': stage.script,
+                                            'finished_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                                            'elapsed_sec': round(elapsed, 1)}
+                    save_manifest(manifest)
+                    print(f"  [{stage.name}] 완료 ({elapsed:.1f}초)")
+                else:
+                    status[stage.name] = 'failed'
+                    manifest.pop(stage.name, None)
+                    save_manifest(manifest)
+                    print(f"  [{stage.name}] 실패 → {LOG_DIR}/{stage.name}.log 확인")
+
+    return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Task 파이프라인 실행기")
+    parser.add_argument('targets', nargs='*', help="실행할 stage (생략 시 전체)")
+    parser.add_argument('--force', nargs='*', default=[], help="강제 재실행할 stage")
+    parser.add_argument('--jobs', type=int, default=None, help="동시 실행 stage 수")
+    parser.add_argument('--dry-run', action='store_true', help="실행 계획만 출력")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("Task 파이프라인")
+    print("=" * 70)
+
+    status = run_pipeline(args.targets, set(args.force), args.jobs, args.dry_run)
+
+    if not args.dry_run:
+        print("\n" + "=" * 70)
+        for name, state in status.items():
+            print(f"  {name:<12} {state}")
+        print("=" * 70)
+        if any(state in ('failed', 'blocked') for state in status.values()):
+            sys.exit(1)
@@ -0,0 +1,522 @@
+# -*- coding: utf-8 -*-
+"""
+단일 패스 다중 집계 스캔 엔진 (Single-pass Multi-aggregate Scan)
+등록한 여러 집계를 상호작용 데이터 1회 순회로 모두 계산
+
+Phase 1/2 스캔:
+    - 1차 (phase_scan): app/user 카운트 → task1_5, task1_6가 공유 (scan_stats.pkl)
+    - 그룹 (task2_1): Popular/Long-tail × Heavy/Light 파티션은 1차 카운트로 task1_6에서 정해지므로
+      1차 스캔에 포함할 수 없어 파티션 확정 후 별도 1회 스캔 (scan_stats_groups.pkl)
+    캐시에는 원본 데이터 fingerprint(크기, 수정 시각)를 기록하고 로드 시 비교
+
+구성:
+    - KeyCounter: factorize + bincount 기반 키 카운터 (Counter 대체)
+    - Aggregator: CountByKey, SumByKey, ReservoirSample, Histogram
+    - ScanEngine: 집계기를 등록하고 청크를 한 번만 순회하며 모두 갱신
+    - run_phase_scan(): Phase 1/2 통계 일괄 계산 후 data_store/scan_stats.pkl에 캐시
+"""
+import pandas as pd
+import numpy as np
+import functools
+import hashlib
+import pickle
+import os
+
+from interaction_store import REC_FILE, STORE_DIR, read_interaction_chunks, store_exists, load_meta
+from parallel_scan import parallel_scan
+
+SCAN_CACHE = "data_store/scan_stats.pkl"
+GROUP_SCAN_CACHE = "data_store/scan_stats_groups.pkl"  # task2_1 그룹 통계 (SCAN_CACHE를 덮어쓰지 않음)
+
+GROUPS = ['Popular_Heavy', 'Popular_Light', 'Long-tail_Heavy', 'Long-tail_Light']
+
+# 플레이 시간 히스토그램 구간: 0, 10^(-1) ~ 10^5 로그 균등 240구간 (10배당 40구간), inf
+# (1, 10, 100, 1000은 정확히 구간 경계이므로 거친 구간 표는 구간 합으로 계산)
+HOURS_BINS = np.concatenate([[0.0], 10.0 ** (np.arange(-40, 201) / 40), [np.inf]])
+
+
+# ============================================================
+# 키 함수
+# ============================================================
+class PartitionGroupKey:
+    """
+    Popular/Long-tail × Heavy/Light 그룹 라벨 생성 키
+
+    Args:
+        popular_app_ids: Popular 아이템 app_id 배열
+        heavy_user_ids: Heavy 사용자 user_id 배열
+    """
+    columns = ['app_id', 'user_id']
+    _labels = np.array(['Long-tail_Light', 'Long-tail_Heavy', 'Popular_Light', 'Popular_Heavy'])
+
+    def __init__(self, popular_app_ids, heavy_user_ids):
+        self.popular_app_ids = np.sort(np.asarray(popular_app_ids))
+        self.heavy_user_ids = np.sort(np.asarray(heavy_user_ids))
+
+    @classmethod
+    def from_merged(cls, items, users):
+        """merged_items / merged_users DataFrame에서 생성"""
+        return cls(items.loc[items['item_partition'] == 'Popular', 'app_id'].values,
+                   users.loc[users['user_partition'] == 'Heavy', 'user_id'].values)
+
+    def fingerprint(self):
+        """파티션 구성 해시 (캐시 유효성 확인용)"""
+        h = hashlib.sha1()
+        h.update(self.popular_app_ids.astype(np.int64).tobytes())
+        h.update(self.heavy_user_ids.astype(np.int64).tobytes())
+        return h.hexdigest()
+
+    def __call__(self, chunk):
+        item_pop = np.isin(chunk['app_id'].values, self.popular_app_ids)
+        user_heavy = np.isin(chunk['user_id'].values, self.heavy_user_ids)
+        return self._labels[item_pop * 2 + user_heavy]
+
+
+def _key_columns(key):
+    if key is None:
+        return []
+    if isinstance(key, str):
+        return [key]
+    return list(getattr(key, 'columns', []))
+
+
+def _key_values(chunk, key):
+    if isinstance(key, str):
+        return chunk[key].values
+    return np.asarray(key(chunk))
+
+
+# ============================================================
+# Key Counter
+# ============================================================
+class KeyCounter:
+    """
+    키별 카운트/합계 누적기 (collections.Counter 대체)
+
+    청크마다 pd.factorize로 키를 코드화하고 np.bincount로 집계한 뒤,
+    정렬된 키 배열(ID 사전)과 searchsorted로 전역 위치를 찾아 dense 배열에 누적.
+    Python 객체 순회/boxed int dict 없이 키당 (키 + 값) 배열 공간만 사용
+
+    Args:
+        dtype: 누적 값 타입 (카운트 int64, 합계 float64)
+    """
+
+    def __init__(self, dtype=np.int64):
+        self.dtype = np.dtype(dtype)
+        self.keys = None                           # 정렬된 유니크 키
+        self.values = np.zeros(0, dtype=self.dtype)
+
+    def __len__(self):
+        return 0 if self.keys is None else len(self.keys)
+
+    def update(self, keys, weights=None):
+        """
+        키 배열 집계 (weights 지정 시 키별 합계)
+        """
+        codes, uniques = pd.factorize(np.asarray(keys))
+        chunk_values = np.bincount(codes, weights=weights, minlength=len(uniques))
+        self.add(uniques, chunk_values)
+
+    def add(self, uniques, values):
+        """
+        키별로 이미 집계된 값 누적 (uniques는 중복 없어야 함)
+        """
+        uniques = np.asarray(uniques)
+        values = np.asarray(values).astype(self.dtype, copy=False)
+        if len(uniques) == 0:
+            return
+
+        # 정렬된 질의가 searchsorted 캐시 효율이 좋고, 새 키도 정렬 상태로 삽입 가능
+        order = np.argsort(uniques)
+        uniques, values = uniques[order], values[order]
+
+        if self.keys is None:
+            self.keys = uniques
+            self.values = values.copy()
+            return
+
+        # 기존 키: 위치 찾아서 누적
+        pos = np.searchsorted(self.keys, uniques)
+        found = pos < len(self.keys)
+        found[found] = self.keys[pos[found]] == uniques[found]
+        np.add.at(self.values, pos[found], values[found])
+
+        # 새 키: 정렬 위치에 삽입
+        if not found.all():
+            new_keys = uniques[~found]
+            new_values = values[~found]
+            insert_pos = pos[~found]
+            self.keys = np.insert(self.keys, insert_pos, new_keys)
+            self.values = np.insert(self.values, insert_pos, new_values)
+
+    def merge(self, other):
+        if other.keys is not None:
+            self.add(other.keys, other.values)
+        return self
+
+    def to_series(self):
+        """pd.Series (index=키, value=누적값)"""
+        if self.keys is None:
+            return pd.Series(dtype=self.dtype)
+        return pd.Series(self.values, index=self.keys)
+
+
+# ============================================================
+# Aggregator
+# ============================================================
+class CountByKey:
+    """키별 행 수 집계 (예: app_id별 상호작용 수)"""
+
+    def __init__(self, key):
+        self.key = key
+        self.columns = _key_columns(key)
+        self.counter = KeyCounter(np.int64)
+
+    def update(self, chunk):
+        self.counter.update(_key_values(chunk, self.key))
+
+    def merge(self, other):
+        self.counter.merge(other.counter)
+        return self
+
+    def result(self):
+        """pd.Series (index=키, value=행 수)"""
+        return self.counter.to_series()
+
+
+class SumByKey:
+    """키별 값 합계 (예: app_id별 총 플레이 시간)"""
+
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+        self.columns = _key_columns(key) + [value]
+        self.counter = KeyCounter(np.float64)
+
+    def update(self, chunk):
+        self.counter.update(_key_values(chunk, self.key),
+                            weights=chunk[self.value].values.astype(np.float64))
+
+    def merge(self, other):
+        self.counter.merge(other.counter)
+        return self
+
+    def result(self):
+        return self.counter.to_series()
+
+
+class ReservoirSample:
+    """
+    키별 균등 샘플 (bottom-k reservoir)
+
+    각 행에 난수 우선순위를 부여하고 키별로 우선순위가 가장 작은 size개만 유지.
+    청크 순서/분할과 무관하게 균등 비복원 샘플이 되며 병합도 가능함
+
+    Args:
+        values: 샘플링할 컬럼 (str 또는 리스트)
+        size: 키별 최대 샘플 수
+        key: 그룹 키 (None이면 전체 1개 그룹)
+        seed: 난수 시드
+    """
+
+    def __init__(self, values, size=100_000, key=None, seed=42):
+        self.values = [values] if isinstance(values, str) else list(values)
+        self.size = size
+        self.key = key
+        self.columns = _key_columns(key) + self.values
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.samples = {}  # {key: DataFrame(values + '_priority')}
+
+    def _absorb(self, k, df):
+        if k in self.samples:
+            df = pd.concat([self.samples[k], df], ignore_index=True)
+        if len(df) > self.size:
+            keep = np.argpartition(df['_priority'].values, self.size - 1)[:self.size]
+            df = df.iloc[keep].reset_index(drop=True)
+        self.samples[k] = df
+
+    def reseed(self, index):
+        """병렬 구간별 독립 난수열 (구간마다 같은 우선순위가 반복되지 않도록)"""
+        self.rng = np.random.default_rng([self.seed, index])
+
+    def update(self, chunk):
+        df = chunk[self.values].reset_index(drop=True)
+        df['_priority'] = self.rng.random(len(df))
+
+        if self.key is None:
+            self._absorb(None, df)
+            return
+
+        for k, g_df in df.groupby(_key_values(chunk, self.key)):
+            self._absorb(k, g_df)
+
+    def merge(self, other):
+        for k, df in other.samples.items():
+            self._absorb(k, df)
+        return self
+
+    def result(self):
+        """{키: DataFrame} (key=None이면 DataFrame 1개)"""
+        out = {k: df.drop(columns='_priority') for k, df in self.samples.items()}
+        if self.key is None:
+            return out.get(None, pd.DataFrame(columns=self.values))
+        return out
+
+
+class Histogram:
+    """
+    키별 고정 구간 히스토그램 (예: 그룹별 플레이 시간 분포)
+
+    청크마다 키 코드 × 구간 수 + 구간 idx를 bincount 1회로 집계하므로 행 수와 무관하게
+    (키, 구간) 카운트만 유지함. 구간이 고정이라 병렬 구간 결과는 카운트 합으로 병합
+
+    Args:
+        value: 집계할 컬럼
+        bins: 구간 경계 (오름차순, np.histogram과 같이 마지막 구간만 오른쪽 경계 포함, 범위 밖/NaN 제외)
+        key: 그룹 키 (None이면 전체 1개 그룹)
+    """
+
+    def __init__(self, value, bins, key=None):
+        self.value = value
+        self.bins = np.asarray(bins, dtype=np.float64)
+        self.key = key
+        self.columns = _key_columns(key) + [value]
+        self.counts = {}  # {key: 구간별 개수 int64 배열}
+
+    def _add(self, k, counts):
+        if k in self.counts:
+            self.counts[k] = self.counts[k] + counts
+        else:
+            self.counts[k] = counts
+
+    def update(self, chunk):
+        values = chunk[self.value].values.astype(np.float64)
+        n_bins = len(self.bins) - 1
+
+        bin_idx = np.searchsorted(self.bins, values, side='right') - 1
+        bin_idx[values == self.bins[-1]] = n_bins - 1
+        valid = (bin_idx >= 0) & (bin_idx < n_bins)
+
+        if self.key is None:
+            codes, uniques = np.zeros(len(values), dtype=np.int64), [None]
+        else:
+            codes, uniques = pd.factorize(_key_values(chunk, self.key))
+        counts = np.bincount(codes[valid] * n_bins + bin_idx[valid],
+                             minlength=len(uniques) * n_bins).reshape(len(uniques), n_bins)
+        for k, row in zip(uniques, counts):
+            self._add(k, row.astype(np.int64))
+
+    def merge(self, other):
+        for k, counts in other.counts.items():
+            self._add(k, counts)
+        return self
+
+    def result(self):
+        """{키: 구간별 개수 배열} (key=None이면 배열 1개)"""
+        if self.key is None:
+            return self.counts.get(None, np.zeros(len(self.bins) - 1, dtype=np.int64))
+        return dict(self.counts)
+
+
+def histogram_quantile(counts, bins, q):
+    """
+    히스토그램 분위수 추정 (구간 안은 균등 분포로 보고 선형 보간, 마지막 구간이 inf면 하한)
+
+    오차는 해당 구간 폭 이하 (HOURS_BINS는 상대 오차 약 6% 이하)
+    """
+    counts = np.asarray(counts)
+    total = counts.sum()
+    if total == 0:
+        return np.nan
+    cumulative = np.cumsum(counts)
+    target = q * total
+    b = min(int(np.searchsorted(cumulative, target, side='left')), len(counts) - 1)
+    lower, upper = bins[b], bins[b + 1]
+    if not np.isfinite(upper):
+        return float(lower)
+    before = cumulative[b] - counts[b]
+    return float(lower + (upper - lower) * (target - before) / counts[b])
+
+
+# ============================================================
+# Scan Engine
+# ============================================================
+class ScanEngine:
+    """
+    등록된 모든 집계기를 청크 1회 순회로 갱신
+
+    사용 예:
+        engine = ScanEngine()
+        engine.register('app_count', CountByKey('app_id'))
+        engine.register('user_count', CountByKey('user_id'))
+        stats = engine.run()
+    """
+
+    def __init__(self):
+        self.aggregators = {}
+        self.total_rows = 0
+
+    def register(self, name, aggregator):
+        self.aggregators[name] = aggregator
+        return aggregator
+
+    def columns(self):
+        """등록된 집계기가 필요로 하는 컬럼 (중복 제거, 순서 유지)"""
+        cols = []
+        for agg in self.aggregators.values():
+            for c in agg.columns:
+                if c not in cols:
+                    cols.append(c)
+        return cols
+
+    def update(self, chunk):
+        for agg in self.aggregators.values():
+            agg.update(chunk)
+        self.total_rows += len(chunk)
+
+    def reseed(self, index):
+        for agg in self.aggregators.values():
+            if hasattr(agg, 'reseed'):
+                agg.reseed(index)
+
+    def merge(self, other):
+        """같은 구성의 엔진 부분 집계 병합 (결합 법칙 성립)"""
+        for name, agg in self.aggregators.items():
+            agg.merge(other.aggregators[name])
+        self.total_rows += other.total_rows
+        return self
+
+    def run(self, chunks=None, chunk_size=2_000_000, progress_every=10):
+        """
+        청크 순회 및 집계
+
+        Args:
+            chunks: DataFrame 청크 iterable (None이면 read_interaction_chunks 사용)
+            chunk_size: 청크 크기
+            progress_every: 진행 상황 출력 주기 (청크 수)
+
+        Returns:
+            {이름: 집계 결과} + 'total_rows'
+        """
+        if chunks is None:
+            chunks = read_interaction_chunks(self.columns(), chunk_size)
+
+        for i, chunk in enumerate(chunks):
+            self.update(chunk)
+            if progress_every and (i + 1) % progress_every == 0:
+                print(f"    {self.total_rows:,} rows 처리 완료...")
+
+        return self.results()
+
+    def results(self):
+        stats = {name: agg.result() for name, agg in self.aggregators.items()}
+        stats['total_rows'] = self.total_rows
+        return stats
+
+
+# ============================================================
+# Phase 1/2 통계 일괄 스캔
+# ============================================================
+def build_phase_engine(group_key=None, sample_size=100_000):
+    """
+    Phase 1/2 통계 집계기 등록
+
+    - app_count / user_count: task1_5 (Zipf), task1_6 (파티션 기준)
+    - group_*: task2_1 (파티션 교차 분석) - group_key가 있을 때만
+        group_count, group_hours_sum / group_hours_hist (플레이 시간 평균 / 분포, 전체 행 기준),
+        group_sample (추천 비율 표본)
+    """
+    engine = ScanEngine()
+    engine.register('app_count', CountByKey('app_id'))
+    engine.register('user_count', CountByKey('user_id'))
+
+    if group_key is not None:
+        engine.register('group_count', CountByKey(group_key))
+        engine.register('group_hours_sum', SumByKey(group_key, 'hours'))
+        engine.register('group_hours_hist', Histogram('hours', HOURS_BINS, key=group_key))
+        engine.register('group_sample', ReservoirSample(['hours', 'is_recommended'],
+                                                        sample_size, key=group_key))
+
+    return engine
+
+
+def source_fingerprint(csv_path=REC_FILE, store_dir=STORE_DIR):
+    """
+    원본 상호작용 데이터 상태 (크기, 수정 시각)
+
+    원본 CSV가 없으면 columnar 저장소에 기록된 원본 정보 사용 (둘 다 없으면 None)
+    """
+    if os.path.exists(csv_path):
+        stat = os.stat(csv_path)
+        return [stat.st_size, stat.st_mtime]
+    if store_exists(store_dir, csv_path):
+        meta = load_meta(store_dir)
+        return [meta.get('source_size'), meta.get('source_mtime')]
+    return None
+
+
+def run_phase_scan(group_key=None, chunk_size=2_000_000, cache_path=SCAN_CACHE, n_workers=None):
+    """
+    Phase 1/2 통계를 1회 스캔으로 계산하고 캐시에 저장
+
+    Args:
+        group_key: PartitionGroupKey (None이면 그룹 통계 제외)
+        chunk_size: 청크 크기
+        cache_path: 결과 캐시 경로 (None이면 저장 안 함)
+        n_workers: 병렬 프로세스 수 (None이면 CPU 코어 수, 1이면 단일 프로세스)
+    """
+    engine = parallel_scan(functools.partial(build_phase_engine, group_key),
+                           n_workers=n_workers, chunk_size=chunk_size)
+    stats = engine.results()
+    stats['partition_fingerprint'] = group_key.fingerprint() if group_key is not None else None
+    stats['source_fingerprint'] = source_fingerprint()
+
+    if cache_path:
+        # 임시 파일에 쓴 뒤 교체 (동시에 실행 중인 다른 스크립트가 쓰다 만 캐시를 읽지 않도록)
+        os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(stats, f)
+        os.replace(tmp_path, cache_path)
+
+    return stats
+
+
+def load_phase_stats(group_key=None, cache_path=SCAN_CACHE):
+    """
+    캐시된 스캔 결과 로드 (없거나 조건 불일치 시 None)
+
+    원본 데이터가 캐시 생성 이후 변경되었으면 (source fingerprint 불일치) None
+
+    Args:
+        group_key: 지정 시 같은 파티션으로 계산된 그룹 통계가 있어야 유효
+    """
+    if not os.path.exists(cache_path):
+        return None
+    with open(cache_path, 'rb') as f:
+        stats = pickle.load(f)
+    if stats.get('source_fingerprint') != source_fingerprint():
+        return None
+    if group_key is not None and stats.get('partition_fingerprint') != group_key.fingerprint():
+        return None
+    return stats
+
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print("Phase 1/2 통계 단일 패스 스캔 (app/user 카운트)")
+    print("=" * 70)
+
+    print("\n[Step 1] 스캔")
+    print("-" * 50)
+
+    stats = run_phase_scan()
+
+    print(f"\n  총 처리: {stats['total_rows']:,} rows")
+    print(f"  유니크 app_id: {len(stats['app_count']):,}")
+    print(f"  유니크 user_id: {len(stats['user_count']):,}")
+
+    print("\n" + "=" * 70)
+    print(f"저장: {SCAN_CACHE}")
+    print("=" * 70)
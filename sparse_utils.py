@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+Sparse Matrix 유틸리티
+User-Item CSR 행렬 구축 및 memory-map 저장/로드
+
+저장 구조 (디렉토리 1개 = 행렬 1개):
+    header.json   (shape, nnz, dtype)
+    indptr.bin    (index dtype, n_rows + 1)
+    indices.bin   (index dtype, nnz)
+    data.bin      (data dtype, nnz)
+
+load_npz는 프로세스마다 압축 해제 + 복사가 일어나지만, 이 형식은 np.memmap으로
+열어 복사 없이 csr_matrix로 노출하므로 여러 평가/서빙 프로세스가 OS 페이지 캐시의
+같은 사본을 공유함
+"""
+import numpy as np
+from scipy.sparse import csr_matrix, coo_matrix, load_npz
+import json
+import os
+
+
+def build_csr(row_codes, col_codes, shape, data):
+    """
+    정수 코드 배열에서 CSR 행렬 직접 구축 (전체 정렬 없음)
+
+    1. indptr: 행별 개수 bincount + cumsum
+    2. 행 배치: 입력 위치를 열로 둔 (n_rows × nnz) 행렬의 COO → CSR 변환 (scipy의 counting
+       scatter, O(nnz + n_rows))으로 각 항목을 행 구간에 입력 순서대로 배치
+    3. 행 내부만 열 idx로 정렬 (sort_indices, 행마다 따로 정렬하므로 nnz 전체 argsort보다 작음)
+    4. 행 안에서 인접한 같은 열은 csr_matrix와 같이 합산
+    여러 data 배열이 같은 indptr/indices를 공유하므로 한 번에 생성됨
+
+    Args:
+        row_codes: 행 코드 배열 (0 ~ n_rows-1, pd.factorize / np.unique(return_inverse))
+        col_codes: 열 코드 배열 (0 ~ n_cols-1)
+        shape: (n_rows, n_cols)
+        data: {이름: 값 배열 (None이면 1 = binary)}
+
+    Returns:
+        {이름: csr_matrix} (canonical format, int32 indices/indptr)
+    """
+    n_rows, n_cols = shape
+    row_codes = np.asarray(row_codes)
+    col_codes = np.asarray(col_codes)
+    n_entries = len(row_codes)
+
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(row_codes, minlength=n_rows), out=indptr[1:])
+
+    # 행별 배치 (입력 위치가 열이므로 중복 칸이 없어 합산 없이 위치만 옮겨짐)
+    by_row = coo_matrix((col_codes, (row_codes, np.arange(n_entries))), shape=(n_rows, max(n_entries, 1))).tocsr()
+    order = by_row.indices.astype(np.int64)
+
+    # 행 안에서 열 정렬 (같은 열은 입력 위치 순 - data로 입력 위치를 함께 정렬)
+    in_row = csr_matrix((order, by_row.data.astype(np.int64), indptr), shape=(n_rows, n_cols), copy=False)
+    in_row.has_sorted_indices = False
+    in_row.sort_indices()
+    order = in_row.data
+    cols = in_row.indices
+    del by_row
+
+    # 중복 (row, col) 구간 시작 위치 (행 시작 또는 직전과 열이 다름)
+    is_first = np.ones(n_entries, dtype=bool)
+    is_first[1:] = cols[1:] != cols[:-1]
+    is_first[indptr[:-1][np.diff(indptr) > 0]] = True
+    starts = np.flatnonzero(is_first)
+    has_duplicates = len(starts) < n_entries
+
+    nnz = len(starts)
+    index_dtype = np.int32 if max(nnz, n_cols) < np.iinfo(np.int32).max else np.int64
+
+    indices = cols[starts].astype(index_dtype)
+    first_count = np.concatenate([[0], np.cumsum(is_first)])
+    indptr = first_count[indptr].astype(index_dtype)
+    del cols, in_row
+
+    matrices = {}
+    for name, values in data.items():
+        if values is None:
+            values = np.diff(np.append(starts, n_entries)).astype(np.float32)
+        else:
+            values = np.asarray(values)[order]
+            if has_duplicates:
+                values = np.add.reduceat(values, starts)
+
+        matrix = csr_matrix((values, indices, indptr), shape=(n_rows, n_cols), copy=False)
+        matrix.has_sorted_indices = True
+        matrix.has_canonical_format = True
+        matrices[name] = matrix
+
+    return matrices
+
+
+def replace_rows(matrix, rows, new_rows, n_rows=None):
+    """
+    CSR 행렬의 일부 행만 교체한 새 CSR (나머지 행은 재계산 없이 구간 복사)
+
+    교체 행 사이의 기존 행 구간은 새 배열에서도 연속이고 이동량이 같으므로 구간당
+    slice 복사 1번으로 옮김 (정렬 / 합산 / dtype 변환 없음, Python 반복은 교체 행 수만큼)
+
+    Args:
+        matrix: 기존 CSR 행렬 (memmap 가능, 수정하지 않음)
+        rows: 교체할 행 idx (정렬, 중복 없음, n_rows 미만)
+        new_rows: 교체 내용 CSR (len(rows) 행, 열 수가 결과 열 수)
+        n_rows: 결과 행 수 (None이면 기존 행 수, 더 크면 뒤에 행 추가)
+
+    Returns:
+        csr_matrix (n_rows × new_rows.shape[1])
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    n_old = matrix.shape[0]
+    n_rows = n_old if n_rows is None else n_rows
+    n_cols = new_rows.shape[1]
+
+    old_indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    old_indptr[1:n_old + 1] = matrix.indptr[1:]
+    old_indptr[n_old + 1:] = old_indptr[n_old]
+
+    lengths = np.diff(old_indptr)
+    lengths[rows] = np.diff(new_rows.indptr)
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+
+    nnz = int(indptr[-1])
+    index_dtype = np.int32 if max(nnz, n_cols) < np.iinfo(np.int32).max else np.int64
+    indices = np.empty(nnz, dtype=index_dtype)
+    data = np.empty(nnz, dtype=np.result_type(matrix.dtype, new_rows.dtype))
+
+    # 교체 행: 행 시작 위치 + 행 내 순번으로 scatter
+    new_lengths = np.diff(new_rows.indptr)
+    positions = np.repeat(indptr[rows] - new_rows.indptr[:-1], new_lengths) + np.arange(new_rows.nnz)
+    indices[positions] = new_rows.indices
+    data[positions] = new_rows.data
+
+    # 기존 행: 교체 행 사이 구간 [a, b)를 통째로 복사
+    bounds = np.concatenate([[-1], rows, [n_rows]])
+    for a, b in zip(bounds[:-1] + 1, bounds[1:]):
+        src_start, src_end = old_indptr[a], old_indptr[b]
+        if src_end > src_start:
+            dst_start = indptr[a]
+            indices[dst_start:dst_start + src_end - src_start] = matrix.indices[src_start:src_end]
+            data[dst_start:dst_start + src_end - src_start] = matrix.data[src_start:src_end]
+
+    return csr_matrix((data, indices, indptr.astype(index_dtype)), shape=(n_rows, n_cols), copy=False)
+
+
+def save_csr_mmap(dirpath, matrix):
+    """
+    CSR 행렬을 raw 배열 + header로 저장
+
+    Args:
+        dirpath: 저장 디렉토리
+        matrix: scipy sparse 행렬 (CSR로 변환되어 저장)
+    """
+    matrix = matrix.tocsr()
+    matrix.sum_duplicates()  # canonical format (정렬 + 중복 제거)
+
+    # indptr / indices를 같은 dtype으로 맞춰야 로드 시 scipy가 복사하지 않음
+    index_dtype = np.int32 if matrix.nnz < np.iinfo(np.int32).max else np.int64
+
+    os.makedirs(dirpath, exist_ok=True)
+    matrix.indptr.astype(index_dtype, copy=False).tofile(os.path.join(dirpath, 'indptr.bin'))
+    matrix.indices.astype(index_dtype, copy=False).tofile(os.path.join(dirpath, 'indices.bin'))
+    matrix.data.tofile(os.path.join(dirpath, 'data.bin'))
+
+    header = {
+        'format': 'csr',
+        'shape': [int(s) for s in matrix.shape],
+        'nnz': int(matrix.nnz),
+        'index_dtype': np.dtype(index_dtype).name,
+        'data_dtype': matrix.data.dtype.name,
+    }
+    with open(os.path.join(dirpath, 'header.json'), 'w', encoding='utf-8') as f:
+        json.dump(header, f, indent=2)
+
+
+def _memmap(path, dtype, length):
+    if length == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(length,))
+
+
+def load_csr_mmap(dirpath):
+    """
+    memory-map CSR 로드 (복사 없음, read-only)
+
+    Returns:
+        csr_matrix (indptr/indices/data가 np.memmap을 참조)
+    """
+    with open(os.path.join(dirpath, 'header.json'), 'r', encoding='utf-8') as f:
+        header = json.load(f)
+
+    n_rows, n_cols = header['shape']
+    index_dtype = np.dtype(header['index_dtype'])
+
+    indptr = _memmap(os.path.join(dirpath, 'indptr.bin'), index_dtype, n_rows + 1)
+    indices = _memmap(os.path.join(dirpath, 'indices.bin'), index_dtype, header['nnz'])
+    data = _memmap(os.path.join(dirpath, 'data.bin'), np.dtype(header['data_dtype']), header['nnz'])
+
+    matrix = csr_matrix((data, indices, indptr), shape=(n_rows, n_cols), copy=False)
+    # 저장 시 canonical format이므로 정렬 검사/제자리 정렬을 건너뜀 (read-only 배열)
+    matrix.has_sorted_indices = True
+    matrix.has_canonical_format = True
+    return matrix
+
+
+def load_matrix(path):
+    """
+    User-Item 행렬 로드 공통 함수
+
+    디렉토리면 memory-map CSR, .npz 파일이면 load_npz
+    """
+    if os.path.isdir(path):
+        return load_csr_mmap(path)
+    return load_npz(path)
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+데이터 분할 유틸리티
+- 사용자 해시 기반 Train/Valid/Test 분할 (전역 셔플 없이 재현 가능)
+- 분할별 CSV 스트리밍 저장
+- 병렬 분할: 구간별 part 파일 저장 후 구간 순서대로 이어 붙임
+- Leave-One-Out 분할: 정렬 없이 사용자별 마지막 상호작용 선택 (마스크/인덱스 반환)
+"""
+import numpy as np
+import shutil
+import os
+
+from parallel_scan import read_range
+
+SPLIT_NAMES = ('train', 'valid', 'test')
+
+
+def _splitmix64(x):
+    """splitmix64 정수 해시 (uint64, 벡터화, 플랫폼 무관)"""
+    with np.errstate(over='ignore'):
+        z = np.asarray(x, dtype=np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+def hash_split_assign(user_ids, seed=42, ratios=(0.8, 0.1, 0.1)):
+    """
+    사용자 ID 해시로 분할 배정
+
+    같은 사용자는 항상 같은 분할에 배정되므로 청크 단위로 바로 분할할 수 있고,
+    seed가 같으면 어느 머신에서든 같은 결과가 나옴
+
+    Args:
+        user_ids: 사용자 ID 배열
+        seed: 해시 시드
+        ratios: 분할 비율 (합 1)
+
+    Returns:
+        분할 코드 배열 (0=train, 1=valid, 2=test, np.int8)
+    """
+    ids = np.asarray(user_ids).astype(np.int64).view(np.uint64)
+    h = _splitmix64(ids ^ _splitmix64(np.uint64(seed)))
+
+    # 상위 53비트 → [0, 1) 균등 분포
+    u = (h >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+    bounds = np.cumsum(ratios)[:-1]
+    return np.searchsorted(bounds, u, side='right').astype(np.int8)
+
+
+class SplitCsvWriter:
+    """
+    분할별 CSV 스트리밍 저장 (청크를 읽는 즉시 해당 파일에 append)
+
+    Args:
+        paths: {분할명: 출력 경로}
+    """
+
+    def __init__(self, paths):
+        self.paths = dict(paths)
+        self.started = set()
+        self.rows = {name: 0 for name in self.paths}
+
+        for path in self.paths.values():
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    def write(self, name, df):
+        first = name not in self.started
+        df.to_csv(self.paths[name], mode='w' if first else 'a', header=first, index=False)
+        self.started.add(name)
+        self.rows[name] += len(df)
+
+    def write_split(self, chunk, codes):
+        """분할 코드 배열에 따라 청크를 각 파일에 나눠 저장"""
+        for code, name in enumerate(SPLIT_NAMES):
+            if name in self.paths:
+                self.write(name, chunk[codes == code])
+
+
+# ============================================================
+# 병렬 분할 (parallel_scan.parallel_map 작업 함수)
+# ============================================================
+def part_path(path, index):
+    return f"{path}.part{index:05d}"
+
+
+def split_range_to_parts(assign, engine_factory, paths, chunk_size, index, spec):
+    """
+    구간 1개를 분할하여 구간 전용 part 파일에 저장하고 분할별 통계 집계
+
+    Args:
+        assign: user_id 배열 → 분할 코드 배열 함수
+        engine_factory: 분할별 통계용 빈 ScanEngine 생성 함수
+        paths: {분할명: 최종 출력 경로}
+        index, spec: parallel_map이 넘겨주는 구간 번호 / 구간
+
+    Returns:
+        (part 파일이 생성된 분할명 집합, {분할명: ScanEngine})
+    """
+    writer = SplitCsvWriter({name: part_path(path, index) for name, path in paths.items()})
+    engines = {name: engine_factory() for name in paths}
+
+    for chunk in read_range(spec, None, chunk_size):
+        codes = assign(chunk['user_id'].values)
+        writer.write_split(chunk, codes)
+        for code, name in enumerate(SPLIT_NAMES):
+            if name in engines:
+                engines[name].update(chunk[codes == code])
+
+    return writer.started, engines
+
+
+def concat_parts(paths, started_per_range):
+    """
+    구간별 part 파일을 구간 순서대로 최종 파일에 이어 붙이고 삭제 (첫 part만 header 유지)
+
+    Args:
+        paths: {분할명: 최종 출력 경로}
+        started_per_range: 구간 순서대로 part 파일이 생성된 분할명 집합 리스트
+    """
+    for name, path in paths.items():
+        with open(path, 'wb') as out:
+            first = True
+            for index, started in enumerate(started_per_range):
+                if name not in started:
+                    continue
+                src = part_path(path, index)
+                with open(src, 'rb') as f:
+                    if not first:
+                        f.readline()  # header
+                    shutil.copyfileobj(f, out, 16 * 1024 * 1024)
+                os.remove(src)
+                first = False
+
+
+# ============================================================
+# Leave-One-Out 분할
+# ============================================================
+def leave_one_out(user_codes, days, n_users=None, min_train=1):
+    """
+    사용자별 마지막(가장 최근 날짜) 상호작용을 Test로 분리
+
+    (day, 행 번호)를 int64 하나로 합쳐 사용자별 최댓값을 구하는 segment reduction으로
+    처리하므로 전체 정렬이나 DataFrame 복사가 없음. 같은 날짜가 여러 개면 뒤쪽 행 선택
+
+    Args:
+        user_codes: 0 ~ n_users-1 정수 사용자 코드 배열 (pd.factorize, IdMapping.encode 등)
+        days: int32 day number 배열 (interaction_store.encode_dates)
+        n_users: 사용자 수 (None이면 user_codes.max() + 1)
+        min_train: Train에 남아야 하는 최소 상호작용 수 (미달 사용자는 Train/Test 모두 제외)
+
+    Returns:
+        (train_mask: 행별 bool 배열, test_idx: Test 행 번호 배열 (사용자 코드 순, int64))
+    """
+    user_codes = np.asarray(user_codes)
+    days = np.asarray(days)
+    n_rows = len(user_codes)
+    if n_rows >= 1 << 32:
+        raise ValueError(f"행 수가 너무 많음 (행 번호 32비트 초과): {n_rows:,}")
+    if n_users is None:
+        n_users = int(user_codes.max()) + 1 if n_rows else 0
+
+    # 상위 비트: 날짜 (min 기준 오프셋), 하위 32비트: 행 번호
+    day_offset = days.astype(np.int64) - (int(days.min()) if n_rows else 0)
+    composite = (day_offset << np.int64(32)) | np.arange(n_rows, dtype=np.int64)
+
+    last = np.full(n_users, -1, dtype=np.int64)
+    np.maximum.at(last, user_codes, composite)
+
+    counts = np.bincount(user_codes, minlength=n_users)
+    keep_user = counts >= min_train + 1
+
+    test_idx = last[keep_user] & np.int64(0xFFFFFFFF)
+
+    train_mask = keep_user[user_codes]
+    train_mask[test_idx] = False
+    return train_mask, test_idx
+
+
+def write_masked_csv(df, mask, path, chunk_size=2_000_000):
+    """mask에 해당하는 행만 청크 단위로 저장 (전체 부분 DataFrame 복사 없음)"""
+    for start in range(0, len(df), chunk_size):
+        end = min(start + chunk_size, len(df))
+        df.iloc[start:end][mask[start:end]].to_csv(
+            path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+    if len(df) == 0:
+        df.to_csv(path, index=False)
@@ -4,36 +4,33 @@ Phase 1 - Task 1.5: 상호작용 분포 EDA (Zipf's Law 확인)
 """
 import pandas as pd
 import numpy as np
-from collections import Counter
+from scan_engine import load_phase_stats, run_phase_scan
 
 print("=" * 70)
 print("Phase 1 - Task 1.5: 상호작용 분포 EDA (Zipf's Law 확인)")
 print("=" * 70)
 
-rec_file = "Game Recommendations on Steam/recommendations.csv"
-
 # ============================================================
 # Step 1: 청크 기반 집계
 # ============================================================
 print("\n[Step 1] 청크 기반 집계 (41M rows)")
 print("-" * 50)
 
-app_counter = Counter()
-user_counter = Counter()
-total_rows = 0
-chunk_size = 1_000_000
+# scan_engine 캐시가 있으면 재사용 (없으면 1회 스캔)
+stats = load_phase_stats()
+if stats is None:
+    print("  청크 처리 중...")
+    stats = run_phase_scan()
+else:
+    print("  스캔 캐시 사용 (data_store/scan_stats.pkl)")
 
-print("  청크 처리 중...")
-for i, chunk in enumerate(pd.read_csv(rec_file, chunksize=chunk_size, usecols=['app_id', 'user_id'])):
-    app_counter.update(chunk['app_id'].values)
-    user_counter.update(chunk['user_id'].values)
-    total_rows += len(chunk)
-    if (i + 1) % 10 == 0:
-        print(f"    {total_rows:,} rows 처리 완료...")
+app_counts = stats['app_count']
+user_counts = stats['user_count']
+total_rows = stats['total_rows']
 
 print(f"\n  총 처리: {total_rows:,} rows")
-print(f"  유니크 app_id: {len(app_counter):,}")
-print(f"  유니크 user_id: {len(user_counter):,}")
+print(f"  유니크 app_id: {len(app_counts):,}")
+print(f"  유니크 user_id: {len(user_counts):,}")
 
 # ============================================================
 # Step 2: 아이템 인기도 분포 (app_id별 상호작용 수)
@@ -41,7 +38,7 @@ print(f"  유니크 user_id: {len(user_counter):,}")
 print("\n[Step 2] 아이템 인기도 분포")
 print("-" * 50)
 
-app_interactions = pd.Series(dict(app_counter))
+app_interactions = app_counts.copy()
 app_interactions = app_interactions.sort_values(ascending=False)
 
 print(f"  상호작용 수 통계:")
@@ -75,7 +72,7 @@ for label in labels:
 print("\n[Step 3] 사용자 활동량 분포")
 print("-" * 50)
 
-user_interactions = pd.Series(dict(user_counter))
+user_interactions = user_counts.copy()
 user_interactions = user_interactions.sort_values(ascending=False)
 
 print(f"  상호작용 수 통계:")
@@ -177,8 +174,8 @@ print("=" * 70)
 print(f"""
 기본 통계:
   - 총 상호작용: {total_rows:,}
-  - 유니크 아이템: {len(app_counter):,}
-  - 유니크 사용자: {len(user_counter):,}
+  - 유니크 아이템: {len(app_counts):,}
+  - 유니크 사용자: {len(user_counts):,}
   - 평균 아이템당 상호작용: {app_interactions.mean():.1f}
   - 평균 사용자당 리뷰: {user_interactions.mean():.2f}
 
@@ -5,8 +5,8 @@ Phase 1 - Task 1.6: 데이터 병합 및 통합 데이터셋 생성
 import pandas as pd
 import numpy as np
 import json
-from collections import Counter
 import os
+from scan_engine import load_phase_stats, run_phase_scan
 
 print("=" * 70)
 print("Phase 1 - Task 1.6: 데이터 병합 및 통합 데이터셋 생성")
@@ -18,16 +18,16 @@ print("=" * 70)
 print("\n[Step 1] 상호작용 집계 (청크 처리)")
 print("-" * 50)
 
-rec_file = "Game Recommendations on Steam/recommendations.csv"
-app_counter = Counter()
-user_counter = Counter()
+# scan_engine 캐시가 있으면 재사용 (task1_5와 같은 스캔 결과)
+stats = load_phase_stats()
+if stats is None:
+    stats = run_phase_scan()
 
-for chunk in pd.read_csv(rec_file, chunksize=2_000_000, usecols=['app_id', 'user_id']):
-    app_counter.update(chunk['app_id'].values)
-    user_counter.update(chunk['user_id'].values)
+app_counts = stats['app_count']
+user_counts = stats['user_count']
 
-print(f"  아이템 집계 완료: {len(app_counter):,} games")
-print(f"  사용자 집계 완료: {len(user_counter):,} users")
+print(f"  아이템 집계 완료: {len(app_counts):,} games")
+print(f"  사용자 집계 완료: {len(user_counts):,} users")
 
 # ============================================================
 # Step 2: 아이템 파티션 기준 계산
@@ -36,8 +36,8 @@ print("\n[Step 2] 아이템 파티션 기준 계산")
 print("-" * 50)
 
 app_df = pd.DataFrame({
-    'app_id': list(app_counter.keys()),
-    'interaction_count': list(app_counter.values())
+    'app_id': app_counts.index.values,
+    'interaction_count': app_counts.values
 })
 app_df = app_df.sort_values('interaction_count', ascending=False).reset_index(drop=True)
 
@@ -70,8 +70,8 @@ print("\n[Step 3] 사용자 파티션 기준 계산")
 print("-" * 50)
 
 user_df = pd.DataFrame({
-    'user_id': list(user_counter.keys()),
-    'review_count': list(user_counter.values())
+    'user_id': user_counts.index.values,
+    'review_count': user_counts.values
 })
 user_df = user_df.sort_values('review_count', ascending=False).reset_index(drop=True)
 
@@ -266,8 +266,8 @@ print("\n[파티션 교차 분석 준비]")
 popular_items = set(items[items['item_partition'] == 'Popular']['app_id'])
 longtail_items = set(items[items['item_partition'] == 'Long-tail']['app_id'])
 
-popular_interactions = sum(cnt for app, cnt in app_counter.items() if app in popular_items)
-longtail_interactions = sum(cnt for app, cnt in app_counter.items() if app in longtail_items)
+popular_interactions = int(app_counts[app_counts.index.isin(popular_items)].sum())
+longtail_interactions = int(app_counts[app_counts.index.isin(longtail_items)].sum())
 total = popular_interactions + longtail_interactions
 
 print(f"  Popular 아이템 상호작용: {popular_interactions:,} ({popular_interactions/total*100:.1f}%)")
@@ -5,7 +5,8 @@ Popular/Long-tail × Heavy/Light 4개 그룹 분석
 """
 import pandas as pd
 import numpy as np
-from collections import defaultdict
+from scan_engine import (GROUPS, GROUP_SCAN_CACHE, HOURS_BINS, PartitionGroupKey, load_phase_stats, run_phase_scan,
+                         histogram_quantile)
 
 print("=" * 70)
 print("Phase 2 - Task 2.1: 파티션 교차 분석")
@@ -23,9 +24,8 @@ users = pd.read_csv("merged_users.csv", usecols=['user_id', 'user_partition', 'r
 print(f"  아이템: {len(items):,} (Popular: {(items['item_partition']=='Popular').sum():,}, Long-tail: {(items['item_partition']=='Long-tail').sum():,})")
 print(f"  사용자: {len(users):,} (Heavy: {(users['user_partition']=='Heavy').sum():,}, Light: {(users['user_partition']=='Light').sum():,})")
 
-# 파티션 딕셔너리 생성
-item_partition_dict = dict(zip(items['app_id'], items['item_partition']))
-user_partition_dict = dict(zip(users['user_id'], users['user_partition']))
+# 파티션 그룹 키 생성
+group_key = PartitionGroupKey.from_merged(items, users)
 
 # ============================================================
 # Step 2: 상호작용 청크 처리 - 그룹별 집계
@@ -33,38 +33,24 @@ user_partition_dict = dict(zip(users['user_id'], users['user_partition']))
 print("\n[Step 2] 상호작용 청크 처리 - 그룹별 집계")
 print("-" * 50)
 
-rec_file = "Game Recommendations on Steam/recommendations.csv"
-
-# 그룹별 카운터
-group_counts = defaultdict(int)
-group_hours = defaultdict(list)
-group_recommended = defaultdict(list)
-
-total_rows = 0
-chunk_size = 2_000_000
-
-print("  청크 처리 중...")
-for chunk in pd.read_csv(rec_file, chunksize=chunk_size, 
-                          usecols=['app_id', 'user_id', 'hours', 'is_recommended']):
-    
-    # 파티션 매핑
-    chunk['item_part'] = chunk['app_id'].map(item_partition_dict).fillna('Long-tail')
-    chunk['user_part'] = chunk['user_id'].map(user_partition_dict).fillna('Light')
-    
-    # 4개 그룹 생성
-    chunk['group'] = chunk['item_part'] + '_' + chunk['user_part']
-    
-    # 그룹별 집계
-    for group, g_df in chunk.groupby('group'):
-        group_counts[group] += len(g_df)
-        # 샘플링하여 hours, is_recommended 저장 (메모리 효율)
-        if len(group_hours[group]) < 100000:
-            group_hours[group].extend(g_df['hours'].sample(min(1000, len(g_df))).tolist())
-            group_recommended[group].extend(g_df['is_recommended'].sample(min(1000, len(g_df))).tolist())
-    
-    total_rows += len(chunk)
-    if total_rows % 10_000_000 == 0:
-        print(f"    {total_rows:,} rows 처리...")
+# 파티션은 task1_6에서 1차 스캔 카운트로 정해지므로 그룹 통계는 별도 1회 스캔
+# (같은 파티션 + 같은 원본으로 계산된 그룹 캐시가 있으면 재사용)
+stats = load_phase_stats(group_key, GROUP_SCAN_CACHE)
+if stats is None or 'group_hours_hist' not in stats:
+    print("  청크 처리 중...")
+    stats = run_phase_scan(group_key, cache_path=GROUP_SCAN_CACHE)
+else:
+    print(f"  스캔 캐시 사용 ({GROUP_SCAN_CACHE})")
+
+group_counts = stats['group_count'].reindex(GROUPS, fill_value=0).to_dict()
+# 플레이 시간: 전체 행의 그룹별 합계 / 히스토그램
+group_hours_sum = stats['group_hours_sum'].reindex(GROUPS, fill_value=0.0).to_dict()
+group_hours_hist = {g: stats['group_hours_hist'].get(g, np.zeros(len(HOURS_BINS) - 1, dtype=np.int64))
+                    for g in GROUPS}
+# 추천 비율: 그룹별 균등 샘플 (그룹당 최대 100,000개)
+group_sample = stats['group_sample']
+group_recommended = {g: group_sample[g]['is_recommended'].tolist() if g in group_sample else [] for g in GROUPS}
+total_rows = stats['total_rows']
 
 print(f"\n  총 처리: {total_rows:,} rows")
 
@@ -121,12 +107,26 @@ print("\n  [플레이 시간 (hours)]")
 print(f"  {'그룹':<20} {'평균':>10} {'중앙값':>10}")
 print("  " + "-" * 42)
 for group in groups:
-    hours = group_hours[group]
-    if hours:
-        avg = np.mean(hours)
-        med = np.median(hours)
+    hist = group_hours_hist[group]
+    if hist.sum():
+        avg = group_hours_sum[group] / hist.sum()
+        med = histogram_quantile(hist, HOURS_BINS, 0.5)
         print(f"  {group:<20} {avg:>10.1f} {med:>10.1f}")
 
+# 거친 구간 분포 (HOURS_BINS 경계의 구간 합)
+hours_edges = np.array([0, 1, 10, 100, 1000, np.inf])
+edge_pos = np.searchsorted(HOURS_BINS, hours_edges)
+hours_labels = ['<1', '1-10', '10-100', '100-1000', '1000+']
+
+print("\n  [플레이 시간 분포 (%)]")
+print(f"  {'그룹':<20} " + " ".join(f"{label:>9}" for label in hours_labels))
+print("  " + "-" * (21 + 10 * len(hours_labels)))
+for group in groups:
+    hist = group_hours_hist[group]
+    if hist.sum():
+        coarse = np.add.reduceat(hist, edge_pos[:-1]) / hist.sum() * 100
+        print(f"  {group:<20} " + " ".join(f"{pct:>8.1f}%" for pct in coarse))
+
 print("\n  [추천 비율 (is_recommended=True)]")
 print(f"  {'그룹':<20} {'추천 비율':>10}")
 print("  " + "-" * 32)
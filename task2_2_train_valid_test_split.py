@@ -2,17 +2,32 @@
 """
 Phase 2 - Task 2.2: Train/Valid/Test 분할
 사용자 기반 랜덤 분할 (동일 사용자 상호작용이 분산되지 않도록)
+
+분할 방식 (SPLIT_MODE):
+    - 'hash': user_id 시드 해시로 배정 → 전역 셔플 없이 재현 가능, 청크 단위 즉시 저장
+    - 'shuffle': 유니크 사용자 수집 후 셔플 (기존 방식)
+두 방식 모두 청크를 읽는 즉시 분할 파일에 저장하므로 최대 메모리는 프로세스당 청크 1개 수준
 """
 import pandas as pd
 import numpy as np
-from collections import Counter
+import functools
 import os
+from interaction_store import read_interaction_chunks
+from id_mapping import IdMapping
+from parallel_scan import DEFAULT_WORKERS, parallel_map, scan_ranges
+from scan_engine import GROUPS, PartitionGroupKey, ScanEngine, CountByKey, SumByKey
+from splits import SPLIT_NAMES, concat_parts, hash_split_assign, split_range_to_parts
 
 print("=" * 70)
 print("Phase 2 - Task 2.2: Train/Valid/Test 분할")
 print("=" * 70)
 
-np.random.seed(42)  # 재현성
+SPLIT_MODE = 'hash'   # 'hash' | 'shuffle'
+SPLIT_SEED = 42       # 재현성
+SPLIT_RATIOS = (0.8, 0.1, 0.1)
+SPLIT_WORKERS = None  # 병렬 프로세스 수 (None이면 CPU 코어 수)
+
+np.random.seed(SPLIT_SEED)
 
 # ============================================================
 # Step 1: 파티션 정보 로드
@@ -23,42 +38,55 @@ print("-" * 50)
 items = pd.read_csv("merged_items.csv", usecols=['app_id', 'item_partition'])
 users = pd.read_csv("merged_users.csv", usecols=['user_id', 'user_partition'])
 
-item_partition_dict = dict(zip(items['app_id'], items['item_partition']))
-user_partition_dict = dict(zip(users['user_id'], users['user_partition']))
+group_key = PartitionGroupKey.from_merged(items, users)
 
-print(f"  아이템 파티션 로드: {len(item_partition_dict):,}")
-print(f"  사용자 파티션 로드: {len(user_partition_dict):,}")
+print(f"  아이템 파티션 로드: {len(items):,}")
+print(f"  사용자 파티션 로드: {len(users):,}")
 
 # ============================================================
 # Step 2: 사용자 ID 분할 (80/10/10)
 # ============================================================
-print("\n[Step 2] 사용자 ID 분할 (Train 80% / Valid 10% / Test 10%)")
+print(f"\n[Step 2] 사용자 ID 분할 (Train 80% / Valid 10% / Test 10%, mode={SPLIT_MODE})")
 print("-" * 50)
 
 # recommendations.csv에 있는 사용자만 대상
 rec_file = "Game Recommendations on Steam/recommendations.csv"
 
-# 먼저 유니크 사용자 수집
-print("  유니크 사용자 수집 중...")
-unique_users = set()
-for chunk in pd.read_csv(rec_file, chunksize=2_000_000, usecols=['user_id']):
-    unique_users.update(chunk['user_id'].unique())
+if SPLIT_MODE == 'hash':
+    print("  user_id 해시 기반 배정 (청크 처리 중 바로 분할)")
+
+    def assign_split(user_ids):
+        return hash_split_assign(user_ids, seed=SPLIT_SEED, ratios=SPLIT_RATIOS)
+
+elif SPLIT_MODE == 'shuffle':
+    # 먼저 유니크 사용자 수집
+    print("  유니크 사용자 수집 중...")
+    unique_users = set()
+    for chunk in read_interaction_chunks(['user_id'], 2_000_000, csv_path=rec_file):
+        unique_users.update(chunk['user_id'].unique())
+
+    unique_users = np.array(list(unique_users))
+    np.random.shuffle(unique_users)
 
-unique_users = np.array(list(unique_users))
-np.random.shuffle(unique_users)
+    n_users = len(unique_users)
+    n_train = int(n_users * SPLIT_RATIOS[0])
+    n_valid = int(n_users * SPLIT_RATIOS[1])
 
-n_users = len(unique_users)
-n_train = int(n_users * 0.8)
-n_valid = int(n_users * 0.1)
+    # 셔플 순서 위치 → 분할 코드 (train: [0, n_train), valid: [n_train, n_train + n_valid), test: 나머지)
+    shuffled_order = IdMapping(unique_users)
+    del unique_users
 
-train_users = set(unique_users[:n_train])
-valid_users = set(unique_users[n_train:n_train + n_valid])
-test_users = set(unique_users[n_train + n_valid:])
+    def assign_split(user_ids):
+        pos = shuffled_order.encode(user_ids)
+        return np.searchsorted([n_train, n_train + n_valid], pos, side='right').astype(np.int8)
 
-print(f"  총 사용자: {n_users:,}")
-print(f"  Train 사용자: {len(train_users):,} ({len(train_users)/n_users*100:.1f}%)")
-print(f"  Valid 사용자: {len(valid_users):,} ({len(valid_users)/n_users*100:.1f}%)")
-print(f"  Test 사용자: {len(test_users):,} ({len(test_users)/n_users*100:.1f}%)")
+    print(f"  총 사용자: {n_users:,}")
+    print(f"  Train 사용자: {n_train:,} ({n_train/n_users*100:.1f}%)")
+    print(f"  Valid 사용자: {n_valid:,} ({n_valid/n_users*100:.1f}%)")
+    print(f"  Test 사용자: {n_users - n_train - n_valid:,} ({(n_users - n_train - n_valid)/n_users*100:.1f}%)")
+
+else:
+    raise ValueError(f"알 수 없는 SPLIT_MODE: {SPLIT_MODE}")
 
 # ============================================================
 # Step 3: 상호작용 분할 및 저장
@@ -69,40 +97,50 @@ print("-" * 50)
 # 출력 디렉토리
 os.makedirs("data_split", exist_ok=True)
 
-train_rows = []
-valid_rows = []
-test_rows = []
-
-print("  청크 처리 및 분할 중...")
-for chunk in pd.read_csv(rec_file, chunksize=2_000_000):
-    # Train
-    train_mask = chunk['user_id'].isin(train_users)
-    train_rows.append(chunk[train_mask])
-    
-    # Valid
-    valid_mask = chunk['user_id'].isin(valid_users)
-    valid_rows.append(chunk[valid_mask])
-    
-    # Test
-    test_mask = chunk['user_id'].isin(test_users)
-    test_rows.append(chunk[test_mask])
-
-# 합치기
-train_df = pd.concat(train_rows, ignore_index=True)
-valid_df = pd.concat(valid_rows, ignore_index=True)
-test_df = pd.concat(test_rows, ignore_index=True)
+split_paths = {name: f"data_split/{name}_interactions.csv" for name in SPLIT_NAMES}
 
-print(f"\n  분할 결과:")
-print(f"    Train: {len(train_df):,} rows ({len(train_df)/(len(train_df)+len(valid_df)+len(test_df))*100:.1f}%)")
-print(f"    Valid: {len(valid_df):,} rows ({len(valid_df)/(len(train_df)+len(valid_df)+len(test_df))*100:.1f}%)")
-print(f"    Test: {len(test_df):,} rows ({len(test_df)/(len(train_df)+len(valid_df)+len(test_df))*100:.1f}%)")
 
-# 저장
-print("\n  파일 저장 중...")
-train_df.to_csv("data_split/train_interactions.csv", index=False)
-valid_df.to_csv("data_split/valid_interactions.csv", index=False)
-test_df.to_csv("data_split/test_interactions.csv", index=False)
+# 분할별 통계 (DataFrame을 메모리에 모으지 않고 청크 단위로 집계)
+def build_split_engine():
+    engine = ScanEngine()
+    engine.register('user_count', CountByKey('user_id'))
+    engine.register('app_count', CountByKey('app_id'))
+    engine.register('group_count', CountByKey(group_key))
+    engine.register('hours_sum', SumByKey(group_key, 'hours'))
+    engine.register('recommended_sum', SumByKey(group_key, 'is_recommended'))
+    return engine
+
+
+# 구간별로 병렬 분할 → part 파일을 구간 순서대로 이어 붙임 (행 순서는 원본과 동일)
+print(f"  청크 처리 및 분할 중... (workers={SPLIT_WORKERS or DEFAULT_WORKERS})")
+range_results = parallel_map(
+    functools.partial(split_range_to_parts, assign_split, build_split_engine, split_paths, 2_000_000),
+    scan_ranges(csv_path=rec_file), SPLIT_WORKERS)
+concat_parts(split_paths, [started for started, _ in range_results])
+
+split_engines = {name: build_split_engine() for name in SPLIT_NAMES}
+for _, engines in range_results:
+    for name in SPLIT_NAMES:
+        split_engines[name].merge(engines[name])
+del range_results
 
+split_stats = {name: engine.results() for name, engine in split_engines.items()}
+split_rows = {name: stats['total_rows'] for name, stats in split_stats.items()}
+total_split_rows = sum(split_rows.values())
+
+if SPLIT_MODE == 'hash':
+    print(f"\n  사용자 분할 결과:")
+    n_users = sum(len(stats['user_count']) for stats in split_stats.values())
+    for name in SPLIT_NAMES:
+        n = len(split_stats[name]['user_count'])
+        print(f"    {name.capitalize()} 사용자: {n:,} ({n/n_users*100:.1f}%)")
+
+print(f"\n  분할 결과:")
+print(f"    Train: {split_rows['train']:,} rows ({split_rows['train']/total_split_rows*100:.1f}%)")
+print(f"    Valid: {split_rows['valid']:,} rows ({split_rows['valid']/total_split_rows*100:.1f}%)")
+print(f"    Test: {split_rows['test']:,} rows ({split_rows['test']/total_split_rows*100:.1f}%)")
+
+print(f"\n  저장 완료:")
 print(f"    data_split/train_interactions.csv 저장 완료")
 print(f"    data_split/valid_interactions.csv 저장 완료")
 print(f"    data_split/test_interactions.csv 저장 완료")
@@ -113,52 +151,47 @@ print(f"    data_split/test_interactions.csv 저장 완료")
 print("\n[Step 4] 파티션 분포 확인")
 print("-" * 50)
 
-def get_partition_dist(df, item_dict, user_dict):
-    """그룹별 상호작용 분포 계산"""
-    df = df.copy()
-    df['item_part'] = df['app_id'].map(item_dict).fillna('Long-tail')
-    df['user_part'] = df['user_id'].map(user_dict).fillna('Light')
-    df['group'] = df['item_part'] + '_' + df['user_part']
-    
-    dist = df['group'].value_counts(normalize=True) * 100
-    return dist
+split_labels = [('Train', 'train'), ('Valid', 'valid'), ('Test', 'test')]
+
+
+def get_partition_dist(stats):
+    """그룹별 상호작용 분포 계산 (%)"""
+    counts = stats['group_count'].reindex(GROUPS, fill_value=0)
+    return counts / max(stats['total_rows'], 1) * 100
+
 
 print("\n  [아이템 파티션 분포]")
 print(f"  {'분할':<10} {'Popular':>12} {'Long-tail':>12}")
 print("  " + "-" * 36)
 
-for name, df in [('Train', train_df), ('Valid', valid_df), ('Test', test_df)]:
-    df_temp = df.copy()
-    df_temp['item_part'] = df_temp['app_id'].map(item_partition_dict).fillna('Long-tail')
-    pop_pct = (df_temp['item_part'] == 'Popular').mean() * 100
-    lt_pct = (df_temp['item_part'] == 'Long-tail').mean() * 100
-    print(f"  {name:<10} {pop_pct:>11.2f}% {lt_pct:>11.2f}%")
+for label, name in split_labels:
+    dist = get_partition_dist(split_stats[name])
+    pop_pct = dist['Popular_Heavy'] + dist['Popular_Light']
+    lt_pct = dist['Long-tail_Heavy'] + dist['Long-tail_Light']
+    print(f"  {label:<10} {pop_pct:>11.2f}% {lt_pct:>11.2f}%")
 
 print("\n  [사용자 파티션 분포]")
 print(f"  {'분할':<10} {'Heavy':>12} {'Light':>12}")
 print("  " + "-" * 36)
 
-for name, df in [('Train', train_df), ('Valid', valid_df), ('Test', test_df)]:
-    df_temp = df.copy()
-    df_temp['user_part'] = df_temp['user_id'].map(user_partition_dict).fillna('Light')
-    hv_pct = (df_temp['user_part'] == 'Heavy').mean() * 100
-    lt_pct = (df_temp['user_part'] == 'Light').mean() * 100
-    print(f"  {name:<10} {hv_pct:>11.2f}% {lt_pct:>11.2f}%")
+for label, name in split_labels:
+    dist = get_partition_dist(split_stats[name])
+    hv_pct = dist['Popular_Heavy'] + dist['Long-tail_Heavy']
+    lt_pct = dist['Popular_Light'] + dist['Long-tail_Light']
+    print(f"  {label:<10} {hv_pct:>11.2f}% {lt_pct:>11.2f}%")
 
 print("\n  [4개 그룹 분포]")
-groups = ['Popular_Heavy', 'Popular_Light', 'Long-tail_Heavy', 'Long-tail_Light']
 print(f"  {'분할':<10}", end="")
-for g in groups:
+for g in GROUPS:
     print(f" {g:>15}", end="")
 print()
 print("  " + "-" * 75)
 
-for name, df in [('Train', train_df), ('Valid', valid_df), ('Test', test_df)]:
-    dist = get_partition_dist(df, item_partition_dict, user_partition_dict)
-    print(f"  {name:<10}", end="")
-    for g in groups:
-        pct = dist.get(g, 0)
-        print(f" {pct:>14.2f}%", end="")
+for label, name in split_labels:
+    dist = get_partition_dist(split_stats[name])
+    print(f"  {label:<10}", end="")
+    for g in GROUPS:
+        print(f" {dist[g]:>14.2f}%", end="")
     print()
 
 # ============================================================
@@ -171,20 +204,21 @@ print("\n  [유니크 ID 수]")
 print(f"  {'분할':<10} {'Users':>15} {'Items':>15}")
 print("  " + "-" * 42)
 
-for name, df in [('Train', train_df), ('Valid', valid_df), ('Test', test_df)]:
-    n_users = df['user_id'].nunique()
-    n_items = df['app_id'].nunique()
-    print(f"  {name:<10} {n_users:>15,} {n_items:>15,}")
+for label, name in split_labels:
+    n_users = len(split_stats[name]['user_count'])
+    n_items = len(split_stats[name]['app_count'])
+    print(f"  {label:<10} {n_users:>15,} {n_items:>15,}")
 
 print("\n  [상호작용 통계]")
 print(f"  {'분할':<10} {'총 상호작용':>15} {'평균 hours':>12} {'추천율':>10}")
 print("  " + "-" * 50)
 
-for name, df in [('Train', train_df), ('Valid', valid_df), ('Test', test_df)]:
-    n_inter = len(df)
-    avg_hours = df['hours'].mean()
-    rec_rate = df['is_recommended'].mean() * 100
-    print(f"  {name:<10} {n_inter:>15,} {avg_hours:>11.1f}h {rec_rate:>9.1f}%")
+for label, name in split_labels:
+    stats = split_stats[name]
+    n_inter = stats['total_rows']
+    avg_hours = stats['hours_sum'].sum() / max(n_inter, 1)
+    rec_rate = stats['recommended_sum'].sum() / max(n_inter, 1) * 100
+    print(f"  {label:<10} {n_inter:>15,} {avg_hours:>11.1f}h {rec_rate:>9.1f}%")
 
 # ============================================================
 # Step 6: Cold-start 분석
@@ -192,24 +226,26 @@ for name, df in [('Train', train_df), ('Valid', valid_df), ('Test', test_df)]:
 print("\n[Step 6] Cold-start 분석")
 print("-" * 50)
 
-train_users_set = set(train_df['user_id'].unique())
-train_items_set = set(train_df['app_id'].unique())
+train_users_index = split_stats['train']['user_count'].index
+train_items_index = split_stats['train']['app_count'].index
 
-# Valid에서 Cold-start
-valid_cold_users = valid_df[~valid_df['user_id'].isin(train_users_set)]
-valid_cold_items = valid_df[~valid_df['app_id'].isin(train_items_set)]
 
-print("\n  [Valid 데이터 Cold-start]")
-print(f"    Cold User (Train에 없음): {len(valid_cold_users):,} ({len(valid_cold_users)/len(valid_df)*100:.2f}%)")
-print(f"    Cold Item (Train에 없음): {len(valid_cold_items):,} ({len(valid_cold_items)/len(valid_df)*100:.2f}%)")
+def cold_rows(counts, train_index):
+    """Train에 없는 키의 상호작용 수"""
+    return int(counts[~counts.index.isin(train_index)].sum())
 
-# Test에서 Cold-start
-test_cold_users = test_df[~test_df['user_id'].isin(train_users_set)]
-test_cold_items = test_df[~test_df['app_id'].isin(train_items_set)]
 
-print("\n  [Test 데이터 Cold-start]")
-print(f"    Cold User (Train에 없음): {len(test_cold_users):,} ({len(test_cold_users)/len(test_df)*100:.2f}%)")
-print(f"    Cold Item (Train에 없음): {len(test_cold_items):,} ({len(test_cold_items)/len(test_df)*100:.2f}%)")
+cold = {}
+for label, name in split_labels[1:]:
+    stats = split_stats[name]
+    n_rows = max(stats['total_rows'], 1)
+    cold_users = cold_rows(stats['user_count'], train_users_index)
+    cold_items = cold_rows(stats['app_count'], train_items_index)
+    cold[name] = cold_users / n_rows * 100
+
+    print(f"\n  [{label} 데이터 Cold-start]")
+    print(f"    Cold User (Train에 없음): {cold_users:,} ({cold_users/n_rows*100:.2f}%)")
+    print(f"    Cold Item (Train에 없음): {cold_items:,} ({cold_items/n_rows*100:.2f}%)")
 
 # ============================================================
 # 결과 요약
@@ -218,10 +254,10 @@ print("\n" + "=" * 70)
 print("[결과 요약]")
 print("=" * 70)
 print(f"""
-분할 결과:
-  - Train: {len(train_df):,} rows ({len(train_df)/(len(train_df)+len(valid_df)+len(test_df))*100:.1f}%)
-  - Valid: {len(valid_df):,} rows ({len(valid_df)/(len(train_df)+len(valid_df)+len(test_df))*100:.1f}%)
-  - Test: {len(test_df):,} rows ({len(test_df)/(len(train_df)+len(valid_df)+len(test_df))*100:.1f}%)
+분할 결과 (mode={SPLIT_MODE}, seed={SPLIT_SEED}):
+  - Train: {split_rows['train']:,} rows ({split_rows['train']/total_split_rows*100:.1f}%)
+  - Valid: {split_rows['valid']:,} rows ({split_rows['valid']/total_split_rows*100:.1f}%)
+  - Test: {split_rows['test']:,} rows ({split_rows['test']/total_split_rows*100:.1f}%)
 
 저장 파일:
   - data_split/train_interactions.csv
@@ -229,10 +265,9 @@ print(f"""
   - data_split/test_interactions.csv
 
 Cold-start (사용자 기반 분할):
-  - Valid Cold Users: {len(valid_cold_users)/len(valid_df)*100:.2f}%
-  - Test Cold Users: {len(test_cold_users)/len(test_df)*100:.2f}%
+  - Valid Cold Users: {cold['valid']:.2f}%
+  - Test Cold Users: {cold['test']:.2f}%
   - Valid/Test의 모든 사용자가 Train에 없음 (사용자 기반 분할)
   - 아이템은 Train에 있을 수 있음 (아이템 기반 분할 아님)
 """)
 print("=" * 70)
-
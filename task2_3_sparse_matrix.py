@@ -5,9 +5,9 @@ User-Item 상호작용 행렬 (CSR 포맷)
 """
 import pandas as pd
 import numpy as np
-from scipy.sparse import csr_matrix, save_npz
-import pickle
 import os
+from id_mapping import IdMapping, build_mappings, save_mappings, load_mappings
+from sparse_utils import build_csr, save_csr_mmap, load_csr_mmap
 
 print("=" * 70)
 print("Phase 2 - Task 2.3: Sparse Matrix 구축")
@@ -32,16 +32,13 @@ print(f"  유니크 아이템: {train['app_id'].nunique():,}")
 print("\n[Step 2] ID → Index 매핑 생성")
 print("-" * 50)
 
-# 유니크 ID 추출
-unique_users = train['user_id'].unique()
-unique_items = train['app_id'].unique()
+# 정수 코드 변환 (pd.factorize: 등장 순서 = idx)
+user_codes, unique_users = pd.factorize(train['user_id'])
+item_codes, unique_items = pd.factorize(train['app_id'])
 
-# 매핑 딕셔너리
-user_to_idx = {uid: idx for idx, uid in enumerate(unique_users)}
-idx_to_user = {idx: uid for uid, idx in user_to_idx.items()}
-
-item_to_idx = {iid: idx for idx, iid in enumerate(unique_items)}
-idx_to_item = {idx: iid for iid, idx in item_to_idx.items()}
+# 매핑 (배열 기반 IdMapping)
+user_mapping = IdMapping(np.asarray(unique_users))
+item_mapping = IdMapping(np.asarray(unique_items))
 
 n_users = len(unique_users)
 n_items = len(unique_items)
@@ -58,24 +55,23 @@ print(f"  희소율 (Sparsity): {(1 - len(train) / (n_users * n_items)) * 100:.6
 print("\n[Step 3] Index 변환")
 print("-" * 50)
 
-train['user_idx'] = train['user_id'].map(user_to_idx)
-train['item_idx'] = train['app_id'].map(item_to_idx)
-
-print(f"  user_idx 범위: 0 ~ {train['user_idx'].max()}")
-print(f"  item_idx 범위: 0 ~ {train['item_idx'].max()}")
+print(f"  user_idx 범위: 0 ~ {user_codes.max()}")
+print(f"  item_idx 범위: 0 ~ {item_codes.max()}")
 
 # ============================================================
-# Step 4: Sparse Matrix 생성 (Binary)
+# Step 4: Sparse Matrix 생성 (Binary + Hours 가중치, 1회 구축)
 # ============================================================
-print("\n[Step 4] Sparse Matrix 생성 (Binary)")
+print("\n[Step 4] Sparse Matrix 생성 (Binary + Hours 가중치)")
 print("-" * 50)
 
-# Binary matrix (상호작용 존재 여부)
-row = train['user_idx'].values
-col = train['item_idx'].values
-data = np.ones(len(train), dtype=np.float32)
+# Hours를 로그 변환하여 가중치로 사용 (1 + log(1 + hours))
+# 0시간도 최소 1의 가중치를 갖도록
+weight = (1 + np.log1p(train['hours'].values)).astype(np.float32)
 
-sparse_binary = csr_matrix((data, (row, col)), shape=(n_users, n_items))
+matrices = build_csr(user_codes, item_codes, (n_users, n_items),
+                     {'binary': None, 'weighted': weight})
+sparse_binary = matrices['binary']
+sparse_weighted = matrices['weighted']
 
 print(f"  Binary Matrix 생성 완료")
 print(f"    Shape: {sparse_binary.shape}")
@@ -84,25 +80,18 @@ print(f"    Density: {sparse_binary.nnz / (n_users * n_items) * 100:.6f}%")
 print(f"    Memory (data): {sparse_binary.data.nbytes / 1024**2:.2f} MB")
 
 # ============================================================
-# Step 5: Sparse Matrix 생성 (Hours 가중치)
+# Step 5: Hours 가중치 통계
 # ============================================================
 print("\n[Step 5] Sparse Matrix 생성 (Hours 가중치)")
 print("-" * 50)
 
-# Hours를 로그 변환하여 가중치로 사용 (1 + log(1 + hours))
-# 0시간도 최소 1의 가중치를 갖도록
-train['weight'] = 1 + np.log1p(train['hours'])
-
-data_weighted = train['weight'].values.astype(np.float32)
-sparse_weighted = csr_matrix((data_weighted, (row, col)), shape=(n_users, n_items))
-
 print(f"  Weighted Matrix 생성 완료")
 print(f"    Shape: {sparse_weighted.shape}")
 print(f"    Non-zero: {sparse_weighted.nnz:,}")
 print(f"    Weight 통계:")
-print(f"      평균: {train['weight'].mean():.3f}")
-print(f"      최소: {train['weight'].min():.3f}")
-print(f"      최대: {train['weight'].max():.3f}")
+print(f"      평균: {weight.mean():.3f}")
+print(f"      최소: {weight.min():.3f}")
+print(f"      최대: {weight.max():.3f}")
 print(f"    Memory (data): {sparse_weighted.data.nbytes / 1024**2:.2f} MB")
 
 # ============================================================
@@ -113,27 +102,18 @@ print("-" * 50)
 
 os.makedirs("data_split", exist_ok=True)
 
-# Sparse Matrix 저장 (.npz)
-save_npz("data_split/train_sparse_binary.npz", sparse_binary)
-save_npz("data_split/train_sparse_weighted.npz", sparse_weighted)
+# Sparse Matrix 저장 (memory-map CSR)
+save_csr_mmap("data_split/train_sparse_binary", sparse_binary)
+save_csr_mmap("data_split/train_sparse_weighted", sparse_weighted)
 
-# 매핑 저장 (pickle)
-mappings = {
-    'user_to_idx': user_to_idx,
-    'idx_to_user': idx_to_user,
-    'item_to_idx': item_to_idx,
-    'idx_to_item': idx_to_item,
-    'n_users': n_users,
-    'n_items': n_items
-}
-
-with open("data_split/id_mappings.pkl", 'wb') as f:
-    pickle.dump(mappings, f)
+# 매핑 저장 (.npy, memory-map 로드 가능)
+mappings = build_mappings(user_mapping, item_mapping)
+save_mappings("data_split/id_mappings", mappings)
 
 print(f"  저장 완료:")
-print(f"    data_split/train_sparse_binary.npz")
-print(f"    data_split/train_sparse_weighted.npz")
-print(f"    data_split/id_mappings.pkl")
+print(f"    data_split/train_sparse_binary/")
+print(f"    data_split/train_sparse_weighted/")
+print(f"    data_split/id_mappings/")
 
 # ============================================================
 # Step 7: Valid/Test 데이터도 Index 변환
@@ -146,11 +126,12 @@ for split_name in ['valid', 'test']:
                       usecols=['user_id', 'app_id', 'hours', 'is_recommended'])
     
     # Index 변환 (Train에 없는 ID는 -1)
-    df['user_idx'] = df['user_id'].map(user_to_idx).fillna(-1).astype(int)
-    df['item_idx'] = df['app_id'].map(item_to_idx).fillna(-1).astype(int)
+    df['user_idx'] = user_mapping.encode(df['user_id'].values)
+    df['item_idx'] = item_mapping.encode(df['app_id'].values)
     
     # 유효한 상호작용만 필터링 (Train에 있는 아이템만)
-    valid_mask = (df['user_idx'] >= 0) & (df['item_idx'] >= 0)
+    # 사용자 기반 분할이라 Valid/Test 사용자는 Train에 없으므로 user_idx = -1 유지 (fold-in 평가용)
+    valid_mask = df['item_idx'] >= 0
     df_valid = df[valid_mask]
     
     print(f"\n  [{split_name.upper()}]")
@@ -168,11 +149,8 @@ print("\n[Step 8] 검증")
 print("-" * 50)
 
 # 저장된 파일 로드 테스트
-from scipy.sparse import load_npz
-
-loaded_binary = load_npz("data_split/train_sparse_binary.npz")
-with open("data_split/id_mappings.pkl", 'rb') as f:
-    loaded_mappings = pickle.load(f)
+loaded_binary = load_csr_mmap("data_split/train_sparse_binary")
+loaded_mappings = load_mappings("data_split/id_mappings")
 
 print(f"  로드 테스트:")
 print(f"    Binary Matrix Shape: {loaded_binary.shape}")
@@ -204,14 +182,14 @@ Sparse Matrix 구축 완료:
   - 희소율: {(1 - sparse_binary.nnz / (n_users * n_items)) * 100:.6f}%
 
 저장 파일:
-  - data_split/train_sparse_binary.npz (Binary Matrix)
-  - data_split/train_sparse_weighted.npz (Hours 가중치)
-  - data_split/id_mappings.pkl (ID 매핑)
+  - data_split/train_sparse_binary/ (Binary Matrix, memory-map CSR)
+  - data_split/train_sparse_weighted/ (Hours 가중치, memory-map CSR)
+  - data_split/id_mappings/ (ID 매핑, .npy)
   - data_split/valid_indexed.csv (Index 변환된 Valid)
   - data_split/test_indexed.csv (Index 변환된 Test)
 
 모델 입력 형식:
-  - ALS/BPR: train_sparse_binary.npz 또는 train_sparse_weighted.npz
+  - ALS/BPR: train_sparse_binary/ 또는 train_sparse_weighted/ (sparse_utils.load_matrix)
   - 평가: valid_indexed.csv, test_indexed.csv
 """)
 print("=" * 70)
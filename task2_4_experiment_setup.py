@@ -5,9 +5,11 @@ Leave-One-Out 분할 + 평가 함수 구현
 """
 import pandas as pd
 import numpy as np
-from scipy.sparse import csr_matrix, save_npz
-import pickle
 import os
+from id_mapping import IdMapping, build_mappings, save_mappings
+from interaction_store import encode_dates
+from splits import leave_one_out, write_masked_csv
+from sparse_utils import build_csr, save_csr_mmap
 from collections import defaultdict
 
 print("=" * 70)
@@ -34,39 +36,32 @@ print("\n[Step 2] Leave-One-Out 분할 생성")
 print("-" * 50)
 
 # 각 사용자별로 마지막 상호작용을 Test로 분리
-# (date 컬럼이 있으므로 시간순 정렬 후 마지막 선택)
+# (정수 사용자 코드 + int32 day number로 사용자별 최근 행을 정렬 없이 선택)
 
-print("  날짜 기준 정렬 중...")
-train['date'] = pd.to_datetime(train['date'])
-train = train.sort_values(['user_id', 'date'])
+print("  사용자 코드 / day number 변환 중...")
+user_codes, user_uniques = pd.factorize(train['user_id'])
+days = encode_dates(train['date'].values)
+n_all_users = len(user_uniques)
 
 print("  Leave-One-Out 분할 중...")
-# 각 사용자의 마지막 상호작용 인덱스
-last_indices = train.groupby('user_id').tail(1).index
-
-# LOO Test: 각 사용자의 마지막 상호작용
-loo_test = train.loc[last_indices].copy()
-
-# LOO Train: 나머지 상호작용
-loo_train = train.drop(last_indices).copy()
-
 print(f"\n  LOO 분할 결과:")
-print(f"    LOO Train: {len(loo_train):,} rows")
-print(f"    LOO Test: {len(loo_test):,} rows")
-print(f"    Test 사용자 수: {loo_test['user_id'].nunique():,}")
+print(f"    LOO Train: {len(train) - n_all_users:,} rows")
+print(f"    LOO Test: {n_all_users:,} rows")
+print(f"    Test 사용자 수: {n_all_users:,}")
 
 # 최소 2개 이상 상호작용이 있는 사용자만 유지
 # (Train에 1개 이상, Test에 1개)
-train_user_counts = loo_train['user_id'].value_counts()
-valid_users = train_user_counts[train_user_counts >= 1].index
+train_mask, test_idx = leave_one_out(user_codes, days, n_all_users, min_train=1)
+del user_codes, days
 
-loo_train = loo_train[loo_train['user_id'].isin(valid_users)]
-loo_test = loo_test[loo_test['user_id'].isin(valid_users)]
+# LOO Test: 각 사용자의 마지막 상호작용 (사용자당 1행)
+loo_test = train.iloc[test_idx].reset_index(drop=True)
+n_loo_train = int(train_mask.sum())
 
 print(f"\n  필터링 후 (Train >= 1 상호작용):")
-print(f"    LOO Train: {len(loo_train):,} rows")
+print(f"    LOO Train: {n_loo_train:,} rows")
 print(f"    LOO Test: {len(loo_test):,} rows")
-print(f"    Test 사용자 수: {loo_test['user_id'].nunique():,}")
+print(f"    Test 사용자 수: {len(loo_test):,}")
 
 # ============================================================
 # Step 3: LOO 데이터 저장
@@ -74,7 +69,8 @@ print(f"    Test 사용자 수: {loo_test['user_id'].nunique():,}")
 print("\n[Step 3] LOO 데이터 저장")
 print("-" * 50)
 
-loo_train.to_csv("data_split/loo_train.csv", index=False)
+# LOO Train은 마스크로 청크 단위 저장 (부분 DataFrame 복사 없음)
+write_masked_csv(train, train_mask, "data_split/loo_train.csv")
 loo_test.to_csv("data_split/loo_test.csv", index=False)
 
 print(f"  data_split/loo_train.csv 저장 완료")
@@ -86,15 +82,17 @@ print(f"  data_split/loo_test.csv 저장 완료")
 print("\n[Step 4] LOO용 Sparse Matrix 생성")
 print("-" * 50)
 
-# 유니크 ID
-unique_users = loo_train['user_id'].unique()
-unique_items = loo_train['app_id'].unique()
+loo_train_users = train['user_id'].values[train_mask]
+loo_train_items = train['app_id'].values[train_mask]
+del train
 
-# 매핑
-loo_user_to_idx = {uid: idx for idx, uid in enumerate(unique_users)}
-loo_idx_to_user = {idx: uid for uid, idx in loo_user_to_idx.items()}
-loo_item_to_idx = {iid: idx for idx, iid in enumerate(unique_items)}
-loo_idx_to_item = {idx: iid for iid, idx in loo_item_to_idx.items()}
+# 정수 코드 변환 (np.unique: 정렬된 ID 순 = idx)
+unique_users, row = np.unique(loo_train_users, return_inverse=True)
+unique_items, col = np.unique(loo_train_items, return_inverse=True)
+
+# 매핑 (배열 기반 IdMapping)
+loo_user_mapping = IdMapping(unique_users)
+loo_item_mapping = IdMapping(unique_items)
 
 n_users = len(unique_users)
 n_items = len(unique_items)
@@ -102,37 +100,21 @@ n_items = len(unique_items)
 print(f"  사용자 수: {n_users:,}")
 print(f"  아이템 수: {n_items:,}")
 
-# Index 변환
-loo_train['user_idx'] = loo_train['user_id'].map(loo_user_to_idx)
-loo_train['item_idx'] = loo_train['app_id'].map(loo_item_to_idx)
-
-# Sparse Matrix
-row = loo_train['user_idx'].values
-col = loo_train['item_idx'].values
-data = np.ones(len(loo_train), dtype=np.float32)
-
-loo_sparse = csr_matrix((data, (row, col)), shape=(n_users, n_items))
+# Sparse Matrix (Binary, 코드 배열에서 CSR 직접 구축)
+loo_sparse = build_csr(row, col, (n_users, n_items), {'binary': None})['binary']
+del row, col
 
 print(f"  LOO Sparse Matrix: {loo_sparse.shape}")
 print(f"  Non-zero: {loo_sparse.nnz:,}")
 
 # 저장
-save_npz("data_split/loo_train_sparse.npz", loo_sparse)
-
-loo_mappings = {
-    'user_to_idx': loo_user_to_idx,
-    'idx_to_user': loo_idx_to_user,
-    'item_to_idx': loo_item_to_idx,
-    'idx_to_item': loo_idx_to_item,
-    'n_users': n_users,
-    'n_items': n_items
-}
+save_csr_mmap("data_split/loo_train_sparse", loo_sparse)
 
-with open("data_split/loo_mappings.pkl", 'wb') as f:
-    pickle.dump(loo_mappings, f)
+loo_mappings = build_mappings(loo_user_mapping, loo_item_mapping)
+save_mappings("data_split/loo_mappings", loo_mappings)
 
-print(f"  data_split/loo_train_sparse.npz 저장 완료")
-print(f"  data_split/loo_mappings.pkl 저장 완료")
+print(f"  data_split/loo_train_sparse/ 저장 완료")
+print(f"  data_split/loo_mappings/ 저장 완료")
 
 # ============================================================
 # Step 5: LOO Test Index 변환
@@ -140,8 +122,8 @@ print(f"  data_split/loo_mappings.pkl 저장 완료")
 print("\n[Step 5] LOO Test Index 변환")
 print("-" * 50)
 
-loo_test['user_idx'] = loo_test['user_id'].map(loo_user_to_idx)
-loo_test['item_idx'] = loo_test['app_id'].map(loo_item_to_idx).fillna(-1).astype(int)
+loo_test['user_idx'] = loo_user_mapping.encode(loo_test['user_id'].values)
+loo_test['item_idx'] = loo_item_mapping.encode(loo_test['app_id'].values)
 
 # 유효한 Test만 (Train에 있는 아이템)
 valid_test = loo_test[loo_test['item_idx'] >= 0]
@@ -400,11 +382,11 @@ print("\n[Step 8] 실험 설정 요약")
 print("-" * 50)
 
 # 아이템 인기도 계산
-item_popularity = loo_train['app_id'].value_counts().to_dict()
+item_popularity = pd.Series(loo_train_items).value_counts().to_dict()
 
 print(f"""
   실험 데이터셋:
-    - LOO Train: {len(loo_train):,} rows ({len(unique_users):,} users, {len(unique_items):,} items)
+    - LOO Train: {n_loo_train:,} rows ({len(unique_users):,} users, {len(unique_items):,} items)
     - LOO Test: {len(valid_test):,} rows
     
   평가 시나리오:
@@ -430,10 +412,10 @@ print("[결과 요약]")
 print("=" * 70)
 print(f"""
 생성 파일:
-  1. data_split/loo_train.csv ({len(loo_train):,} rows)
+  1. data_split/loo_train.csv ({n_loo_train:,} rows)
   2. data_split/loo_test.csv ({len(loo_test):,} rows)
-  3. data_split/loo_train_sparse.npz (Sparse Matrix)
-  4. data_split/loo_mappings.pkl (ID 매핑)
+  3. data_split/loo_train_sparse/ (Sparse Matrix, memory-map CSR)
+  4. data_split/loo_mappings/ (ID 매핑, .npy)
   5. data_split/loo_test_indexed.csv (Index 변환)
   6. data_split/loo_test_with_partition.csv (파티션 포함)
   7. evaluation.py (평가 함수)
@@ -441,7 +423,7 @@ print(f"""
 LOO 분할 통계:
   - 사용자 수: {n_users:,}
   - 아이템 수: {n_items:,}
-  - Train 상호작용: {len(loo_train):,}
+  - Train 상호작용: {n_loo_train:,}
   - Test 상호작용: {len(valid_test):,}
 
 Phase 2 완료! Phase 3 (Baseline 모델 구현)으로 진행 가능
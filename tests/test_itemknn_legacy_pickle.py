@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+ItemKNNModel 이전 pickle 형식 로드 테스트
+dict 매핑 + 유사도 행렬만 있는 baseline 형식에서 recommend_batch가 동작하는지 확인
+"""
+import os
+import pickle
+import sys
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'models'))
+sys.path.insert(0, ROOT)
+
+from itemknn_model import ItemKNNModel
+
+
+def test_legacy_pickle_recommend_batch(tmp_path):
+    user_ids = [101, 205, 309]
+    item_ids = [7, 13, 21, 42]
+    train = csr_matrix(np.array([
+        [1, 0, 0, 0],
+        [0, 1, 1, 0],
+        [0, 0, 0, 1],
+    ], dtype=np.float32))
+    similarity = csr_matrix(np.array([
+        [0.0, 0.9, 0.2, 0.0],
+        [0.9, 0.0, 0.5, 0.1],
+        [0.2, 0.5, 0.0, 0.7],
+        [0.0, 0.1, 0.7, 0.0],
+    ], dtype=np.float32))
+
+    # baseline 형식: dict 매핑, 이웃 배열 없음
+    path = tmp_path / "itemknn_legacy.pkl"
+    with open(path, 'wb') as f:
+        pickle.dump({
+            'item_similarity': similarity,
+            'user_to_idx': {uid: i for i, uid in enumerate(user_ids)},
+            'idx_to_user': {i: uid for i, uid in enumerate(user_ids)},
+            'item_to_idx': {iid: i for i, iid in enumerate(item_ids)},
+            'idx_to_item': {i: iid for i, iid in enumerate(item_ids)},
+            'k_neighbors': 2,
+            'n_users': len(user_ids),
+            'n_items': len(item_ids),
+        }, f)
+
+    model = ItemKNNModel().load(str(path))
+    model.user_item_matrix = train
+
+    recs = model.recommend_batch(np.array(user_ids + [999]), k=2)
+
+    assert recs.shape == (4, 2)
+    assert recs[0].tolist() == [13, 21]   # item 7 → 13 (0.9), 21 (0.2)
+    assert recs[1].tolist() == [7, 42]    # items 13, 21 → 7 (1.1), 42 (0.8)
+    assert recs[2].tolist() == [21, 13]   # item 42 → 21 (0.7), 13 (0.1)
+    assert recs[3].tolist() == [-1, -1]   # 학습에 없는 사용자
+    for uid, row in zip(user_ids, recs):
+        assert model.recommend(uid, k=2) == row.tolist()
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+ItemKNNModel.recommend / recommend_batch 일치 테스트
+같은 점수 합산, 양수 점수 후보, 동점은 아이템 idx 오름차순
+"""
+import contextlib
+import io
+import os
+import sys
+
+import numpy as np
+import scipy.sparse as sp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'models'))
+sys.path.insert(0, ROOT)
+
+from id_mapping import IdMapping, build_mappings
+from itemknn_model import ItemKNNModel
+
+
+def test_recommend_matches_recommend_batch():
+    n_users, n_items = 600, 120
+    train = sp.random(n_users, n_items, density=0.03, format='csr', random_state=3, dtype=np.float32)
+    train.data[:] = 1
+    mappings = build_mappings(IdMapping(np.arange(n_users) + 1000), IdMapping(np.arange(n_items) * 3))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        model = ItemKNNModel(k_neighbors=10).fit(train, mappings)
+    model.neighbor_scores = np.round(model.neighbor_scores, 1)  # 동점 다수 생성
+
+    user_ids = np.arange(n_users) + 1000
+    batch = model.recommend_batch(user_ids, k=15, block_size=37)
+    for user_id, row in zip(user_ids, batch):
+        assert model.recommend(user_id, k=15) == [item for item in row.tolist() if item >= 0]